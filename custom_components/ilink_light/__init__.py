@@ -1,14 +1,98 @@
 """Support for iLink lights."""
 
+import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_DEVICES
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers import (
+    config_validation as cv,
+    device_registry as dr,
+    entity_registry as er,
+)
 from homeassistant.helpers.device_registry import DeviceEntry
-
-from .const import LOGGER, CONF_MAC, CONF_NAME, DOMAIN, PLATFORMS
+from homeassistant.helpers.typing import ConfigType
+
+from .const import (
+    LOGGER,
+    CONF_MAC,
+    CONF_NAME,
+    CONF_POLL_BUDGET,
+    CONF_PRESETS,
+    CONF_STEPS,
+    DATA_POLL_BUDGET,
+    DATA_PRESETS,
+    DATA_PROFILES,
+    DATA_SCHEDULER,
+    DEFAULT_POLL_BUDGET,
+    DOMAIN,
+    PLATFORMS,
+)
 from .coordinator import LightCoordinator
+from .fleet import async_setup_services
+from .ilink_ble import Scenes
+from .presets import (
+    PRESET_BRIGHTNESS,
+    PRESET_DELAY,
+    PRESET_POWER,
+    PRESET_RGB,
+    PRESET_SCENE,
+    PRESET_TEMP_LEVEL,
+    compile_presets,
+)
+from .profiles import ProfileStore
+from .scheduler import PollScheduler
+
+PRESET_STEP_SCHEMA = vol.Schema(
+    {
+        vol.Optional(PRESET_POWER): cv.boolean,
+        vol.Optional(PRESET_TEMP_LEVEL): vol.All(vol.Coerce(int), vol.Range(1, 5)),
+        vol.Optional(PRESET_RGB): vol.All(
+            vol.ExactSequence((cv.byte, cv.byte, cv.byte)), vol.Coerce(tuple)
+        ),
+        vol.Optional(PRESET_BRIGHTNESS): cv.byte,
+        vol.Optional(PRESET_SCENE): vol.Any(
+            vol.All(vol.Coerce(int), vol.Range(1, 93)), vol.In(Scenes.all())
+        ),
+        vol.Optional(PRESET_DELAY): vol.All(vol.Coerce(float), vol.Range(0, 60)),
+    }
+)
+
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional(CONF_PRESETS, default={}): {
+                    cv.string: vol.Schema(
+                        {vol.Required(CONF_STEPS): [PRESET_STEP_SCHEMA]}
+                    )
+                },
+                vol.Optional(
+                    CONF_POLL_BUDGET, default=DEFAULT_POLL_BUDGET
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=600)),
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Compile presets and load profiles once, shared by all devices and reloads."""
+    presets = config.get(DOMAIN, {}).get(CONF_PRESETS, {})
+    hass.data.setdefault(DOMAIN, {})
+    hass.data[DOMAIN][DATA_POLL_BUDGET] = config.get(DOMAIN, {}).get(
+        CONF_POLL_BUDGET, DEFAULT_POLL_BUDGET
+    )
+    hass.data[DOMAIN][DATA_PRESETS] = compile_presets(
+        {name: preset[CONF_STEPS] for name, preset in presets.items()}
+    )
+    # one store for all entries and reloads, a reload must not read it stale
+    profiles = ProfileStore(hass)
+    await profiles.async_load()
+    hass.data[DOMAIN][DATA_PROFILES] = profiles
+    async_setup_services(hass)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -16,6 +100,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     LOGGER.debug("Setting up configuration for iLink lights!")
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][CONF_DEVICES] = {}
+    scheduler = PollScheduler(
+        hass, hass.data[DOMAIN].get(DATA_POLL_BUDGET, DEFAULT_POLL_BUDGET)
+    )
+    hass.data[DOMAIN][DATA_SCHEDULER] = scheduler
+    profiles = hass.data[DOMAIN][DATA_PROFILES]
 
     # Create one coordinator for each device
     for device_id in entry.data[CONF_DEVICES]:
@@ -29,8 +118,9 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             name=conf[CONF_NAME],
         )
 
-        # Set up coordinator
-        coordinator = LightCoordinator(hass, device.id, conf)
+        # Set up coordinator, the scheduler spreads polls of all devices
+        coordinator = LightCoordinator(hass, device.id, conf, scheduler, profiles)
+        await coordinator.async_load_colors()
         hass.data[DOMAIN][CONF_DEVICES][device_id] = coordinator
 
     # Forward the setup to the platforms.
@@ -66,6 +156,8 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     for dev_id, coordinator in hass.data[DOMAIN][CONF_DEVICES].items():
         await coordinator.async_shutdown()
+    # written now instead of after the save delay, journal included
+    await hass.data[DOMAIN][DATA_PROFILES].async_save()
 
     # Unload entries
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
@@ -0,0 +1,145 @@
+"""Circadian lighting following the sun, writes only when the lamp would change."""
+import datetime as dt
+import math
+
+from homeassistant.const import SUN_EVENT_SUNRISE, SUN_EVENT_SUNSET
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import event
+from homeassistant.helpers.sun import get_astral_event_date
+from homeassistant.util import dt as dt_util
+
+from .const import LOGGER
+from .ilink_ble.commands import ColorTempLevelUtil, color_temp_mappings
+
+CIRCADIAN_INTERVAL = dt.timedelta(minutes=1)
+
+
+class CircadianSettings:
+    def __init__(
+        self,
+        min_brightness: int = 40,
+        max_brightness: int = 255,
+        brightness_step: int = 16,
+        override: dt.timedelta = dt.timedelta(hours=1),
+    ):
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        """brightness changes smaller than this are not sent"""
+        self.brightness_step = brightness_step
+        """how long manual changes pause the schedule"""
+        self.override = override
+
+    def as_dict(self) -> dict:
+        return {
+            "min_brightness": self.min_brightness,
+            "max_brightness": self.max_brightness,
+            "brightness_step": self.brightness_step,
+            "override": self.override.total_seconds(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CircadianSettings":
+        return cls(
+            data["min_brightness"],
+            data["max_brightness"],
+            data["brightness_step"],
+            dt.timedelta(seconds=data["override"]),
+        )
+
+
+def sun_factor(now: dt.datetime, sunrise: dt.datetime, sunset: dt.datetime) -> float:
+    """0 at night, rising to 1 at solar noon"""
+    if sunrise is None or sunset is None or not sunrise < now < sunset:
+        return 0.0
+    progress = (now - sunrise) / (sunset - sunrise)
+    return math.sin(math.pi * progress)
+
+
+def circadian_target(factor: float, settings: CircadianSettings) -> tuple[int, int]:
+    """Quantized white temperature level and brightness for the sun factor"""
+    warmest = min(color_temp_mappings.values())
+    coldest = max(color_temp_mappings.values())
+    level = ColorTempLevelUtil.color_temp_to_level(
+        round(warmest + (coldest - warmest) * factor)
+    )
+
+    brightness = settings.min_brightness + (
+        settings.max_brightness - settings.min_brightness
+    ) * factor
+    step = max(settings.brightness_step, 1)
+    brightness = round(brightness / step) * step
+    brightness = min(max(brightness, settings.min_brightness), settings.max_brightness)
+    return level, int(brightness)
+
+
+class CircadianController:
+    """Drives one lamp, the coordinator reports manual changes"""
+
+    def __init__(self, hass: HomeAssistant, coordinator, settings: CircadianSettings):
+        self._hass = hass
+        self._coordinator = coordinator
+        self.settings = settings
+        self._last_sent: tuple[int, int] | None = None
+        self._override_until: dt.datetime | None = None
+        self._unsub = None
+
+    def start(self) -> None:
+        self._unsub = event.async_track_time_interval(
+            self._hass, self._async_tick, CIRCADIAN_INTERVAL
+        )
+        self._hass.async_create_task(self.async_apply())
+
+    def stop(self) -> None:
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def manual_change(self) -> None:
+        self._override_until = dt_util.utcnow() + self.settings.override
+        LOGGER.debug(
+            "circadian %s paused until %s",
+            self._coordinator.address,
+            self._override_until,
+        )
+
+    @callback
+    def turned_on(self) -> None:
+        # lamp may have been changed while off, send target again
+        self._last_sent = None
+        self._hass.async_create_task(self.async_apply())
+
+    async def _async_tick(self, now: dt.datetime) -> None:
+        await self.async_apply()
+
+    async def async_apply(self) -> None:
+        if self._override_until is not None:
+            if dt_util.utcnow() < self._override_until:
+                return
+            self._override_until = None
+            self._last_sent = None
+
+        # never switch the lamp on by itself
+        if not self._coordinator.is_on:
+            return
+
+        now = dt_util.utcnow()
+        today = dt_util.as_local(now).date()
+        factor = sun_factor(
+            now,
+            get_astral_event_date(self._hass, SUN_EVENT_SUNRISE, today),
+            get_astral_event_date(self._hass, SUN_EVENT_SUNSET, today),
+        )
+        target = circadian_target(factor, self.settings)
+        if target == self._last_sent:
+            return
+
+        level, brightness = target
+        LOGGER.debug(
+            "circadian %s: level %s brightness %s",
+            self._coordinator.address,
+            level,
+            brightness,
+        )
+        self._last_sent = target
+        await self._coordinator.async_apply_circadian(level, brightness)
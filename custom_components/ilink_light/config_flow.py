@@ -3,9 +3,11 @@ from typing import Any
 
 import voluptuous as vol
 
+from homeassistant.components import bluetooth
 from homeassistant.components.bluetooth import BluetoothServiceInfoBleak
 from homeassistant.config_entries import ConfigEntry, ConfigFlow, OptionsFlow
 from homeassistant.const import CONF_DEVICES
+from homeassistant.core import HomeAssistant
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers import (
     config_validation as cv,
@@ -19,16 +21,28 @@ from .const import (
     CONF_ACTION,
     CONF_ADD_DEVICE,
     CONF_EDIT_DEVICE,
+    CONF_EFFECTS,
+    CONF_GAMMA,
     CONF_MAC,
     CONF_NAME,
+    CONF_POWER_ON_RESTORE,
+    CONF_PROBE,
     CONF_REMOVE_DEVICE,
     CONF_SCAN_INTERVAL,
     CONF_SCAN_INTERVAL_FAST,
+    CONF_WHITE_BALANCE,
+    DEFAULT_EFFECTS,
+    DEFAULT_GAMMA,
+    DEFAULT_POWER_ON_RESTORE,
     DEFAULT_SCAN_INTERVAL,
     DEFAULT_SCAN_INTERVAL_FAST,
+    DEFAULT_WHITE_BALANCE,
     DOMAIN,
+    EFFECTS_OPTIONS,
+    POWER_ON_OPTIONS,
 )
-from .light_bt_client import LightBtClient
+from .ilink_ble import LightBtClient, is_ilink_advertisement
+from .resolver import HassDeviceResolver
 
 CONFIG_ENTRY_NAME = "iLink Light"
 SELECTED_DEVICE = "selected_device"
@@ -38,9 +52,27 @@ DEVICE_DATA = {
     CONF_MAC: "",
     CONF_SCAN_INTERVAL: DEFAULT_SCAN_INTERVAL,
     CONF_SCAN_INTERVAL_FAST: DEFAULT_SCAN_INTERVAL_FAST,
+    CONF_GAMMA: DEFAULT_GAMMA,
+    CONF_WHITE_BALANCE: DEFAULT_WHITE_BALANCE,
+    CONF_POWER_ON_RESTORE: DEFAULT_POWER_ON_RESTORE,
+    CONF_EFFECTS: DEFAULT_EFFECTS,
 }
 
 
+async def async_verify_device(hass: HomeAssistant, mac: str, probe: bool) -> str | None:
+    """Error key, None when an iLink lamp advertises under the address"""
+    service_info = bluetooth.async_last_service_info(
+        hass, mac.upper(), connectable=True
+    )
+    if not is_ilink_advertisement(service_info):
+        return "not_found"
+    if probe:
+        client = LightBtClient(mac, resolver=HassDeviceResolver(hass))
+        if not await client.probe():
+            return "cannot_connect"
+    return None
+
+
 class iLinkLightConfigFlowHandler(ConfigFlow, domain=DOMAIN):
     VERSION = 2
 
@@ -115,59 +147,48 @@ class iLinkLightConfigFlowHandler(ConfigFlow, domain=DOMAIN):
                     description_placeholders={"dev_name": user_input[CONF_MAC]},
                 )
 
-            light_client = LightBtClient(self.hass, user_input[CONF_MAC])
+            probe = user_input.pop(CONF_PROBE, False)
+            error = await async_verify_device(self.hass, user_input[CONF_MAC], probe)
 
-            if await light_client.connect():
-                verified = light_client.is_connected()
-                await light_client.disconnect(force=True)
+            if error is None:
+                """Make sure integration is installed"""
+                self.config_entry = self.get_ilink_light_config_entry(CONFIG_ENTRY_NAME)
+                if self.config_entry is None:
+                    # No integration installed, add entry with new device
+                    await self.async_set_unique_id(CONFIG_ENTRY_NAME)
+                    new_data = {CONF_DEVICES: {}}
+                    new_data[CONF_DEVICES][user_input[CONF_MAC]] = user_input
+                    LOGGER.debug("Creating config entry: %s", new_data)
 
-                if verified:
-                    """Make sure integration is installed"""
-                    self.config_entry = self.get_ilink_light_config_entry(
-                        CONFIG_ENTRY_NAME
+                    return self.async_create_entry(
+                        title=CONFIG_ENTRY_NAME,
+                        data=new_data,
+                        description_placeholders={
+                            "dev_name": new_data[CONF_DEVICES][user_input[CONF_MAC]][
+                                CONF_NAME
+                            ]
+                        },
                     )
-                    if self.config_entry is None:
-                        # No integration installed, add entry with new device
-                        await self.async_set_unique_id(CONFIG_ENTRY_NAME)
-                        new_data = {CONF_DEVICES: {}}
-                        new_data[CONF_DEVICES][user_input[CONF_MAC]] = user_input
-                        LOGGER.debug("Creating config entry: %s", new_data)
-
-                        return self.async_create_entry(
-                            title=CONFIG_ENTRY_NAME,
-                            data=new_data,
-                            description_placeholders={
-                                "dev_name": new_data[CONF_DEVICES][
-                                    user_input[CONF_MAC]
-                                ][CONF_NAME]
-                            },
-                        )
-                    else:
-                        # Integration found, update with new device
-                        new_data = self.config_entry.data.copy()
-                        new_data[CONF_DEVICES][user_input[CONF_MAC]] = user_input
-
-                        self.hass.config_entries.async_update_entry(
-                            self.config_entry, data=new_data
-                        )
-                        self.hass.config_entries._async_schedule_save()
-
-                        await self.hass.config_entries.async_reload(
-                            self.config_entry.entry_id
-                        )
-
-                        return self.async_abort(
-                            reason="add_success",
-                            description_placeholders={
-                                "dev_name": user_input[CONF_NAME]
-                            },
-                        )
                 else:
-                    errors["base"] = "cannot_connect"
-                    # Store values for new attempt
-                    self.device_data = user_input
+                    # Integration found, update with new device
+                    new_data = self.config_entry.data.copy()
+                    new_data[CONF_DEVICES][user_input[CONF_MAC]] = user_input
+
+                    self.hass.config_entries.async_update_entry(
+                        self.config_entry, data=new_data
+                    )
+                    self.hass.config_entries._async_schedule_save()
+
+                    await self.hass.config_entries.async_reload(
+                        self.config_entry.entry_id
+                    )
+
+                    return self.async_abort(
+                        reason="add_success",
+                        description_placeholders={"dev_name": user_input[CONF_NAME]},
+                    )
             else:
-                errors["base"] = "cannot_connect"
+                errors["base"] = error
                 # Store values for new attempt
                 self.device_data = user_input
 
@@ -218,39 +239,30 @@ class iLinkLightOptionsFlowHandler(OptionsFlow):
                     },
                 )
 
-            light_client = LightBtClient(self.hass, user_input[CONF_MAC])
+            probe = user_input.pop(CONF_PROBE, False)
+            error = await async_verify_device(self.hass, user_input[CONF_MAC], probe)
 
-            if await light_client.connect():
-                verified = light_client.is_connected()
-                await light_client.disconnect()
+            if error is None:
+                # Add device to config entry
+                new_data = self.config_entry.data.copy()
+                new_data[CONF_DEVICES][user_input[CONF_MAC]] = user_input
 
-                if verified:
-                    # Add device to config entry
-                    new_data = self.config_entry.data.copy()
-                    new_data[CONF_DEVICES][user_input[CONF_MAC]] = user_input
-
-                    self.hass.config_entries.async_update_entry(
-                        self.config_entry, data=new_data
-                    )
-                    self.hass.config_entries._async_schedule_save()
-                    await self.hass.config_entries.async_reload(
-                        self.config_entry.entry_id
-                    )
+                self.hass.config_entries.async_update_entry(
+                    self.config_entry, data=new_data
+                )
+                self.hass.config_entries._async_schedule_save()
+                await self.hass.config_entries.async_reload(self.config_entry.entry_id)
 
-                    return self.async_abort(
-                        reason="add_success",
-                        description_placeholders={
-                            "dev_name": new_data[CONF_DEVICES][user_input[CONF_MAC]][
-                                CONF_NAME
-                            ],
-                        },
-                    )
-                else:
-                    errors["base"] = "cannot_connect"
-                    # Store values for new attempt
-                    self.device_data = user_input
+                return self.async_abort(
+                    reason="add_success",
+                    description_placeholders={
+                        "dev_name": new_data[CONF_DEVICES][user_input[CONF_MAC]][
+                            CONF_NAME
+                        ],
+                    },
+                )
             else:
-                errors["base"] = "cannot_connect"
+                errors["base"] = error
                 # Store values for new attempt
                 self.device_data = user_input
 
@@ -296,12 +308,7 @@ class iLinkLightOptionsFlowHandler(OptionsFlow):
         if user_input is not None:
             # Update device in config entry
             new_data = self.config_entry.data.copy()
-            new_data[CONF_DEVICES][self.selected_device][
-                CONF_SCAN_INTERVAL
-            ] = user_input[CONF_SCAN_INTERVAL]
-            new_data[CONF_DEVICES][self.selected_device][
-                CONF_SCAN_INTERVAL_FAST
-            ] = user_input[CONF_SCAN_INTERVAL_FAST]
+            new_data[CONF_DEVICES][self.selected_device].update(user_input)
 
             self.hass.config_entries.async_update_entry(
                 self.config_entry, data=new_data
@@ -423,12 +430,58 @@ def getDeviceSchemaAdd(user_input: dict[str, Any] | None = None) -> vol.Schema:
             vol.Optional(
                 CONF_SCAN_INTERVAL_FAST, default=user_input[CONF_SCAN_INTERVAL_FAST]
             ): vol.All(vol.Coerce(int), vol.Range(min=5, max=999)),
+            **getCalibrationSchema(user_input),
+            **getPowerOnSchema(user_input),
+            **getEntitySchema(user_input),
+            vol.Optional(
+                CONF_PROBE, default=user_input.get(CONF_PROBE, False)
+            ): cv.boolean,
         }
     )
 
     return data_schema
 
 
+# Color calibration fields, shared by add and edit
+def getCalibrationSchema(user_input: dict[str, Any]) -> dict:
+    return {
+        vol.Optional(
+            CONF_GAMMA, default=user_input.get(CONF_GAMMA, DEFAULT_GAMMA)
+        ): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=3)),
+        vol.Optional(
+            CONF_WHITE_BALANCE,
+            default=user_input.get(CONF_WHITE_BALANCE, DEFAULT_WHITE_BALANCE),
+        ): selector.ColorRGBSelector(),
+    }
+
+
+# Power-on restore policy, shared by add and edit
+def getPowerOnSchema(user_input: dict[str, Any]) -> dict:
+    return {
+        vol.Optional(
+            CONF_POWER_ON_RESTORE,
+            default=user_input.get(CONF_POWER_ON_RESTORE, DEFAULT_POWER_ON_RESTORE),
+        ): selector.SelectSelector(
+            selector.SelectSelectorConfig(
+                options=POWER_ON_OPTIONS, translation_key=CONF_POWER_ON_RESTORE
+            )
+        ),
+    }
+
+
+# What the entity offers, shared by add and edit
+def getEntitySchema(user_input: dict[str, Any]) -> dict:
+    return {
+        vol.Optional(
+            CONF_EFFECTS, default=user_input.get(CONF_EFFECTS, DEFAULT_EFFECTS)
+        ): selector.SelectSelector(
+            selector.SelectSelectorConfig(
+                options=EFFECTS_OPTIONS, translation_key=CONF_EFFECTS
+            )
+        ),
+    }
+
+
 # Schema taking device details when editing
 def getDeviceSchemaEdit(user_input: dict[str, Any] | None = None) -> vol.Schema:
     data_schema = vol.Schema(
@@ -439,6 +492,9 @@ def getDeviceSchemaEdit(user_input: dict[str, Any] | None = None) -> vol.Schema:
             vol.Optional(
                 CONF_SCAN_INTERVAL_FAST, default=user_input[CONF_SCAN_INTERVAL_FAST]
             ): vol.All(vol.Coerce(int), vol.Range(min=5, max=999)),
+            **getCalibrationSchema(user_input),
+            **getPowerOnSchema(user_input),
+            **getEntitySchema(user_input),
         }
     )
 
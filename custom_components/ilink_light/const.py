@@ -12,14 +12,74 @@ CONF_ADD_DEVICE = "add_device"
 CONF_EDIT_DEVICE = "edit_device"
 CONF_REMOVE_DEVICE = "remove_device"
 
+# YAML Configuration Constants
+CONF_PRESETS = "presets"
+CONF_STEPS = "steps"
+CONF_POLL_BUDGET = "poll_budget"
+
 # Configuration Device Constants
 CONF_NAME: str = "name"
 CONF_MAC: str = "mac"
 CONF_SCAN_INTERVAL: str = "scan_interval"
 CONF_SCAN_INTERVAL_FAST: str = "scan_interval_fast"
+"""connect once while adding a device, advertisement alone is enough otherwise"""
+CONF_PROBE: str = "probe"
+CONF_GAMMA: str = "gamma"
+CONF_WHITE_BALANCE: str = "white_balance"
+"""what to do when a lamp that was gone comes back, e.g. from a wall switch"""
+CONF_POWER_ON_RESTORE: str = "power_on_restore"
+POWER_ON_LAMP = "lamp"
+POWER_ON_RESTORE = "restore"
+POWER_ON_OFF = "off"
+POWER_ON_OPTIONS = [POWER_ON_LAMP, POWER_ON_RESTORE, POWER_ON_OFF]
+"""scenes offered as effects, presets are always offered"""
+CONF_EFFECTS: str = "effects"
+EFFECTS_ALL = "all"
+EFFECTS_COMMON = "common"
+EFFECTS_PRESETS = "presets"
+EFFECTS_OPTIONS = [EFFECTS_ALL, EFFECTS_COMMON, EFFECTS_PRESETS]
 
 # Defaults
 DEFAULT_SCAN_INTERVAL: int = 300  # Seconds
 DEFAULT_SCAN_INTERVAL_FAST: int = 5  # Seconds
+DEFAULT_GAMMA: float = 1.0
+DEFAULT_WHITE_BALANCE: list[int] = [255, 255, 255]
+DEFAULT_POWER_ON_RESTORE: str = POWER_ON_LAMP
+DEFAULT_EFFECTS: str = EFFECTS_ALL
+
+# Startup, restored state is shown until the first poll confirms it
+INITIAL_POLL_DELAY: int = 30  # Seconds
+
+# Polling of all devices together
+DEFAULT_POLL_BUDGET: int = 12  # Polls per minute
+POLL_JITTER: float = 0.1  # Fraction of the interval
+OFF_POLL_FACTOR: int = 4
+IDLE_POLL_FACTOR: int = 2
+IDLE_AFTER: int = 3600  # Seconds without changes
+
+# Optimistic state
+WRITE_RETRY_DELAY: int = 5  # Seconds
+WRITE_MAX_ATTEMPTS: int = 3
+
+# Journal of writes for unreachable lamps, flushed when they advertise again
+JOURNAL_FLUSH_INTERVAL: int = 30  # Seconds between attempts
+
+# hass.data keys
+DATA_PRESETS = "compiled_presets"
+DATA_POLL_BUDGET = "poll_budget"
+DATA_SCHEDULER = "poll_scheduler"
+DATA_CAPABILITIES = "capabilities"
+DATA_PROFILES = "profiles"
+DATA_SNAPSHOTS = "snapshots"
+
+# Learned device profiles
+PROFILE_SAVE_DELAY: int = 60  # Seconds
+
+# Snapshots and bulk changes, lamps at once without known connection slots
+DEFAULT_BULK_CONCURRENCY: int = 3
+
+# Pre-warmed connections
+DEFAULT_PREWARM_HOLD: int = 30  # Seconds
+MAX_PREWARM_HOLD: int = 300  # Seconds
 
 LOGGER = logging.getLogger(__package__)
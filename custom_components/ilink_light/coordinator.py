@@ -1,26 +1,76 @@
 import asyncio
 import datetime as dt
-import functools
+import time
+from contextlib import asynccontextmanager
 from enum import StrEnum
 
+from homeassistant.components import bluetooth
 from homeassistant.components.light import (
     ATTR_BRIGHTNESS,
     ATTR_COLOR_TEMP_KELVIN,
     ATTR_RGB_COLOR,
 )
-from homeassistant.core import HassJob, HassJobType
+from homeassistant.core import HassJob, HassJobType, callback
 from homeassistant.helpers import device_registry, event
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
 
-from .commands import ColorTempLevelUtil, ResponseStatus
+from .circadian import CircadianController, CircadianSettings
 from .const import (
     LOGGER,
+    CONF_EFFECTS,
+    CONF_GAMMA,
     CONF_MAC,
     CONF_NAME,
     CONF_SCAN_INTERVAL,
     CONF_SCAN_INTERVAL_FAST,
+    CONF_POWER_ON_RESTORE,
+    CONF_WHITE_BALANCE,
+    DATA_CAPABILITIES,
+    DEFAULT_EFFECTS,
+    DEFAULT_GAMMA,
+    DEFAULT_POWER_ON_RESTORE,
+    DEFAULT_WHITE_BALANCE,
+    DOMAIN,
+    IDLE_AFTER,
+    IDLE_POLL_FACTOR,
+    INITIAL_POLL_DELAY,
+    OFF_POLL_FACTOR,
+    WRITE_MAX_ATTEMPTS,
+    WRITE_RETRY_DELAY,
+    JOURNAL_FLUSH_INTERVAL,
+    POWER_ON_OFF,
+    POWER_ON_RESTORE,
 )
-from .light_bt_client import LightBtClient
+from .ilink_ble import (
+    Capabilities,
+    ColorTempLevelUtil,
+    DesiredState,
+    LightBtClient,
+    LightMode,
+    ResponseStatus,
+    apply_state,
+    plan_frames,
+    probe_capabilities,
+)
+from .ilink_ble.capture import TrafficRecorder
+from .ilink_ble.color import ColorCalibration, ColorTables, color_tables
+from .ilink_ble.commands import intern_rgb
+from .ilink_ble.tracing import Tracer
+from .presets import Preset
+from .profiles import (
+    PROFILE_CAPABILITIES,
+    PROFILE_CIRCADIAN,
+    PROFILE_JOURNAL,
+    PROFILE_LAST_SEEN,
+    PROFILE_LATENCY,
+    PROFILE_MANUFACTURER,
+    PROFILE_STATE,
+    PROFILE_VERSION,
+    ProfileStore,
+)
+from .resolver import HassDeviceResolver
+from .scheduler import PollScheduler
 
 
 class LightState(StrEnum):
@@ -35,82 +85,421 @@ class LightState(StrEnum):
     POWER = "power"
 
 
+class LampState:
+    """State of one lamp, indexed by LightState like a dict but a slot each"""
+
+    __slots__ = ("power", "brightness", "color_temp", "rgb")
+    _slots = {
+        LightState.POWER: "power",
+        LightState.BRIGHTNESS: "brightness",
+        LightState.COLORTEMP: "color_temp",
+        LightState.RGB: "rgb",
+    }
+
+    def __init__(self, power=None, brightness=None, color_temp=None, rgb=None):
+        self.power = power
+        self.brightness = brightness
+        self.color_temp = color_temp
+        self.rgb = intern_rgb(*rgb) if rgb is not None else None
+
+    def __getitem__(self, key: LightState):
+        return getattr(self, self._slots[key])
+
+    def __setitem__(self, key: LightState, value) -> None:
+        if key == LightState.RGB and value is not None:
+            # equal colors of all lamps share one tuple
+            value = intern_rgb(*value)
+        setattr(self, self._slots[key], value)
+
+    def get(self, key: LightState, default=None):
+        value = self[key]
+        return default if value is None else value
+
+    def items(self):
+        """Known values only, like a dict without the missing keys"""
+        for key, slot in self._slots.items():
+            if (value := getattr(self, slot)) is not None:
+                yield key, value
+
+
+"""not a state attribute, scene is sent once and not confirmed"""
+SCENE = "scene"
+
+
+class PendingWrite:
+    """Optimistically applied value waiting for confirmation by the lamp"""
+
+    __slots__ = ("value", "previous", "attempts", "sent")
+
+    def __init__(self, value, previous):
+        self.value = value
+        self.previous = previous
+        self.attempts = 0
+        self.sent = False
+
+
 class LightCoordinator(DataUpdateCoordinator):
-    _fast_poll_count = 0
     _normal_poll_interval = 60
     _fast_poll_interval = 10
     _initialized = False
+    """firmware version the client's capabilities were probed for"""
+    _capabilities_version: str | None = None
+    """statuses during the probe show its temporary states, not published"""
+    _probing = False
     _request_status_update = True
     _unsub_update_state: event.CALLBACK_TYPE | None = None
     _concurent_update_state = 0
-
-    def __init__(self, hass, device_id, conf):
+    _unsub_retry: event.CALLBACK_TYPE | None = None
+    _unsub_capture: event.CALLBACK_TYPE | None = None
+    _unsub_release: event.CALLBACK_TYPE | None = None
+    _verifying = False
+    _unsub_disconnect: event.CALLBACK_TYPE | None = None
+    _unsub_trace: event.CALLBACK_TYPE | None = None
+    """monotonic time journaled writes were last tried on an advertisement"""
+    _journal_time = 0.0
+    """attributes to restore once a lamp that was gone advertises again"""
+    _power_cycled: list[LightState] | None = None
+
+    def __init__(
+        self,
+        hass,
+        device_id,
+        conf,
+        scheduler: PollScheduler,
+        profiles: ProfileStore,
+    ):
         self.device_id = device_id
         self.device_name = conf[CONF_NAME]
         self.address = conf[CONF_MAC]
         self._normal_poll_interval = int(conf[CONF_SCAN_INTERVAL])
         self._fast_poll_interval = int(conf[CONF_SCAN_INTERVAL_FAST])
+        self.calibration = ColorCalibration(
+            conf.get(CONF_GAMMA, DEFAULT_GAMMA),
+            conf.get(CONF_WHITE_BALANCE, DEFAULT_WHITE_BALANCE),
+        )
+        """calibrated color conversion, loaded before entities are added"""
+        self.colors: ColorTables | None = None
+        self.effects = conf.get(CONF_EFFECTS, DEFAULT_EFFECTS)
 
         """Initialize coordinator parent"""
         super().__init__(
             hass,
             LOGGER,
             name="iLink Light: " + self.device_name,
-            # let's give at least 30 seconds for initial connect to device
-            update_interval=dt.timedelta(seconds=30),
+            # polls are scheduled for all devices together
+            update_interval=None,
             update_method=self.async_update,
+            # state is published by the status callback when something changed
+            always_update=False,
+        )
+        self._scheduler = scheduler
+        # state is restored meanwhile, no need to hurry with first connect
+        scheduler.add(self, INITIAL_POLL_DELAY)
+        """monotonic time of the last status and of the last change"""
+        self._status_time: float | None = None
+        self._change_time = time.monotonic()
+
+        self._client = LightBtClient(
+            self.address, self._client_status_updated, HassDeviceResolver(hass)
         )
-
-        self._client = LightBtClient(hass, self.address, self._client_status_updated)
 
         # Initialize state in case of new integration
-        self.data = {}
-        self.data[LightState.COLORTEMP] = 4000
-        self.data[LightState.BRIGHTNESS] = 255
-        self.data[LightState.POWER] = True
-        self.data[LightState.RGB] = (0xFF, 0xFF, 0xFF)
+        # it's replaced by restored state and stays stale until first status
+        self.stale = True
+        self.last_seen: dt.datetime | None = None
+        self.data = LampState(
+            power=True, brightness=255, color_temp=4000, rgb=(0xFF, 0xFF, 0xFF)
+        )
+        # filled from every status instead of a new dict each time
+        self._reported = LampState()
+
+        # one session with the lamp at a time, each waits for its own status
+        self._session = asyncio.Lock()
+        # writes applied to state but not yet confirmed by the lamp
+        self._pending: dict[LightState, PendingWrite] = {}
+        # attributes where the lamp did not reach the requested value
+        self.divergent: set[LightState] = set()
+        self._scene: int | None = None
+        # what the lamp reported plus what was sent since, used for planning
+        self._lamp: ResponseStatus | None = None
+        self._mode: LightMode | None = None
+        self.circadian: CircadianController | None = None
+
+        # unsent writes are the journal, sent once the lamp shows up again
+        self._power_on_restore = conf.get(
+            CONF_POWER_ON_RESTORE, DEFAULT_POWER_ON_RESTORE
+        )
+        self._unsub_advertisement = bluetooth.async_register_callback(
+            hass,
+            self._async_advertised,
+            bluetooth.BluetoothCallbackMatcher(
+                address=self.address.upper(), connectable=True
+            ),
+            bluetooth.BluetoothScanningMode.PASSIVE,
+        )
+        self._unsub_unavailable = bluetooth.async_track_unavailable(
+            hass, self._async_unavailable, self.address.upper(), connectable=True
+        )
 
-    async def _client_status_updated(self, status: ResponseStatus) -> None:
-        self.data[LightState.COLORTEMP] = ColorTempLevelUtil.level_to_color_temp(
-            status.temp_level
+        self._profiles = profiles
+        if (profile := profiles.get(self.address)) is not None:
+            self._apply_profile(profile)
+        profiles.add(self)
+
+    def profile(self) -> dict:
+        """What is kept across restarts"""
+        capabilities = None
+        if self._capabilities_version is not None:
+            capabilities = self._client.capabilities.as_dict()
+        return {
+            PROFILE_VERSION: self._client.device_version,
+            PROFILE_MANUFACTURER: self._client.device_manifacturer,
+            PROFILE_CAPABILITIES: capabilities,
+            PROFILE_LATENCY: self._client.latency.as_dict(),
+            PROFILE_STATE: {key.value: self.data.get(key) for key in LightState},
+            PROFILE_LAST_SEEN: self.last_seen.isoformat() if self.last_seen else None,
+            PROFILE_JOURNAL: {
+                key.value: pending.value
+                for key, pending in self._pending.items()
+                if not pending.sent
+            },
+            PROFILE_CIRCADIAN: (
+                self.circadian.settings.as_dict() if self.circadian else None
+            ),
+        }
+
+    def _apply_profile(self, profile: dict) -> None:
+        version = profile.get(PROFILE_VERSION)
+        self._client.device_version = version
+        self._client.device_manifacturer = profile.get(PROFILE_MANUFACTURER)
+        if version and (capabilities := profile.get(PROFILE_CAPABILITIES)):
+            self._client.capabilities = Capabilities.from_dict(capabilities)
+            self._capabilities_version = version
+            # other lamps with this firmware don't need to probe either
+            known = self.hass.data[DOMAIN].setdefault(DATA_CAPABILITIES, {})
+            known.setdefault(version, self._client.capabilities)
+        self._client.latency.load(profile.get(PROFILE_LATENCY) or {})
+
+        # seeds state, restored entity state replaces it
+        state = profile.get(PROFILE_STATE) or {}
+        state = {key: state.get(key.value) for key in LightState}
+        if state[LightState.RGB] is not None:
+            state[LightState.RGB] = tuple(state[LightState.RGB])
+        last_seen = profile.get(PROFILE_LAST_SEEN)
+        self.restore_state(
+            state, dt_util.parse_datetime(last_seen) if last_seen else None
         )
-        self.data[LightState.BRIGHTNESS] = status.brightness
-        self.data[LightState.POWER] = status.on
-        self.data[LightState.RGB] = status.rgb
+        # writes the lamp never got before the restart
+        for key, value in (profile.get(PROFILE_JOURNAL) or {}).items():
+            self._apply_optimistic(LightState(key), value)
+        # circadian mode stays on across restarts and reloads
+        if circadian := profile.get(PROFILE_CIRCADIAN):
+            self.set_circadian(CircadianSettings.from_dict(circadian))
+
+    @callback
+    def _async_unavailable(self, service_info) -> None:
+        """Lamp stopped advertising, it was probably switched off at the wall"""
+        LOGGER.debug("%s stopped advertising", self.address)
+        if self._power_cycled is None:
+            self._power_cycled = self._restore_keys()
+        # once powered again it starts in its default state
+        self._lamp, self._mode = None, None
+        self.stale = True
+        self.async_set_updated_data(self.data)
+
+    def _restore_keys(self) -> list[LightState]:
+        color = LightState.COLORTEMP
+        if self._mode == LightMode.RGB or (
+            self._lamp is not None and self._lamp.temp_level is None
+        ):
+            color = LightState.RGB
+        return [LightState.POWER, color, LightState.BRIGHTNESS]
+
+    @callback
+    def _async_advertised(self, service_info, change) -> None:
+        if self._power_cycled is not None:
+            keys, self._power_cycled = self._power_cycled, None
+            self._power_on(keys)
+
+        if self._pending_sent() or self._client.busy or self._session.locked():
+            return
+        # lamps advertise several times a second, one try per interval is enough
+        now = time.monotonic()
+        if now - self._journal_time < JOURNAL_FLUSH_INTERVAL:
+            return
+        self._journal_time = now
+        self.hass.async_create_task(self._async_flush_journal())
+
+    def _power_on(self, keys: list[LightState]) -> None:
+        """Apply the power-on policy, journaled writes still win"""
+        LOGGER.debug("%s is back, power-on %s", self.address, self._power_on_restore)
+        # the lamp is back for sure, don't wait for the next interval
+        self._journal_time = 0.0
+        if self._power_on_restore == POWER_ON_RESTORE:
+            for key in keys:
+                if key not in self._pending and self.data[key] is not None:
+                    self._apply_optimistic(key, self.data[key])
+        elif self._power_on_restore == POWER_ON_OFF:
+            if LightState.POWER not in self._pending:
+                self._apply_optimistic(LightState.POWER, False)
+            self.async_set_updated_data(self.data)
+        else:
+            # show what the lamp does now
+            self._scheduler.poll_soon(self, 0)
+
+    async def _async_flush_journal(self) -> None:
+        with self.tracer.span("flush_journal"):
+            await self._async_flush_pending()
+
+    async def _client_status_updated(self, status: ResponseStatus) -> None:
+        if self._probing:
+            return
+        # status is the client's buffer, it's overwritten by the next one
+        reported = self._reported
+        reported.power = status.on
+        reported.brightness = status.brightness
+        reported.rgb = self._requested_rgb(status.rgb)
+        reported.color_temp = None
+        if status.temp_level is not None:
+            reported.color_temp = ColorTempLevelUtil.level_to_color_temp(
+                status.temp_level
+            )
 
+        retry = False
+        # a poll changing nothing the entity shows isn't published, pending
+        # writes change out_of_sync either way
+        changed = self.stale or bool(self._pending)
+        for key, pending in list(self._pending.items()):
+            if not pending.sent:
+                # not written yet, status doesn't reflect it
+                continue
+            if self._confirms(key, pending.value, reported.get(key)):
+                del self._pending[key]
+                self.divergent.discard(key)
+            elif pending.attempts < WRITE_MAX_ATTEMPTS:
+                LOGGER.debug(
+                    "%s: %s not confirmed (%s != %s), retrying",
+                    self.address,
+                    key,
+                    reported.get(key),
+                    pending.value,
+                )
+                pending.sent = False
+                retry = True
+            else:
+                LOGGER.warning(
+                    "%s: lamp did not reach %s=%s, reported %s",
+                    self.address,
+                    key,
+                    pending.value,
+                    reported.get(key),
+                )
+                del self._pending[key]
+                self.divergent.add(key)
+
+        for key, value in reported.items():
+            if key not in self._pending:
+                if self.data.get(key) != value:
+                    self._change_time = time.monotonic()
+                    changed = True
+                self.data[key] = value
+
+        if self._lamp is None:
+            self._lamp = status.copy()
+        else:
+            self._lamp.assign(status)
+        # only white mode reports a temperature, rgb and scenes can't be told
+        if status.temp_level is not None:
+            self._mode = LightMode.WHITE
+        elif self._mode == LightMode.WHITE:
+            self._mode = None
+        self.stale = False
+        self.last_seen = dt_util.utcnow()
+        self._status_time = time.monotonic()
         self._request_status_update = False
+        if changed:
+            self.async_set_updated_data(self.data)
+        self._profiles.async_schedule_save()
+
+        if retry and not self._verifying:
+            self._schedule_retry()
+
+    def _requested_rgb(self, rgb: tuple) -> tuple:
+        """State keeps the requested rgb, the lamp shows it calibrated"""
+        requested = self.data.rgb
+        if requested is not None and self.colors.rgb(*requested) == rgb:
+            return requested
+        # changed elsewhere or sent uncalibrated by a preset
+        return rgb
+
+    async def async_load_colors(self) -> None:
+        # building the tables takes a while, keep it off the event loop
+        self.colors = await self.hass.async_add_executor_job(
+            color_tables, self.calibration
+        )
+
+    def restore_state(self, state: dict, last_seen: dt.datetime | None) -> None:
+        """Seed state from last run until the device reports its own"""
+        if not self.stale or self._pending:
+            return
+
+        for key in LightState:
+            if state.get(key) is not None:
+                self.data[key] = state[key]
+        self.last_seen = last_seen
         self.async_set_updated_data(self.data)
 
-    def _set_poll_mode(self, fast: bool):
-        self._fast_poll_count = 0 if fast else -1
-        interval = self._fast_poll_interval if fast else self._normal_poll_interval
-        self.update_interval = dt.timedelta(seconds=interval)
-        self._schedule_refresh()
+    @staticmethod
+    def _confirms(key: LightState, requested, reported) -> bool:
+        if reported is None:
+            return False
+        if key == LightState.BRIGHTNESS:
+            # lamp never goes below 1
+            return max(int(requested), 1) == reported
+        if key == LightState.RGB:
+            return tuple(requested) == tuple(reported)
+        return requested == reported
 
-    def _update_poll(self):
-        if self._fast_poll_count > -1:
-            self._fast_poll_count += 1
-            if self._fast_poll_count > 1:
-                self._set_poll_mode(fast=False)
+    @property
+    def poll_interval(self) -> float:
+        """Seconds between polls, longer while the lamp is off or left alone"""
+        if not self.is_on:
+            return self._normal_poll_interval * OFF_POLL_FACTOR
+        if time.monotonic() - self._change_time > IDLE_AFTER:
+            return self._normal_poll_interval * IDLE_POLL_FACTOR
+        return self._normal_poll_interval
+
+    @property
+    def status_age(self) -> float | None:
+        if self._status_time is None:
+            return None
+        return time.monotonic() - self._status_time
 
     async def _disconnect(self):
         await self._client.disconnect()
 
     async def async_update(self):
         # skip update if we are sending commands right now
-        if self._client.busy:
-            self._set_poll_mode(fast=True)
+        if self._client.busy or self._session.locked():
+            self._scheduler.poll_soon(self, self._fast_poll_interval)
             return self.data
 
-        self._update_poll()
-
         if not self._initialized:
             await self._initialize()
 
         try:
+            flush = False
             if (not self._client.waiting_status_update) or self._request_status_update:
-                if await self._client.connect():
-                    await self._client.request_status_update()
+                async with self._session:
+                    if await self._client.connect():
+                        await self._async_load_capabilities()
+                        if self._pending_sent():
+                            await self._client.request_status_update()
+                        else:
+                            flush = True
+            if flush:
+                # reconnected, journaled writes go in their own session
+                await self._async_flush_pending()
 
             # do not keep constant connection to the device
             await self._disconnect()
@@ -120,6 +509,34 @@ class LightCoordinator(DataUpdateCoordinator):
 
         return self.data
 
+    async def _async_load_capabilities(self) -> None:
+        """Probe the firmware once per version, lamps with the same one share it"""
+        version = self._client.device_version
+        if version is None or version == self._capabilities_version:
+            return
+
+        known = self.hass.data[DOMAIN].setdefault(DATA_CAPABILITIES, {})
+        if version not in known:
+            # claimed, other lamps keep the baseline until the probe is done
+            known[version] = None
+            self._probing = True
+            try:
+                with self.tracer.span("probe_capabilities", version=version):
+                    capabilities = await probe_capabilities(self._client, self._mode)
+            finally:
+                self._probing = False
+            # the lamp is put back, what it shows now is reported once
+            await self._client.request_status()
+            if capabilities is None:
+                del known[version]
+                return
+            known[version] = capabilities
+
+        if (capabilities := known[version]) is not None:
+            self._client.capabilities = capabilities
+            self._capabilities_version = version
+            self._profiles.async_schedule_save()
+
     async def _initialize(self):
         try:
             if self._client.service_info is not None:
@@ -135,17 +552,160 @@ class LightCoordinator(DataUpdateCoordinator):
             LOGGER.warning("Failed to initialize %s: %s", self.address, str(e))
 
     @property
-    def state(self) -> dict:
+    def state(self) -> LampState:
         return self.data
 
+    @property
+    def pending(self) -> set[LightState]:
+        """Attributes written or to be written, not confirmed by the lamp yet"""
+        return set(self._pending)
+
+    @property
+    def client(self) -> LightBtClient:
+        return self._client
+
+    @property
+    def tracer(self) -> Tracer:
+        return self._client.tracer
+
+    async def async_trace(self, duration: int) -> None:
+        """Trace the command pipeline of the device for duration seconds"""
+        if self.tracer.enabled:
+            raise RuntimeError("Tracing is already running!")
+
+        self.tracer.start()
+        LOGGER.info("Tracing %s for %s seconds", self.address, duration)
+        job = HassJob(
+            self._async_stop_trace,
+            "async_stop_trace",
+            job_type=HassJobType.Coroutinefunction,
+        )
+        self._unsub_trace = event.async_call_later(
+            self.hass, dt.timedelta(seconds=duration), job
+        )
+
+    async def _async_stop_trace(self, date=None) -> None:
+        self._unsub_trace = None
+        if not self.tracer.enabled:
+            return
+
+        events = self.tracer.stop()
+        name = self.address.replace(":", "").lower()
+        stamp = dt_util.now().strftime("%Y%m%d%H%M%S")
+        path = self.hass.config.path(f"ilink_light_{name}_{stamp}.trace.json")
+        await self.hass.async_add_executor_job(self.tracer.export, path, events)
+        LOGGER.info("Traced %s spans of %s to %s", len(events), self.address, path)
+
+    @property
+    def is_on(self) -> bool:
+        return self.data[LightState.POWER]
+
+    def set_circadian(self, settings: CircadianSettings | None) -> None:
+        """Follow the sun with given settings, None turns it off"""
+        if self.circadian is not None:
+            self.circadian.stop()
+            self.circadian = None
+        if settings is not None:
+            self.circadian = CircadianController(self.hass, self, settings)
+            self.circadian.start()
+        self._profiles.async_schedule_save()
+
+    async def async_apply_circadian(self, level: int, brightness: int) -> bool:
+        return await self.async_update_states(
+            {
+                LightState.COLORTEMP: ColorTempLevelUtil.level_to_color_temp(level),
+                LightState.BRIGHTNESS: brightness,
+            },
+            manual=False,
+        )
+
+    async def async_prewarm(self, hold: float) -> bool:
+        """Connect ahead of expected use, released after hold seconds"""
+        self._client.hold(hold)
+        if self._unsub_release:
+            self._unsub_release()
+        job = HassJob(
+            self._async_release,
+            "async_release",
+            job_type=HassJobType.Coroutinefunction,
+        )
+        self._unsub_release = event.async_call_later(
+            self.hass, dt.timedelta(seconds=hold), job
+        )
+
+        LOGGER.debug("Pre-warming connection to %s for %ss", self.address, hold)
+        return await self._client.connect()
+
+    async def _async_release(self, date=None) -> None:
+        self._unsub_release = None
+        self._client.release()
+        await self._disconnect()
+
+    async def async_capture(self, duration: int) -> None:
+        """Record BLE traffic of the device for duration seconds"""
+        if self._client.recorder is not None:
+            raise RuntimeError("Capture is already running!")
+
+        name = self.address.replace(":", "").lower()
+        stamp = dt_util.now().strftime("%Y%m%d%H%M%S")
+        path = self.hass.config.path(f"ilink_light_{name}_{stamp}.cap")
+        self._client.recorder = TrafficRecorder(path)
+        LOGGER.info("Capturing %s traffic for %s seconds", self.address, duration)
+
+        job = HassJob(
+            self._async_stop_capture,
+            "async_stop_capture",
+            job_type=HassJobType.Coroutinefunction,
+        )
+        self._unsub_capture = event.async_call_later(
+            self.hass, dt.timedelta(seconds=duration), job
+        )
+
+    async def _async_stop_capture(self, date=None) -> None:
+        self._unsub_capture = None
+        recorder = self._client.recorder
+        if recorder is None:
+            return
+
+        self._client.recorder = None
+        await self.hass.async_add_executor_job(recorder.save)
+        LOGGER.info(
+            "Captured %s records of %s to %s",
+            recorder.count,
+            self.address,
+            recorder.path,
+        )
+
     async def async_update_state(self, key: LightState, value) -> bool:
+        return await self.async_update_states({key: value})
+
+    async def async_update_states(self, changes: dict, manual: bool = True) -> bool:
+        """Apply all requested attributes and send them in one go"""
+        with self.tracer.span("update_state", changes=changes, manual=manual):
+            return await self._async_update_states(changes, manual)
+
+    async def _async_update_states(self, changes: dict, manual: bool) -> bool:
+        self._change_time = time.monotonic()
+        if manual and self.circadian is not None:
+            if changes.keys() - {LightState.POWER}:
+                self.circadian.manual_change()
+            elif changes.get(LightState.POWER) and not self.is_on:
+                self.circadian.turned_on()
+
+        for key, value in changes.items():
+            if key == SCENE:
+                self._scene = int(value)
+            elif isinstance(key, LightState):
+                self._apply_optimistic(key, value)
+        self.async_set_updated_data(self.data)
+
         if self._unsub_update_state:
             self._unsub_update_state()
             self._unsub_update_state = None
 
         if self._client.busy:
             job = HassJob(
-                functools.partial(self._async_update_state_debounced, key, value),
+                self._async_update_state_debounced,
                 "async_update_state",
                 job_type=HassJobType.Coroutinefunction,
             )
@@ -153,6 +713,7 @@ class LightCoordinator(DataUpdateCoordinator):
             self._unsub_update_state = event.async_call_later(
                 self.hass, dt.timedelta(seconds=1), job
             )
+            self.tracer.instant("debounce")
             self._concurent_update_state += 1
             if self._concurent_update_state > 9:
                 # 1/10 let's make try to call it anyway
@@ -162,64 +723,300 @@ class LightCoordinator(DataUpdateCoordinator):
                     "Not able to send Command - device is busy! Try again later!"
                 )
         else:
-            await self._async_update_state(key, value)
+            return await self._async_flush_pending()
 
-    async def _async_update_state_debounced(self, date, key: LightState, value) -> bool:
+    async def async_apply_preset(self, preset: Preset) -> bool:
+        """Send pre-encoded preset frames as one batch"""
+        changes = self._state_changes(preset.state)
+        if self.circadian is not None:
+            self.circadian.manual_change()
+        if self._client.busy:
+            # planned path sends it once the device is free
+            return await self.async_update_states(changes)
+
+        for key, value in changes.items():
+            if isinstance(key, LightState):
+                self._apply_optimistic(key, value)
+        self.async_set_updated_data(self.data)
+
+        return await self._async_flush_pending(preset)
+
+    @staticmethod
+    def _state_changes(state: DesiredState) -> dict:
+        changes = {}
+        if state.on is not None:
+            changes[LightState.POWER] = state.on
+        if state.temp_level is not None:
+            changes[LightState.COLORTEMP] = ColorTempLevelUtil.level_to_color_temp(
+                state.temp_level
+            )
+        if state.rgb is not None:
+            changes[LightState.RGB] = state.rgb
+        if state.scene is not None:
+            changes[SCENE] = state.scene
+        if state.brightness is not None:
+            changes[LightState.BRIGHTNESS] = state.brightness
+        return changes
+
+    def _apply_optimistic(self, key: LightState, value) -> None:
+        if key == LightState.COLORTEMP:
+            level = ColorTempLevelUtil.color_temp_to_level(int(value))
+            value = ColorTempLevelUtil.level_to_color_temp(level)
+            # last requested color mode wins
+            self._pending.pop(LightState.RGB, None)
+        elif key == LightState.RGB:
+            value = tuple(value)
+            self._pending.pop(LightState.COLORTEMP, None)
+        elif key == LightState.BRIGHTNESS:
+            value = int(value)
+
+        pending = self._pending.get(key)
+        previous = pending.previous if pending else self.data.get(key)
+        self._pending[key] = PendingWrite(value, previous)
+        self.divergent.discard(key)
+
+        self.data[key] = value
+
+    async def _async_update_state_debounced(self, date) -> bool:
         self._unsub_update_state = None
         self._concurent_update_state = 0
-        LOGGER.debug(
-            "_async_update_state_debounced date:%s, %s - %s", date, key, value
-        )
-        await self._async_update_state(key, value)
+        LOGGER.debug("_async_update_state_debounced date:%s", date)
+        with self.tracer.span("update_state_debounced"):
+            await self._async_flush_pending()
+
+    async def _async_flush_pending(self, preset: Preset | None = None) -> bool:
+        # overlapping sessions would take each other's verification status
+        async with self._session:
+            return await self._async_write_session(preset)
 
-    async def _async_update_state(self, key: LightState, value) -> bool:
+    async def _async_write_session(self, preset: Preset | None) -> bool:
         self._request_status_update = True
-        await self.ensure_connected()
-
-        # Write data back
-        match key:
-            case LightState.BRIGHTNESS:
-                await self._client.set_brightness(int(value))
-            case LightState.COLORTEMP:
-                kelvin = int(value)
-                level = ColorTempLevelUtil.color_temp_to_level(kelvin)
-                value = ColorTempLevelUtil.level_to_color_temp(level)
-                await self._client.set_white_temp(level)
-                await asyncio.sleep(0.03)
-                await self._client.set_brightness(
-                    int(self.state[LightState.BRIGHTNESS])
-                )
-            case LightState.RGB:
-                await self._client.set_rgb(value[0], value[1], value[2])
-                await asyncio.sleep(0.03)
-                # set brightness again as it's lost when color is set
-                await self._client.set_brightness(
-                    int(self.state[LightState.BRIGHTNESS])
-                )
-            case LightState.POWER:
-                if value:
-                    await self._client.turn_on()
+        if not await self._async_connect_for_write():
+            return False
+        if preset is None and self._scene is None and self._pending_sent():
+            return True
+
+        self._verifying = True
+        try:
+            for attempt in range(WRITE_MAX_ATTEMPTS):
+                if preset is not None and attempt == 0:
+                    written = await self._async_write_preset(preset)
+                    written = written and await self._async_write_pending()
                 else:
-                    await self._client.turn_off()
-            case "scene":
-                await self._client.set_scene(int(value))
-            case _:
-                return False
+                    written = await self._async_write_pending()
+                if not written:
+                    break
+
+                # one status request at the end of the session verifies the writes,
+                # the status handler marks mismatched attributes unsent again
+                with self.tracer.span("verify", attempt=attempt):
+                    status = await self._client.request_status()
+                if status is None:
+                    # no answer, next regular poll confirms it
+                    break
+                if self._pending_sent() or not await self._async_connect_for_write():
+                    break
+        finally:
+            self._verifying = False
 
-        self.state[key] = value
+        if not self._pending_sent():
+            self._schedule_retry()
+        self._schedule_idle_disconnect()
 
-        LOGGER.info("async_update_state: %s - %s", key, value)
+        return True
 
-        self.async_set_updated_data(self.state)
-        self._set_poll_mode(fast=True)
+    @asynccontextmanager
+    async def async_take_over(self):
+        """Hand the client out for frames sent around the planner, polls wait
+
+        The lamp is asked for its state afterwards, planning starts from that.
+        """
+        if self.circadian is not None:
+            self.circadian.manual_change()
+        # polls and other sessions wait until it's handed back
+        async with self._session:
+            try:
+                yield self._client
+            finally:
+                self._lamp, self._mode = None, None
+                self._client.release()
+                if self._client.is_connected():
+                    await self._client.request_status()
+                await self._disconnect()
+
+    async def async_release_connection(self) -> None:
+        """Disconnect now instead of waiting for follow-up commands"""
+        if self._unsub_disconnect:
+            self._unsub_disconnect()
+            self._unsub_disconnect = None
+        await self._disconnect()
+
+    def _schedule_idle_disconnect(self) -> None:
+        """Keep the connection a moment for follow-up commands, then drop it"""
+        if self._unsub_disconnect:
+            self._unsub_disconnect()
+        job = HassJob(
+            self._async_idle_disconnect,
+            "async_idle_disconnect",
+            job_type=HassJobType.Coroutinefunction,
+        )
+        self._unsub_disconnect = event.async_call_later(
+            self.hass, dt.timedelta(seconds=self._fast_poll_interval), job
+        )
+
+    async def _async_idle_disconnect(self, date) -> None:
+        self._unsub_disconnect = None
+        await self._disconnect()
+
+    async def _async_connect_for_write(self) -> bool:
+        try:
+            await self.ensure_connected()
+        except ConnectionError:
+            # not a failed write, kept until the lamp advertises or reconnects
+            LOGGER.info("%s not reachable, command is sent once it is", self.address)
+            self._profiles.async_schedule_save()
+            return False
+        return True
+
+    def _pending_sent(self) -> bool:
+        return all(pending.sent for pending in self._pending.values())
+
+    async def _async_write_preset(self, preset: Preset) -> bool:
+        written = [
+            pending
+            for key in self._state_changes(preset.state)
+            if (pending := self._pending.get(key)) is not None and not pending.sent
+        ]
+        for pending in written:
+            pending.attempts += 1
+        if not await self._client.send_frames(preset.frames):
+            return False
+
+        for pending in written:
+            pending.sent = True
+        self._lamp, self._mode = apply_state(preset.state, self._lamp, self._mode)
+        LOGGER.info("async_apply_preset: %s - %s", self.address, preset.name)
 
         return True
 
+    async def _async_write_pending(self) -> bool:
+        """Send unsent attributes as one planned sequence, False if it failed"""
+        unsent = {key: p for key, p in self._pending.items() if not p.sent}
+        scene, self._scene = self._scene, None
+        if not unsent and scene is None:
+            return True
+
+        desired = DesiredState(scene=scene)
+        if LightState.POWER in unsent:
+            desired.on = unsent[LightState.POWER].value
+        if LightState.COLORTEMP in unsent:
+            desired.temp_level = ColorTempLevelUtil.color_temp_to_level(
+                unsent[LightState.COLORTEMP].value
+            )
+        if LightState.RGB in unsent:
+            # calibrated only on the way to the lamp
+            desired.rgb = self.colors.rgb(*unsent[LightState.RGB].value)
+        if LightState.BRIGHTNESS in unsent:
+            desired.brightness = unsent[LightState.BRIGHTNESS].value
+
+        frames = plan_frames(
+            desired,
+            self._lamp,
+            self._mode,
+            int(self.data[LightState.BRIGHTNESS]),
+            self._client.capabilities.color_keeps_brightness,
+        )
+        for pending in unsent.values():
+            pending.attempts += 1
+        if frames and not await self._client.send_commands(frames):
+            return False
+
+        for pending in unsent.values():
+            pending.sent = True
+        self._lamp, self._mode = apply_state(desired, self._lamp, self._mode)
+        LOGGER.info(
+            "async_update_state: %s scene %s in %s frames",
+            {key: p.value for key, p in unsent.items()},
+            scene,
+            len(frames),
+        )
+
+        return True
+
+    def _schedule_retry(self) -> None:
+        if self._unsub_retry:
+            return
+
+        rollback = [
+            key
+            for key, pending in self._pending.items()
+            if not pending.sent and pending.attempts >= WRITE_MAX_ATTEMPTS
+        ]
+        for key in rollback:
+            self._rollback(key)
+        if rollback:
+            self.async_set_updated_data(self.data)
+        if not self._pending:
+            return
+
+        job = HassJob(
+            self._async_retry_pending,
+            "async_retry_pending",
+            job_type=HassJobType.Coroutinefunction,
+        )
+        self._unsub_retry = event.async_call_later(
+            self.hass, dt.timedelta(seconds=WRITE_RETRY_DELAY), job
+        )
+
+    def _rollback(self, key: LightState) -> None:
+        pending = self._pending.pop(key)
+        LOGGER.warning(
+            "%s: giving up on %s=%s, rolling back to %s",
+            self.address,
+            key,
+            pending.value,
+            pending.previous,
+        )
+        self.data[key] = pending.previous
+        self.divergent.add(key)
+
+    async def _async_retry_pending(self, date) -> None:
+        self._unsub_retry = None
+        if self._pending_sent():
+            return
+        if self._client.busy:
+            self._schedule_retry()
+            return
+        await self._async_flush_pending()
+
     async def ensure_connected(self):
         # Make sure we are connected
         if not await self._client.connect():
             raise ConnectionError("Not connected!")
 
     async def async_shutdown(self) -> None:
+        self._unsub_advertisement()
+        self._unsub_unavailable()
+        self._scheduler.remove(self)
+        self._profiles.remove(self)
+        if self.circadian is not None:
+            # settings stay in the profile, only the timer goes
+            self.circadian.stop()
+        if self._unsub_release:
+            self._unsub_release()
+            self._unsub_release = None
+        if self._unsub_disconnect:
+            self._unsub_disconnect()
+            self._unsub_disconnect = None
+        self._client.release()
+        if self._unsub_retry:
+            self._unsub_retry()
+            self._unsub_retry = None
+        if self._unsub_capture:
+            self._unsub_capture()
+            await self._async_stop_capture()
+        if self._unsub_trace:
+            self._unsub_trace()
+            await self._async_stop_trace()
         await self._client.disconnect(force=True)
         await super().async_shutdown()
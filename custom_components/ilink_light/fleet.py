@@ -0,0 +1,258 @@
+"""Snapshots, bulk changes and choreographies of many lights at once."""
+import asyncio
+from contextlib import AsyncExitStack
+from functools import partial
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.components.light import (
+    ATTR_BRIGHTNESS,
+    ATTR_COLOR_TEMP_KELVIN,
+    ATTR_EFFECT,
+    ATTR_HS_COLOR,
+    ATTR_RGB_COLOR,
+    ATTR_XY_COLOR,
+    DOMAIN as LIGHT_DOMAIN,
+)
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv, entity_platform
+
+from .const import DATA_SNAPSHOTS, DEFAULT_BULK_CONCURRENCY, DOMAIN, LOGGER
+from .coordinator import LightState
+from .ilink_ble.choreography import Pattern, compile_choreography, run_choreography
+from .resolver import HassDeviceResolver
+
+SERVICE_SNAPSHOT_CREATE = "snapshot_create"
+SERVICE_SNAPSHOT_RESTORE = "snapshot_restore"
+SERVICE_BULK_SET = "bulk_set"
+SERVICE_CHOREOGRAPHY = "choreography"
+
+ATTR_SNAPSHOT = "snapshot"
+ATTR_LIGHTS = "lights"
+ATTR_SUCCESS = "success"
+ATTR_PENDING = "pending"
+ATTR_OUT_OF_SYNC = "out_of_sync"
+ATTR_ERROR = "error"
+ATTR_PATTERN = "pattern"
+ATTR_COLORS = "colors"
+ATTR_STEP = "step"
+ATTR_CYCLES = "cycles"
+
+RGB_SCHEMA = vol.All(vol.ExactSequence((cv.byte, cv.byte, cv.byte)), vol.Coerce(tuple))
+
+LIGHT_STATE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(LightState.POWER.value, default=True): cv.boolean,
+        vol.Optional(ATTR_BRIGHTNESS): cv.byte,
+        vol.Exclusive(ATTR_COLOR_TEMP_KELVIN, "color"): cv.positive_int,
+        vol.Exclusive(ATTR_RGB_COLOR, "color"): RGB_SCHEMA,
+        vol.Exclusive(ATTR_HS_COLOR, "color"): vol.All(
+            vol.ExactSequence(
+                (
+                    vol.All(vol.Coerce(float), vol.Range(0, 360)),
+                    vol.All(vol.Coerce(float), vol.Range(0, 100)),
+                )
+            ),
+            vol.Coerce(tuple),
+        ),
+        vol.Exclusive(ATTR_XY_COLOR, "color"): vol.All(
+            vol.ExactSequence((cv.small_float, cv.small_float)), vol.Coerce(tuple)
+        ),
+        vol.Exclusive(ATTR_EFFECT, "color"): cv.string,
+    }
+)
+
+
+def _lights(hass: HomeAssistant) -> dict[str, Any]:
+    """Light entities of the integration by entity id"""
+    lights = {}
+    for platform in entity_platform.async_get_platforms(hass, DOMAIN):
+        if platform.domain == LIGHT_DOMAIN:
+            lights.update(platform.entities)
+    return lights
+
+
+def _selected(lights: dict[str, Any], entity_ids: list[str]) -> dict[str, Any]:
+    if unknown := set(entity_ids) - lights.keys():
+        raise ServiceValidationError(f"Not iLink lights: {', '.join(sorted(unknown))}")
+    return {entity_id: lights[entity_id] for entity_id in entity_ids}
+
+
+def _concurrency() -> int:
+    """Lamps changed at once, as many as there are free connection slots"""
+    free = HassDeviceResolver.free_slots()
+    return max(free, 1) if free is not None else DEFAULT_BULK_CONCURRENCY
+
+
+async def _async_apply(light, state: dict[str, Any]) -> dict[str, Any]:
+    coordinator = light.coordinator
+    try:
+        await light.async_apply(state)
+    except Exception as e:
+        LOGGER.warning("Setting %s failed: %s", light.entity_id, e)
+        return {ATTR_SUCCESS: False, ATTR_ERROR: str(e) or type(e).__name__}
+    finally:
+        # the slot is needed by the next lamp
+        await coordinator.async_release_connection()
+
+    pending = sorted(coordinator.pending)
+    out_of_sync = sorted(coordinator.divergent)
+    return {
+        ATTR_SUCCESS: not pending and not out_of_sync,
+        ATTR_PENDING: pending,
+        ATTR_OUT_OF_SYNC: out_of_sync,
+    }
+
+
+async def async_apply_states(
+    hass: HomeAssistant, states: dict[str, dict[str, Any]]
+) -> dict[str, Any]:
+    """Apply a state per light, returns what each lamp confirmed"""
+    lights = _lights(hass)
+    limit = asyncio.Semaphore(_concurrency())
+
+    async def _apply(entity_id: str, state: dict[str, Any]) -> dict[str, Any]:
+        if (light := lights.get(entity_id)) is None:
+            return {ATTR_SUCCESS: False, ATTR_ERROR: "not an iLink light"}
+        async with limit:
+            return await _async_apply(light, state)
+
+    results = await asyncio.gather(
+        *(_apply(entity_id, state) for entity_id, state in states.items())
+    )
+    return {ATTR_LIGHTS: dict(zip(states, results))}
+
+
+async def _async_snapshot_create(
+    hass: HomeAssistant, call: ServiceCall
+) -> ServiceResponse:
+    lights = _lights(hass)
+    if (entity_ids := call.data.get(ATTR_ENTITY_ID)) is not None:
+        lights = _selected(lights, entity_ids)
+
+    snapshot = {entity_id: light.snapshot() for entity_id, light in lights.items()}
+    hass.data[DOMAIN][DATA_SNAPSHOTS][call.data[ATTR_SNAPSHOT]] = snapshot
+    return {ATTR_LIGHTS: snapshot}
+
+
+async def _async_snapshot_restore(
+    hass: HomeAssistant, call: ServiceCall
+) -> ServiceResponse:
+    name = call.data[ATTR_SNAPSHOT]
+    if (snapshot := hass.data[DOMAIN][DATA_SNAPSHOTS].get(name)) is None:
+        raise ServiceValidationError(f"Unknown snapshot {name}")
+    if (entity_ids := call.data.get(ATTR_ENTITY_ID)) is not None:
+        snapshot = {
+            entity_id: state
+            for entity_id, state in snapshot.items()
+            if entity_id in entity_ids
+        }
+    return await async_apply_states(hass, snapshot)
+
+
+async def _async_bulk_set(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    return await async_apply_states(hass, call.data[ATTR_LIGHTS])
+
+
+async def _async_play(
+    hass: HomeAssistant, lights: dict[str, Any], data: dict
+) -> dict[str, Any]:
+    """Connect all lamps, then send frames on one clock for all of them"""
+    coordinators = [light.coordinator for light in lights.values()]
+    choreography = await hass.async_add_executor_job(
+        compile_choreography,
+        data[ATTR_PATTERN],
+        data[ATTR_COLORS],
+        data[ATTR_STEP],
+        data[ATTR_CYCLES],
+        [coordinator.colors.rgb for coordinator in coordinators],
+        data.get(ATTR_BRIGHTNESS),
+    )
+    async with AsyncExitStack() as stack:
+        clients = [
+            await stack.enter_async_context(coordinator.async_take_over())
+            for coordinator in coordinators
+        ]
+        runs = await run_choreography(clients, choreography)
+    return {
+        ATTR_LIGHTS: {entity_id: run.as_dict() for entity_id, run in zip(lights, runs)}
+    }
+
+
+async def _async_choreography(
+    hass: HomeAssistant, call: ServiceCall
+) -> ServiceResponse:
+    lights = _selected(_lights(hass), call.data[ATTR_ENTITY_ID])
+    if not call.return_response:
+        hass.async_create_background_task(
+            _async_play(hass, lights, call.data), f"{DOMAIN} choreography"
+        )
+        return None
+    return await _async_play(hass, lights, call.data)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Fleet services, snapshots are kept until Home Assistant restarts"""
+    hass.data[DOMAIN][DATA_SNAPSHOTS] = {}
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SNAPSHOT_CREATE,
+        partial(_async_snapshot_create, hass),
+        vol.Schema(
+            {
+                vol.Required(ATTR_SNAPSHOT): cv.string,
+                vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+            }
+        ),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SNAPSHOT_RESTORE,
+        partial(_async_snapshot_restore, hass),
+        vol.Schema(
+            {
+                vol.Required(ATTR_SNAPSHOT): cv.string,
+                vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+            }
+        ),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BULK_SET,
+        partial(_async_bulk_set, hass),
+        vol.Schema({vol.Required(ATTR_LIGHTS): {cv.entity_id: LIGHT_STATE_SCHEMA}}),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CHOREOGRAPHY,
+        partial(_async_choreography, hass),
+        vol.Schema(
+            {
+                # order of the lights is the order of the effect
+                vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+                vol.Required(ATTR_PATTERN): vol.Coerce(Pattern),
+                vol.Optional(
+                    ATTR_COLORS, default=[(255, 255, 255), (0, 0, 0)]
+                ): vol.All([RGB_SCHEMA], vol.Length(1, 2)),
+                vol.Optional(ATTR_STEP, default=0.5): vol.All(
+                    vol.Coerce(float), vol.Range(0.05, 60)
+                ),
+                vol.Optional(ATTR_CYCLES, default=10): vol.All(
+                    vol.Coerce(int), vol.Range(1, 1000)
+                ),
+                vol.Optional(ATTR_BRIGHTNESS): cv.byte,
+            }
+        ),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
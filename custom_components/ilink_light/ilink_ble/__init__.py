@@ -0,0 +1,41 @@
+"""asyncio client for iLink BLE lamps, usable without Home Assistant.
+
+    PYTHONPATH=custom_components/ilink_light python -m ilink_ble --help
+"""
+from .capabilities import Capabilities, probe_capabilities
+from .client import LightBtClient
+from .commands import (
+    SERVICE_UUID,
+    ColorTempLevelUtil,
+    Commands,
+    Response,
+    ResponseStatus,
+    Scenes,
+)
+from .planner import DesiredState, LightMode, apply_state, plan_frames
+from .resolver import (
+    BleakResolver,
+    DeviceResolver,
+    ServiceInfo,
+    is_ilink_advertisement,
+)
+
+__all__ = [
+    "SERVICE_UUID",
+    "BleakResolver",
+    "Capabilities",
+    "ColorTempLevelUtil",
+    "Commands",
+    "DesiredState",
+    "DeviceResolver",
+    "LightBtClient",
+    "LightMode",
+    "Response",
+    "ResponseStatus",
+    "Scenes",
+    "ServiceInfo",
+    "apply_state",
+    "is_ilink_advertisement",
+    "plan_frames",
+    "probe_capabilities",
+]
@@ -0,0 +1,205 @@
+"""Command line access to iLink lamps.
+
+    python -m ilink_ble scan
+    python -m ilink_ble status AA:BB:CC:DD:EE:FF
+    python -m ilink_ble set AA:BB:CC:DD:EE:FF --on --temp-level 3 --brightness 200
+    python -m ilink_ble stream AA:BB:CC:DD:EE:FF --interval 5
+    python -m ilink_ble benchmark AA:BB:CC:DD:EE:FF --count 20
+    python -m ilink_ble simulate --lamps 50 200 500 --slots 3
+    python -m ilink_ble replay ilink_light_aabbccddeeff_20240101120000.cap
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+
+from .capture import read_capture
+from .client import LightBtClient
+from .commands import ResponseStatus, Scenes
+from .planner import DesiredState, plan_frames
+from .replay import replay_capture
+from .resolver import BleakResolver
+from .simulation import simulate_fleet
+
+
+def _status_json(status: ResponseStatus | None) -> str:
+    return json.dumps(status.as_dict() if status is not None else None)
+
+
+def _summary(name: str, values: list[float]) -> str:
+    if not values:
+        return f"{name}: no samples"
+    values = sorted(values)
+    p95 = values[min(round(len(values) * 0.95), len(values) - 1)]
+    return (
+        f"{name}: n={len(values)} min={values[0] * 1000:.1f}ms"
+        f" median={statistics.median(values) * 1000:.1f}ms"
+        f" p95={p95 * 1000:.1f}ms max={values[-1] * 1000:.1f}ms"
+    )
+
+
+async def _connected_client(args, callback=None) -> LightBtClient:
+    client = LightBtClient(args.address, callback, BleakResolver(args.timeout))
+    if not await client.connect(retries=args.retries):
+        raise SystemExit(f"Not able to connect to {args.address}")
+    return client
+
+
+async def _scan(args) -> None:
+    for info in await BleakResolver().async_scan(args.timeout):
+        print(f"{info.address}\t{info.rssi}\t{info.name}")
+
+
+async def _status(args) -> None:
+    client = await _connected_client(args)
+    try:
+        print(_status_json(await client.request_status(args.timeout)))
+    finally:
+        await client.disconnect(force=True)
+
+
+async def _set(args) -> None:
+    scene = args.scene
+    if scene is not None and not scene.isdigit():
+        if (scene := Scenes.name_to_id(scene)) is None:
+            raise SystemExit(f"Unknown scene {args.scene}")
+    desired = DesiredState(
+        on=args.on,
+        temp_level=args.temp_level,
+        rgb=tuple(args.rgb) if args.rgb else None,
+        brightness=args.brightness,
+        scene=int(scene) if scene is not None else None,
+    )
+
+    client = await _connected_client(args)
+    try:
+        known = await client.request_status(args.timeout)
+        brightness = known.brightness if known is not None else 255
+        frames = plan_frames(desired, known, None, brightness)
+        if frames and not await client.send_commands(frames):
+            raise SystemExit("Sending failed")
+        print(_status_json(await client.request_status(args.timeout)))
+    finally:
+        await client.disconnect(force=True)
+
+
+async def _stream(args) -> None:
+    async def _print(status: ResponseStatus) -> None:
+        print(_status_json(status), flush=True)
+
+    client = await _connected_client(args, _print)
+    try:
+        while True:
+            if not client.is_connected() and not await client.connect(args.retries):
+                await asyncio.sleep(args.interval)
+                continue
+            await client.request_status_update()
+            await asyncio.sleep(args.interval)
+    finally:
+        await client.disconnect(force=True)
+
+
+async def _benchmark(args) -> None:
+    resolver = BleakResolver(args.timeout)
+    connects, writes, round_trips = [], [], []
+    for _ in range(args.count):
+        client = LightBtClient(args.address, resolver=resolver)
+        start = time.monotonic()
+        if not await client.connect(retries=args.retries):
+            print("connect failed", file=sys.stderr)
+            continue
+        connects.append(time.monotonic() - start)
+        # initialize already requested status, wait for it before measuring
+        status = await client.request_status(args.timeout)
+        for _ in range(args.frames):
+            start = time.monotonic()
+            if await client.request_status(args.timeout) is not None:
+                round_trips.append(time.monotonic() - start)
+            if status is not None:
+                # same brightness again, lamp does not visibly change
+                start = time.monotonic()
+                if await client.set_brightness(status.brightness):
+                    writes.append(time.monotonic() - start)
+        await client.disconnect(force=True)
+
+    print(_summary("connect", connects))
+    print(_summary("write", writes))
+    print(_summary("status round trip", round_trips))
+
+
+async def _simulate(args) -> None:
+    for lamps in args.lamps:
+        report = await simulate_fleet(lamps, args.slots, args.duration, args.rate)
+        print(json.dumps(report.as_dict()), flush=True)
+
+
+async def _replay(args) -> None:
+    for path in args.captures:
+        report = await replay_capture(read_capture(path), args.speed)
+        print(json.dumps({"capture": path, **report.as_dict()}), flush=True)
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="ilink_ble", description=__doc__.strip())
+    parser.formatter_class = argparse.RawDescriptionHelpFormatter
+    parser.add_argument("-v", "--verbose", action="store_true")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--retries", type=int, default=3)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("scan").set_defaults(run=_scan)
+    commands.add_parser("status").set_defaults(run=_status)
+
+    command = commands.add_parser("set")
+    command.set_defaults(run=_set, on=None)
+    power = command.add_mutually_exclusive_group()
+    power.add_argument("--on", action="store_true")
+    power.add_argument("--off", dest="on", action="store_false")
+    command.add_argument("--brightness", type=int, choices=range(256), metavar="0-255")
+    command.add_argument("--temp-level", type=int, choices=range(1, 6), metavar="1-5")
+    command.add_argument("--rgb", type=int, nargs=3, metavar=("R", "G", "B"))
+    command.add_argument("--scene", help="scene number or name")
+
+    command = commands.add_parser("stream")
+    command.set_defaults(run=_stream)
+    command.add_argument("--interval", type=float, default=5.0)
+
+    command = commands.add_parser("benchmark")
+    command.set_defaults(run=_benchmark)
+    command.add_argument("--count", type=int, default=5, help="connections")
+    command.add_argument("--frames", type=int, default=10, help="per connection")
+
+    command = commands.add_parser("simulate", help="virtual lamps, no bluetooth")
+    command.set_defaults(run=_simulate)
+    command.add_argument("--lamps", type=int, nargs="+", default=[50, 200, 500])
+    command.add_argument("--slots", type=int, default=3, help="connections at once")
+    command.add_argument("--duration", type=float, default=60.0, help="seconds")
+    command.add_argument("--rate", type=float, default=1.0, help="per lamp a minute")
+
+    command = commands.add_parser("replay", help="capture files, no bluetooth")
+    command.set_defaults(run=_replay)
+    command.add_argument("captures", nargs="+")
+    command.add_argument(
+        "--speed", type=float, default=1.0, help="times faster, 0 doesn't wait"
+    )
+
+    for name, command in commands.choices.items():
+        if name not in ("scan", "simulate", "replay"):
+            command.add_argument("address")
+    return parser
+
+
+def main() -> None:
+    args = _parser().parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    try:
+        asyncio.run(args.run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
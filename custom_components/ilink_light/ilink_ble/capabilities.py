@@ -0,0 +1,134 @@
+"""What a lamp's firmware tolerates, probed once per firmware version."""
+import asyncio
+
+from .commands import Commands, ResponseStatus
+from .const import LOGGER
+from .planner import FRAME_GAP, DesiredState, LightMode, plan_frames
+
+"""gaps tried from the shortest, FRAME_GAP is assumed when all fail"""
+PROBE_GAPS = (0.0, 0.01, 0.02)
+PROBE_TIMEOUT = 2.0
+"""white temperatures the gap probe alternates between"""
+PROBE_TEMP_LEVELS = (2, 4)
+
+
+class Capabilities:
+    def __init__(
+        self,
+        packed_frames: bool = False,
+        color_keeps_brightness: bool = False,
+        frame_gap: float = FRAME_GAP,
+    ):
+        self.frame_gap = frame_gap
+        """several frames may be concatenated into one write"""
+        self.packed_frames = packed_frames
+        """brightness survives a white temperature or rgb change"""
+        self.color_keeps_brightness = color_keeps_brightness
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Capabilities":
+        return cls(**{key: data[key] for key in vars(cls()) if key in data})
+
+
+"""what every lamp handled so far, used until a probe says otherwise"""
+BASELINE = Capabilities()
+
+
+def _probe_brightness(brightness: int) -> int:
+    """A level far enough from the current one to tell them apart"""
+    return 64 if brightness > 128 else 192
+
+
+async def probe_capabilities(
+    client, mode: LightMode | None = None
+) -> Capabilities | None:
+    """Find the fastest strategy the connected lamp supports
+
+    The lamp briefly changes brightness and color and is put back afterwards.
+    mode is what the caller last sent, the status can't tell rgb from a scene.
+    None if the lamp didn't answer or couldn't be put back, i.e. it's off or
+    shows a scene, some other time or lamp is probed then.
+    """
+    original = await client.request_status(PROBE_TIMEOUT)
+    if original is None:
+        return None
+    if not original.on or (original.temp_level is None and mode != LightMode.RGB):
+        LOGGER.debug("%s is off or shows a scene, not probed", client.address)
+        return None
+
+    capabilities = Capabilities()
+    try:
+        # a status frame packed behind another one only answers if both are
+        # parsed, the other one changes the brightness to tell it was applied
+        brightness = _probe_brightness(original.brightness)
+        prefix = bytes.fromhex(Commands.brightness(brightness))
+        status = await client.request_status(PROBE_TIMEOUT, prefix=prefix)
+        capabilities.packed_frames = (
+            status is not None and status.brightness == brightness
+        )
+
+        capabilities.color_keeps_brightness = await _probe_color_keeps_brightness(
+            client, original
+        )
+
+        for gap in PROBE_GAPS:
+            if await _probe_gap(client, original, gap):
+                capabilities.frame_gap = gap
+                break
+    finally:
+        await _restore(client, original)
+
+    LOGGER.debug(
+        "capabilities of %s (%s): %s",
+        client.address,
+        client.device_version,
+        capabilities.as_dict(),
+    )
+    return capabilities
+
+
+async def _probe_color_keeps_brightness(client, original: ResponseStatus) -> bool:
+    brightness = _probe_brightness(original.brightness)
+    for color in (Commands.rgb(*original.rgb), Commands.white_temp(3)):
+        if not await client.send_commands(
+            [Commands.brightness(brightness), color], FRAME_GAP, packed=False
+        ):
+            return False
+        status = await client.request_status(PROBE_TIMEOUT)
+        if status is None or status.brightness != brightness:
+            return False
+    return True
+
+
+async def _probe_gap(client, original: ResponseStatus, gap: float) -> bool:
+    """Temperature and brightness frames alternate, the status shows each one"""
+    brightness = _probe_brightness(original.brightness)
+    # starts from a confirmed state the first round changes both parts of
+    rounds = [
+        (PROBE_TEMP_LEVELS[0], original.brightness, FRAME_GAP),
+        (PROBE_TEMP_LEVELS[1], brightness, gap),
+        (PROBE_TEMP_LEVELS[0], original.brightness, gap),
+    ]
+    for temp_level, level, frame_gap in rounds:
+        frames = [Commands.white_temp(temp_level), Commands.brightness(level)]
+        if not await client.send_commands(frames, frame_gap, packed=False):
+            return False
+        await asyncio.sleep(FRAME_GAP)
+        status = await client.request_status(PROBE_TIMEOUT)
+        shown = status and (status.temp_level, status.brightness)
+        if shown != (temp_level, level):
+            return False
+    return True
+
+
+async def _restore(client, original: ResponseStatus) -> None:
+    desired = DesiredState(
+        on=original.on, brightness=original.brightness, rgb=original.rgb
+    )
+    if original.temp_level:
+        desired.rgb, desired.temp_level = None, original.temp_level
+    frames = plan_frames(desired, None, None, original.brightness)
+    await client.send_commands(frames, FRAME_GAP, packed=False)
@@ -0,0 +1,75 @@
+"""Capture of BLE traffic into a compact binary log.
+
+File layout: magic followed by records, each record is
+  8 bytes  monotonic timestamp (double)
+  1 byte   event
+  2 bytes  payload length
+  n bytes  payload (frame, notification or error message)
+"""
+import struct
+import time
+from enum import IntEnum
+
+CAPTURE_MAGIC = b"ILNKCAP1"
+_record = struct.Struct("<dBH")
+
+
+class CaptureEvent(IntEnum):
+    CONNECTING = 1
+    CONNECT = 2
+    DISCONNECT = 3
+    WRITE = 4
+    ACK = 5
+    NOTIFY = 6
+    ERROR = 7
+
+
+class CaptureRecord:
+    def __init__(self, timestamp: float, event: CaptureEvent, payload: bytes):
+        self.timestamp = timestamp
+        self.event = event
+        self.payload = payload
+
+
+class TrafficRecorder:
+    """Collects records in memory, save() writes them at once"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._buffer = bytearray(CAPTURE_MAGIC)
+        self.count = 0
+
+    def record(self, event: CaptureEvent, payload: bytes = b"") -> None:
+        payload = payload[:0xFFFF]
+        self._buffer += _record.pack(time.monotonic(), event, len(payload))
+        self._buffer += payload
+        self.count += 1
+
+    def error(self, error: Exception) -> None:
+        message = str(error) or type(error).__name__
+        self.record(CaptureEvent.ERROR, message.encode("utf-8", "replace"))
+
+    def save(self) -> None:
+        """Blocking, run it in executor"""
+        with open(self.path, "wb") as file:
+            file.write(self._buffer)
+
+
+def read_capture(path: str) -> list[CaptureRecord]:
+    """Blocking, run it in executor"""
+    with open(path, "rb") as file:
+        data = file.read()
+
+    if not data.startswith(CAPTURE_MAGIC):
+        raise ValueError(f"{path} is not an iLink Light capture")
+
+    records = []
+    offset = len(CAPTURE_MAGIC)
+    while offset + _record.size <= len(data):
+        timestamp, event, length = _record.unpack_from(data, offset)
+        offset += _record.size
+        payload = data[offset : offset + length]
+        records.append(CaptureRecord(timestamp, CaptureEvent(event), payload))
+        offset += length
+
+    return records
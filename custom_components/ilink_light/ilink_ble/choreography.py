@@ -0,0 +1,183 @@
+"""Effects across several lamps, timed by the host instead of each lamp."""
+import asyncio
+import math
+import time
+from enum import StrEnum
+from typing import Callable
+
+from .commands import Commands
+from .planner import FRAME_GAP
+
+"""time the lamps get after the prelude before the first step"""
+START_DELAY = 0.5
+"""connection kept beyond the last step, for preludes and late frames"""
+HOLD_MARGIN = 5.0
+"""wave steps per cycle at least, few lamps still get a smooth wave"""
+WAVE_MIN_STEPS = 8
+
+
+class Pattern(StrEnum):
+    """one lamp after another in the first color, the others in the second"""
+
+    CHASE = "chase"
+    """first color rolls over the lamps, fading into the second"""
+    WAVE = "wave"
+    """every other lamp swaps between both colors"""
+    ALTERNATE = "alternate"
+
+
+def _blend(low: tuple, high: tuple, share: float) -> tuple[int, int, int]:
+    return tuple(round(a + (b - a) * share) for a, b in zip(low, high))
+
+
+def _pattern_colors(
+    pattern: Pattern, lamps: int, colors: list[tuple[int, int, int]]
+) -> list[list[tuple[int, int, int]]]:
+    """Color of every lamp at every step of one cycle"""
+    first, second = colors[0], colors[1] if len(colors) > 1 else (0, 0, 0)
+    match pattern:
+        case Pattern.CHASE:
+            return [
+                [first if lamp == step else second for lamp in range(lamps)]
+                for step in range(lamps)
+            ]
+        case Pattern.WAVE:
+            steps = max(lamps, WAVE_MIN_STEPS)
+            return [
+                [
+                    _blend(
+                        second,
+                        first,
+                        (1 + math.sin(2 * math.pi * (step / steps - lamp / lamps))) / 2,
+                    )
+                    for lamp in range(lamps)
+                ]
+                for step in range(steps)
+            ]
+        case Pattern.ALTERNATE:
+            return [
+                [first if (lamp + step) % 2 else second for lamp in range(lamps)]
+                for step in range(2)
+            ]
+
+
+class Choreography:
+    """Encoded frames of all lamps, steps are step seconds apart"""
+
+    def __init__(self, step: float, steps: int):
+        self.step = step
+        self.steps = steps
+        """per lamp, sent untimed before the first step"""
+        self.preludes: list[tuple] = []
+        """per lamp, step index and frames sent at it, only when the color changes"""
+        self.timelines: list[tuple] = []
+
+    @property
+    def duration(self) -> float:
+        return self.steps * self.step
+
+
+def compile_choreography(
+    pattern: Pattern,
+    colors: list[tuple[int, int, int]],
+    step: float,
+    cycles: int,
+    calibrations: list[Callable[[int, int, int], tuple[int, int, int]]],
+    brightness: int | None = None,
+) -> Choreography:
+    """Encode all frames of all lamps up front
+
+    calibrations convert a color for each lamp in order, their number is the
+    number of lamps.
+    """
+    lamps = len(calibrations)
+    cycle = _pattern_colors(pattern, lamps, colors)
+    choreography = Choreography(step, len(cycle) * cycles)
+
+    for lamp, calibrate in enumerate(calibrations):
+        prelude = [bytes.fromhex(Commands.on())]
+        if brightness is not None:
+            prelude.append(bytes.fromhex(Commands.brightness(brightness)))
+        choreography.preludes.append(tuple((frame, FRAME_GAP) for frame in prelude))
+
+        encoded = {}
+        timeline = []
+        previous = None
+        for index in range(choreography.steps):
+            color = cycle[index % len(cycle)][lamp]
+            if color == previous:
+                continue
+            previous = color
+            if (batch := encoded.get(color)) is None:
+                frame = bytes.fromhex(Commands.rgb(*calibrate(*color)))
+                batch = encoded[color] = ((frame, 0.0),)
+            timeline.append((index, batch))
+        choreography.timelines.append(tuple(timeline))
+
+    return choreography
+
+
+class LampRun:
+    def __init__(self):
+        self.sent = 0
+        """frames left out because the lamp fell behind"""
+        self.skipped = 0
+        self.failed = 0
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+async def _run_lamp(
+    client, choreography: Choreography, lamp: int, start: float
+) -> LampRun:
+    run = LampRun()
+    timeline = choreography.timelines[lamp]
+    # frames are written ahead by the time they take to reach the lamp
+    offset = client.latency.write.value / 2 if client.latency.write.measured else 0
+    index = 0
+    while index < len(timeline):
+        delay = start + timeline[index][0] * choreography.step - offset
+        delay -= time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # behind schedule, only the latest due frame is still worth sending
+        now = time.monotonic() + offset
+        while (
+            index + 1 < len(timeline)
+            and start + timeline[index + 1][0] * choreography.step <= now
+        ):
+            index += 1
+            run.skipped += 1
+
+        if await client.send_frames(timeline[index][1]):
+            run.sent += 1
+        else:
+            run.failed += 1
+        index += 1
+    return run
+
+
+async def run_choreography(clients: list, choreography: Choreography) -> list[LampRun]:
+    """Play a choreography on the clients, in the compiled lamp order
+
+    Clients are connected first and kept connected until it ends.
+    """
+    for client in clients:
+        # a status notification meanwhile must not drop the connection
+        client.hold(choreography.duration + START_DELAY + HOLD_MARGIN)
+    await asyncio.gather(*(client.connect() for client in clients))
+    await asyncio.gather(
+        *(
+            client.send_frames(prelude)
+            for client, prelude in zip(clients, choreography.preludes)
+        )
+    )
+    start = time.monotonic() + START_DELAY
+    return await asyncio.gather(
+        *(
+            _run_lamp(client, choreography, lamp, start)
+            for lamp, client in enumerate(clients)
+        )
+    )
@@ -0,0 +1,468 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from bleak import BleakClient, BleakGATTCharacteristic, BLEDevice
+from bleak.exc import BleakError
+
+from .capabilities import Capabilities
+from .capture import CaptureEvent, TrafficRecorder
+from .commands import (
+    CHARACTERISTIC_REQUEST_STATUS,
+    CHARACTERISTIC_SEND_CMD,
+    MANUFACTURER_ID,
+    VERSION_MANUFACTURER_ID,
+    Commands,
+    Response,
+    ResponseStatus,
+)
+from .const import LOGGER
+from .latency import LatencyStats
+from .resolver import BleakResolver, DeviceResolver, ServiceInfo
+from .tracing import Tracer
+
+"""smallest att mtu, leaves 20 bytes for a write"""
+DEFAULT_MTU = 23
+"""seconds a connect may take with all its retries"""
+CONNECT_DEADLINE = 30.0
+
+
+class LightBtClient:
+    service_info: ServiceInfo | None = None
+    device_manifacturer: str | None = None
+    device_version: str | None = None
+    _status = None
+    _callback = None
+    """connect in progress, joined by everyone connecting meanwhile"""
+    _connect_task: asyncio.Task | None = None
+    waiting_status_update = False
+    _disconnect_next = False
+    _busy = False
+    _connecting = False
+    """monotonic time until which the connection is kept open"""
+    _hold_until = 0.0
+    _status_waiter: asyncio.Future | None = None
+    _status_requested = 0
+    """monotonic time the pending status request was sent"""
+    _status_sent = 0.0
+    _ble_device: BLEDevice | None = None
+    recorder: TrafficRecorder | None = None
+    """replaces BleakClient, used to run against a simulated device"""
+    client_factory: Callable[[], BleakClient] | None = None
+
+    def __init__(
+        self,
+        address,
+        callback: Callable[[ResponseStatus], Awaitable[None]] = None,
+        resolver: DeviceResolver | None = None,
+    ):
+        self.resolver = resolver or BleakResolver()
+        self._bt_client = None
+        self._address = address
+        self._send_command_err_count = 0
+        # self.device_manifacturer = None
+        self._callback = callback
+        self.tracer = Tracer(address)
+        self.capabilities = Capabilities()
+        self.latency = LatencyStats()
+
+    @property
+    def address(self) -> str:
+        return self._address
+
+    @property
+    def busy(self):
+        return self._connecting or (self._busy and self.is_connected())
+
+    async def _notification_handler(
+        self, characteristic: BleakGATTCharacteristic, data: bytearray
+    ):
+        LOGGER.debug(
+            "_notification_handler received %s: %s: %s - %r",
+            self._address,
+            characteristic.description,
+            data.hex(),
+            data,
+        )
+        if self.recorder is not None:
+            # copied only when captured, data is the backend's buffer
+            self.recorder.record(CaptureEvent.NOTIFY, bytes(data))
+
+        if Response.is_status(data):
+            self.tracer.complete_async("status_round_trip", self._status_requested)
+            self._status_requested = 0
+            if self._status_sent:
+                self.latency.status.add(time.monotonic() - self._status_sent)
+                self._status_sent = 0.0
+            # parsed into the same record every time, callback must not keep it
+            status = Response.parse_status(data, self._status)
+            LOGGER.info("status received %s: %s", self._address, status)
+            self._status = status
+            if self._callback:
+                await self._callback(status)
+            self.waiting_status_update = False
+            if self._status_waiter is not None and not self._status_waiter.done():
+                self._status_waiter.set_result(status.copy())
+
+        await self.disconnect(only_if_needed=True)
+
+    async def _initialize(self) -> None:
+        try:
+            self._busy = False
+            self.waiting_status_update = False
+            self._disconnect_next = False
+            self.service_info = self.resolver.service_info(self._address)
+
+            if self.service_info and self.service_info.manufacturer_data:
+                LOGGER.debug(
+                    "_initialize %s service_info.adv: %s",
+                    self._address,
+                    self.service_info.advertisement,
+                )
+                md = self.service_info.manufacturer_data
+                if value := md.get(VERSION_MANUFACTURER_ID, None):
+                    self.device_version = f"{value[0]}.{value[1]}.{value[2]}.{value[3]}"
+                if value := md.get(MANUFACTURER_ID, None):
+                    self.device_manifacturer = value.decode("ascii") or None
+
+            await self._bt_client.start_notify(
+                CHARACTERISTIC_REQUEST_STATUS, self._notification_handler
+            )
+
+            if self.status is None:
+                await self.request_status_update()
+
+            LOGGER.debug("initialized %s", self._address)
+        except Exception as e:
+            LOGGER.warning("initialize error: %s", str(e), exc_info=e)
+
+    async def connect(self, retries=3) -> bool:
+        """Connect, or wait for the connect in progress and share its result"""
+        with self.tracer.span("connect", connected=self.is_connected()):
+            if self._connect_task is None:
+                if self.is_connected():
+                    return True
+                self._connect_task = asyncio.get_running_loop().create_task(
+                    self._connect_with_deadline(retries)
+                )
+                self._connect_task.add_done_callback(self._connect_done)
+            # connected but still initializing counts as connecting, a caller
+            # giving up must not cancel the connect others wait for
+            return await asyncio.shield(self._connect_task)
+
+    def _connect_done(self, task: asyncio.Task) -> None:
+        if self._connect_task is task:
+            self._connect_task = None
+
+    async def _connect_with_deadline(self, retries: int) -> bool:
+        try:
+            async with asyncio.timeout(CONNECT_DEADLINE):
+                return await self._connect(retries)
+        except TimeoutError:
+            LOGGER.info("Connecting to %s took too long", self._address)
+            return self.is_connected()
+        finally:
+            self._connecting = False
+
+    async def _connect(self, retries=3) -> bool:
+        if self.is_connected():
+            return True
+
+        tries = 0
+        self._connecting = True
+
+        LOGGER.debug("Connecting to %s", self._address)
+        while tries < retries:
+            tries += 1
+            attempt_start = self.tracer.now()
+            started = time.monotonic()
+
+            try:
+                if self.client_factory is not None:
+                    if self._bt_client is None:
+                        self._bt_client = self.client_factory()
+                else:
+                    if tries == 1:
+                        await self.resolver.async_resolve(self._address)
+                    self._create_client()
+                self._record(CaptureEvent.CONNECTING)
+                ret = await self._bt_client.connect()
+                self.tracer.complete("connect_attempt", attempt_start, attempt=tries)
+                if ret:
+                    self.latency.connect.add(time.monotonic() - started)
+                    LOGGER.debug("Connected to %s", self._address)
+                    self._record(CaptureEvent.CONNECT)
+                    with self.tracer.span("initialize"):
+                        await self._initialize()
+                    break
+            except Exception as e:
+                self.tracer.complete(
+                    "connect_attempt",
+                    attempt_start,
+                    attempt=tries,
+                    error=str(e),
+                )
+                self._record_error(e)
+                if tries == retries:
+                    LOGGER.info("Not able to connect to %s! %s", self._address, str(e))
+                else:
+                    LOGGER.debug("Retrying %s", self._address)
+                    await asyncio.sleep(self.latency.retry_delay())
+        self._connecting = False
+        return self.is_connected()
+
+    async def probe(self, timeout: float = 5.0) -> bool:
+        """Connect and disconnect right away, without notifications or status"""
+        if self.is_connected():
+            return True
+        try:
+            await self.resolver.async_resolve(self._address)
+            self._create_client()
+            async with asyncio.timeout(timeout):
+                connected = await self._bt_client.connect()
+            return bool(connected)
+        except Exception as e:
+            LOGGER.debug("Probe of %s failed: %s", self._address, str(e))
+            return False
+        finally:
+            if self.is_connected():
+                await self._bt_client.disconnect()
+            self._bt_client = None
+
+    def _create_client(self) -> None:
+        """BleakClient for the device as last seen by the resolver
+
+        Inside Home Assistant the client picks the adapter or proxy itself when
+        connecting, by signal, free connection slots and past failures.
+        """
+        if (ble_device := self.resolver.ble_device(self._address)) is not None:
+            self._ble_device = ble_device
+        if self._bt_client is None:
+            if not self._ble_device:
+                raise BleakError(
+                    f"A device with address {self._address} could not be found."
+                )
+            self._bt_client = BleakClient(self._ble_device)
+
+    async def disconnect(
+        self, force: bool = False, only_if_needed: bool = False
+    ) -> None:
+        if not force:
+            if self.held:
+                return
+            if only_if_needed and not self._disconnect_next:
+                # a status arriving mid-session doesn't end it
+                return
+            if self.busy or self.waiting_status_update:
+                self._disconnect_next = True
+                return
+
+        self.waiting_status_update = False
+        self._busy = False
+        self._disconnect_next = False
+
+        if self.is_connected():
+            try:
+                LOGGER.debug("disconnecting %s", self._address)
+                self._record(CaptureEvent.DISCONNECT)
+                await self._bt_client.disconnect()
+            except Exception as e:
+                LOGGER.warning("Error disconnecting %s! %s", self._address, str(e))
+            if self.status is None:
+                self._bt_client = None
+
+    def _record(self, event: CaptureEvent, payload: bytes = b"") -> None:
+        if self.recorder is not None:
+            self.recorder.record(event, payload)
+
+    def _record_error(self, error: Exception) -> None:
+        if self.recorder is not None:
+            self.recorder.error(error)
+
+    def hold(self, seconds: float) -> None:
+        """Keep the connection open for at least seconds"""
+        self._hold_until = max(self._hold_until, time.monotonic() + seconds)
+
+    def release(self) -> None:
+        self._hold_until = 0.0
+
+    @property
+    def held(self) -> bool:
+        return time.monotonic() < self._hold_until
+
+    @property
+    def status(self) -> ResponseStatus | None:
+        return self._status
+
+    def is_connected(self) -> bool:
+        return self._bt_client is not None and self._bt_client.is_connected
+
+    async def _write_uuid(self, uuid, val) -> None:
+        if self._busy:
+            raise RuntimeError("device busy")
+        try:
+            self._busy = True
+            self._record(CaptureEvent.WRITE, val)
+            started = time.monotonic()
+            with self.tracer.span("write", frame=val):
+                await self._bt_client.write_gatt_char(
+                    char_specifier=uuid, data=val, response=True
+                )
+            self.latency.write.add(time.monotonic() - started)
+            self._record(CaptureEvent.ACK)
+        finally:
+            self._busy = False
+            await self.disconnect(only_if_needed=True)
+
+    async def _send_command(self, command: str) -> bool:
+        LOGGER.debug("send command %s: %s", self._address, command)
+        return await self._send_frame(bytes.fromhex(command))
+
+    async def _send_frame(self, frame: bytes) -> bool:
+        timeout = self.latency.write_timeout()
+        try:
+            async with asyncio.timeout(timeout):
+                await self._write_uuid(CHARACTERISTIC_SEND_CMD, frame)
+            self._send_command_err_count = 0
+            # command is exected immediatelly, but client sometime waits for 10 seconds
+            # so we don't have any result anyway and no need to wait
+            return True
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                # the write took at least that long, next timeout grows
+                self.latency.write.add(timeout)
+            self._record_error(e)
+            self._send_command_err_count += 1
+            if self._send_command_err_count > 10:
+                LOGGER.info(
+                    "%s errors occurred in send command %s! Last: %s",
+                    self._send_command_err_count,
+                    self._address,
+                    str(e),
+                )
+                self._send_command_err_count = 0
+            return False
+
+    async def send_frames(self, frames: tuple[tuple[bytes, float], ...]) -> bool:
+        """Send encoded frames waiting given delay after each one"""
+        last = len(frames) - 1
+        for index, (frame, delay) in enumerate(frames):
+            if not await self._send_frame(frame):
+                return False
+            if index < last:
+                await asyncio.sleep(delay)
+        return True
+
+    async def send_commands(
+        self,
+        commands: list[str],
+        gap: float | None = None,
+        packed: bool | None = None,
+    ) -> bool:
+        """Send commands one after another, stops at first failure
+
+        gap and packing default to what the lamp's firmware supports, the gap
+        is shortened by the time an ack takes to come back.
+        """
+        if gap is None:
+            gap = self.latency.frame_gap(self.capabilities.frame_gap)
+        if packed is None:
+            packed = self.capabilities.packed_frames
+        frames = [bytes.fromhex(command) for command in commands]
+        if packed:
+            frames = self._pack(frames)
+        for index, frame in enumerate(frames):
+            if index:
+                await asyncio.sleep(gap)
+            LOGGER.debug("send frame %s: %s", self._address, frame.hex())
+            if not await self._send_frame(frame):
+                return False
+        return True
+
+    def _pack(self, frames: list[bytes]) -> list[bytes]:
+        """Concatenate frames into writes fitting a single packet"""
+        limit = getattr(self._bt_client, "mtu_size", DEFAULT_MTU) - 3
+        writes = []
+        for frame in frames:
+            if writes and len(writes[-1]) + len(frame) <= limit:
+                writes[-1] += frame
+            else:
+                writes.append(frame)
+        return writes
+
+    async def request_status_update(self) -> bool:
+        self.waiting_status_update = True
+        LOGGER.debug("request_status_update %s", self._address)
+        self._status_requested = self.tracer.now()
+        self._status_sent = time.monotonic()
+        return await self._send_command(Commands.status())
+
+    async def request_status(
+        self, timeout: float | None = None, prefix: bytes = b""
+    ) -> ResponseStatus | None:
+        """Request status and wait for the notification, None if none came
+
+        prefix is sent in the same write, ahead of the status request. timeout
+        defaults to what the lamp's round trips took so far.
+        """
+        if timeout is None:
+            timeout = self.latency.status_timeout()
+        waiter = asyncio.get_running_loop().create_future()
+        self._status_waiter = waiter
+        try:
+            if prefix:
+                self.waiting_status_update = True
+                self._status_requested = self.tracer.now()
+                self._status_sent = time.monotonic()
+                sent = await self._send_frame(prefix + bytes.fromhex(Commands.status()))
+            else:
+                sent = await self.request_status_update()
+            if not sent:
+                return None
+            async with asyncio.timeout(timeout):
+                return await waiter
+        except asyncio.TimeoutError:
+            LOGGER.debug("No status received from %s", self._address)
+            if self._status_sent:
+                self.latency.status.add(timeout)
+                self._status_sent = 0.0
+            return None
+        finally:
+            if self._status_waiter is waiter:
+                self._status_waiter = None
+
+    async def set_brightness(self, value: int) -> bool:
+        if value < 0 or value > 0xFF:
+            raise ValueError("Brightness must be between 0 and 255")
+
+        LOGGER.debug("set_brightness: %s", value)
+        return await self._send_command(Commands.brightness(value))
+
+    async def set_white_temp(self, value: int) -> bool:
+        if value < 1 or value > 5:
+            raise ValueError("White temperature must be between 1 and 5")
+
+        LOGGER.debug("set_white_temp: %s", value)
+        return await self._send_command(Commands.white_temp(value))
+
+    async def set_rgb(self, r: int, g: int, b: int) -> bool:
+        if r < 0 or r > 0xFF or g < 0 or g > 0xFF or b < 0 or b > 0xFF:
+            raise ValueError("RGB values must be between 0 and 255")
+
+        LOGGER.debug("set_rgb: %s %s %s", r, g, b)
+        return await self._send_command(Commands.rgb(r, g, b))
+
+    async def set_scene(self, value: int) -> bool:
+        if value < 1 or value > 93:
+            raise ValueError("Scene must be between 1 and 93")
+
+        LOGGER.debug("set_scene: %s", value)
+        return await self._send_command(Commands.scene(value))
+
+    async def turn_on(self) -> bool:
+        LOGGER.debug("turn_on")
+        return await self._send_command(Commands.on())
+
+    async def turn_off(self) -> bool:
+        LOGGER.debug("turn_off")
+        return await self._send_command(Commands.off())
@@ -0,0 +1,124 @@
+"""Color conversion through tables built once per calibration."""
+import colorsys
+from functools import lru_cache
+
+"""hue resolution of the hs table, one entry per degree"""
+HUE_STEPS = 360
+"""saturation resolution of the hs table, one entry per percent"""
+SATURATION_STEPS = 100
+"""resolution of x and y in the xy table"""
+XY_STEPS = 200
+
+WHITE = (0xFF, 0xFF, 0xFF)
+
+
+class ColorCalibration:
+    """Correction of what the lamp's leds make of requested rgb values
+
+    gamma above 1 darkens mid tones, white_balance is the rgb sent for white.
+    """
+
+    def __init__(self, gamma: float = 1.0, white_balance=WHITE):
+        self.gamma = float(gamma)
+        self.white_balance = tuple(int(value) for value in white_balance)
+
+    @property
+    def key(self) -> tuple:
+        return (self.gamma, self.white_balance)
+
+
+def _xy_to_rgb(x: float, y: float) -> tuple[float, float, float]:
+    """Full brightness srgb of a CIE 1931 point, same math as Home Assistant"""
+    if y == 0:
+        return 0.0, 0.0, 0.0
+    X = x / y
+    Z = (1 - x - y) / y
+    r = X * 1.656492 - 0.354851 - Z * 0.255038
+    g = -X * 0.707196 + 1.655397 + Z * 0.036152
+    b = X * 0.051713 - 0.121364 + Z * 1.011530
+
+    def _companded(value: float) -> float:
+        if value <= 0.0031308:
+            return 12.92 * value
+        return 1.055 * pow(value, 1 / 2.4) - 0.055
+
+    r, g, b = (max(_companded(value), 0.0) for value in (r, g, b))
+    if (peak := max(r, g, b)) > 1:
+        r, g, b = r / peak, g / peak, b / peak
+    return r, g, b
+
+
+def _build(colors) -> bytes:
+    """Truncated like Home Assistant's conversions, same rgb on exact entries"""
+    table = bytearray()
+    for r, g, b in colors:
+        table += bytes((int(r * 255), int(g * 255), int(b * 255)))
+    return bytes(table)
+
+
+@lru_cache(maxsize=1)
+def _hs_table() -> bytes:
+    return _build(
+        colorsys.hsv_to_rgb(hue / HUE_STEPS, saturation / SATURATION_STEPS, 1)
+        for hue in range(HUE_STEPS)
+        for saturation in range(SATURATION_STEPS + 1)
+    )
+
+
+@lru_cache(maxsize=1)
+def _xy_table() -> bytes:
+    return _build(
+        _xy_to_rgb(x / XY_STEPS, y / XY_STEPS)
+        for x in range(XY_STEPS + 1)
+        for y in range(XY_STEPS + 1)
+    )
+
+
+class ColorTables:
+    """Rgb of hs and xy requests and calibrated rgb, each one lookup
+
+    hs and xy give the requested color, the same for every calibration, only
+    rgb gives what is sent to the lamp.
+    """
+
+    def __init__(self, calibration: ColorCalibration):
+        self.calibration = calibration
+        # output level of every channel for every input level
+        self._channels = tuple(
+            bytes(
+                round(255 * pow(level / 255, calibration.gamma) * white / 255)
+                for level in range(256)
+            )
+            for white in calibration.white_balance
+        )
+        self._hs = _hs_table()
+        self._xy = _xy_table()
+
+    def rgb(self, r: int, g: int, b: int) -> tuple[int, int, int]:
+        red, green, blue = self._channels
+        return red[r], green[g], blue[b]
+
+    def hs(self, hue: float, saturation: float) -> tuple[int, int, int]:
+        """hue 0-360, saturation 0-100"""
+        index = (
+            round(hue) % HUE_STEPS * (SATURATION_STEPS + 1)
+            + min(max(round(saturation), 0), SATURATION_STEPS)
+        ) * 3
+        return tuple(self._hs[index : index + 3])
+
+    def xy(self, x: float, y: float) -> tuple[int, int, int]:
+        """CIE 1931 x and y, 0-1"""
+        x = min(max(round(x * XY_STEPS), 0), XY_STEPS)
+        y = min(max(round(y * XY_STEPS), 0), XY_STEPS)
+        index = (x * (XY_STEPS + 1) + y) * 3
+        return tuple(self._xy[index : index + 3])
+
+
+@lru_cache(maxsize=8)
+def _tables(key: tuple) -> ColorTables:
+    return ColorTables(ColorCalibration(*key))
+
+
+def color_tables(calibration: ColorCalibration | None = None) -> ColorTables:
+    """Tables are shared by all lamps with the same calibration"""
+    return _tables((calibration or ColorCalibration()).key)
@@ -25,6 +25,10 @@ SERVICE_UUID = "0000a032-0000-1000-8000-00805f9b34fb"
 """[Characteristic] 0000a044-0000-1000-8000-00805f9b34fb (Handle: 15): Vendor specific (write-without-response,write) """
 CHARACTERISTIC_SEND_CMD = "0000a040-0000-1000-8000-00805f9b34fb"
 CHARACTERISTIC_REQUEST_STATUS = "0000a042-0000-1000-8000-00805f9b34fb"
+MANUFACTURER_ID = 1494
+"""sdk name at the end of the manufacturer data"""
+MANUFACTURER_MARKER = b"JLAISDK"
+VERSION_MANUFACTURER_ID = 5101
 
 color_temp_mappings = {
     1: 6000,  # cold white
@@ -58,7 +62,7 @@ class ColorTempLevelUtil:
     @staticmethod
     def color_temp_to_level(temp: int):
         if temp > 6000:
-            temp = 600
+            temp = 6000
         elif temp < 3000:
             temp = 3000
 
@@ -118,10 +122,7 @@ class Commands:
 
     @staticmethod
     def _crc(data: str) -> str:
-        all_sum = 0
-        for i in range(0, len(data), 2):
-            all_sum += int(data[i : i + 2], 16)
-        crc = 0xFF - all_sum & 0xFF
+        crc = 0xFF - sum(bytes.fromhex(data)) & 0xFF
         return f"{crc:02x}"
 
     @staticmethod
@@ -170,7 +171,23 @@ class Commands:
         return Commands._rgb(Commands._cmd_scene, f"{scene:02x}ff32")
 
 
+"""colors seen so far, equal colors share one tuple"""
+_rgb_cache: dict[int, tuple[int, int, int]] = {}
+_RGB_CACHE_SIZE = 4096
+
+
+def intern_rgb(r: int, g: int, b: int) -> tuple[int, int, int]:
+    key = r << 16 | g << 8 | b
+    if (rgb := _rgb_cache.get(key)) is None:
+        if len(_rgb_cache) >= _RGB_CACHE_SIZE:
+            _rgb_cache.clear()
+        rgb = _rgb_cache[key] = (r, g, b)
+    return rgb
+
+
 class ResponseStatus:
+    __slots__ = ("on", "brightness", "temp_level", "rgb")
+
     def __init__(
         self,
         on: bool,
@@ -183,6 +200,21 @@ class ResponseStatus:
         self.brightness = brightness
         self.temp_level = temp_level
 
+    def assign(self, other: "ResponseStatus") -> None:
+        self.on = other.on
+        self.brightness = other.brightness
+        self.temp_level = other.temp_level
+        self.rgb = other.rgb
+
+    def copy(self) -> "ResponseStatus":
+        return ResponseStatus(self.on, self.brightness, self.temp_level, self.rgb)
+
+    def as_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self) -> str:
+        return repr(self.as_dict())
+
 
 class Response:
     _status_header = "55aa098815"
@@ -197,36 +229,36 @@ class Response:
       12,13 white temp level 
       14  checksum ?
     """
-    _temp_level_1 = ""
+    _status_header_bytes = bytes.fromhex(_status_header)
+    """last byte parse_status reads is on/off at index 11"""
+    _status_min_length = 12
 
     @staticmethod
     def is_status(response: bytearray):
-        return response.hex().startswith(Response._status_header)
-
-    @staticmethod
-    def parse_status(response: bytearray) -> ResponseStatus | None:
-        r = response[5]
-        g = response[6]
-        b = response[7]
-        temp_level = None
-        match f"{response[8]:02x}{response[9]:02x}":
-            case "ff00":
-                temp_level = 1
-            case "b464":
-                temp_level = 2
-            case "ffff":
-                temp_level = 3
-            case "4bc8":
-                temp_level = 4
-            case "00ff":
-                temp_level = 5
-            case _:
-                temp_level = None
+        return (
+            len(response) >= Response._status_min_length
+            and response.startswith(Response._status_header_bytes)
+        )
+
+    _temp_levels = {0xFF00: 1, 0xB464: 2, 0xFFFF: 3, 0x4BC8: 4, 0x00FF: 5}
+
+    @staticmethod
+    def parse_status(
+        response: bytearray, into: ResponseStatus | None = None
+    ) -> ResponseStatus | None:
+        """Parse a status notification, into is updated instead of a new one"""
+        if not Response.is_status(response):
+            return None
+        rgb = intern_rgb(response[5], response[6], response[7])
+        temp_level = Response._temp_levels.get(response[8] << 8 | response[9])
         brightness = response[10]
         on = response[11] == 1
-        return ResponseStatus(
+        if into is None:
+            return ResponseStatus(on, brightness, temp_level, rgb)
+        into.on, into.brightness, into.temp_level, into.rgb = (
             on,
             brightness,
             temp_level,
-            (r, g, b),
+            rgb,
         )
+        return into
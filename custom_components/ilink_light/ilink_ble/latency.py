@@ -0,0 +1,105 @@
+"""Smoothed latencies of a lamp's link and the timing derived from them."""
+
+"""weight of a new sample in the mean and in the mean deviation"""
+EWMA_ALPHA = 0.125
+EWMA_BETA = 0.25
+"""deviations above the mean a timeout allows, as tcp does"""
+TIMEOUT_DEVIATIONS = 4
+"""samples needed before measurements replace the defaults"""
+MIN_SAMPLES = 3
+
+"""defaults and bounds in seconds"""
+WRITE_TIMEOUT = 1.0
+WRITE_TIMEOUT_BOUNDS = (0.2, 5.0)
+STATUS_TIMEOUT = 2.0
+STATUS_TIMEOUT_BOUNDS = (0.3, 10.0)
+RETRY_DELAY = 1.0
+RETRY_DELAY_BOUNDS = (0.2, 2.0)
+
+
+def percentile(values: list[float], fraction: float) -> float | None:
+    """Sample below which fraction of the samples lie, None without samples"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(round(len(values) * fraction), len(values) - 1)]
+
+
+def _bounded(value: float, bounds: tuple[float, float]) -> float:
+    return min(max(value, bounds[0]), bounds[1])
+
+
+class Ewma:
+    def __init__(
+        self, value: float | None = None, samples: int = 0, deviation: float = 0.0
+    ):
+        self.value = value
+        self.samples = samples
+        self.deviation = deviation
+
+    def add(self, sample: float) -> None:
+        if self.value is None:
+            self.value = sample
+            self.deviation = sample / 2
+        else:
+            error = sample - self.value
+            self.value += EWMA_ALPHA * error
+            self.deviation += EWMA_BETA * (abs(error) - self.deviation)
+        self.samples += 1
+
+    @property
+    def measured(self) -> bool:
+        return self.samples >= MIN_SAMPLES
+
+    def timeout(self, default: float, bounds: tuple[float, float]) -> float:
+        """Mean plus a margin for its jitter, default until measured"""
+        if not self.measured:
+            return default
+        return _bounded(self.value + TIMEOUT_DEVIATIONS * self.deviation, bounds)
+
+    def as_dict(self) -> dict:
+        return {
+            "value": self.value,
+            "samples": self.samples,
+            "deviation": self.deviation,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "Ewma":
+        if not data:
+            return cls()
+        return cls(data.get("value"), data.get("samples", 0), data.get("deviation", 0))
+
+
+class LatencyStats:
+    """Seconds a connect, an acknowledged write and a status round trip take"""
+
+    def __init__(self):
+        self.connect = Ewma()
+        self.write = Ewma()
+        self.status = Ewma()
+
+    def write_timeout(self) -> float:
+        return self.write.timeout(WRITE_TIMEOUT, WRITE_TIMEOUT_BOUNDS)
+
+    def status_timeout(self) -> float:
+        return self.status.timeout(STATUS_TIMEOUT, STATUS_TIMEOUT_BOUNDS)
+
+    def retry_delay(self) -> float:
+        """About one connect, a busy adapter is given the time another one takes"""
+        if not self.connect.measured:
+            return RETRY_DELAY
+        return _bounded(self.connect.value, RETRY_DELAY_BOUNDS)
+
+    def frame_gap(self, gap: float) -> float:
+        """Pause after a write, waiting for its ack already spaced the frames"""
+        if not self.write.measured:
+            return gap
+        return max(gap - self.write.value, 0.0)
+
+    def as_dict(self) -> dict:
+        return {key: ewma.as_dict() for key, ewma in vars(self).items()}
+
+    def load(self, data: dict) -> None:
+        for key in vars(self):
+            setattr(self, key, Ewma.from_dict(data.get(key)))
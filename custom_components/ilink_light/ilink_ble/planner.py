@@ -0,0 +1,110 @@
+"""Planning of the shortest frame sequence reaching a requested state."""
+from enum import StrEnum
+
+from .commands import Commands, ResponseStatus
+
+"""pause between frames sent one after another"""
+FRAME_GAP = 0.03
+
+
+class LightMode(StrEnum):
+    WHITE = "white"
+    RGB = "rgb"
+    SCENE = "scene"
+
+
+class DesiredState:
+    """Requested attributes, None means keep as is"""
+
+    def __init__(
+        self,
+        on: bool | None = None,
+        temp_level: int | None = None,
+        rgb: tuple[int, int, int] | None = None,
+        brightness: int | None = None,
+        scene: int | None = None,
+    ):
+        self.on = on
+        self.temp_level = temp_level
+        self.rgb = rgb
+        self.brightness = brightness
+        self.scene = scene
+
+
+def plan_frames(
+    desired: DesiredState,
+    known: ResponseStatus | None,
+    mode: LightMode | None,
+    brightness: int,
+    color_keeps_brightness: bool = False,
+) -> list[str]:
+    """Frames taking the lamp from known to desired state
+
+    known is what the lamp reported plus what was sent since, None if unknown.
+    brightness is sent again after a mode change if it's not requested, unless
+    the firmware keeps it.
+    """
+    frames = []
+    if desired.on and (known is None or not known.on):
+        frames.append(Commands.on())
+
+    # brightness is lost when color is set, it's sent exactly once at the end
+    send_brightness = False
+    if desired.temp_level is not None and (
+        known is None
+        or mode != LightMode.WHITE
+        or known.temp_level != desired.temp_level
+    ):
+        frames.append(Commands.white_temp(desired.temp_level))
+        send_brightness = not color_keeps_brightness
+    if desired.rgb is not None and (
+        known is None or mode != LightMode.RGB or known.rgb != desired.rgb
+    ):
+        frames.append(Commands.rgb(*desired.rgb))
+        send_brightness = not color_keeps_brightness
+    if desired.scene is not None:
+        frames.append(Commands.scene(desired.scene))
+        # scene brings its own brightness
+        send_brightness = False
+
+    if desired.brightness is not None:
+        brightness = max(desired.brightness, 1)
+        if (
+            desired.scene is not None
+            or known is None
+            or known.brightness != brightness
+        ):
+            send_brightness = True
+    if send_brightness:
+        frames.append(Commands.brightness(brightness))
+
+    if desired.on is False and (known is None or known.on):
+        frames.append(Commands.off())
+
+    return frames
+
+
+def apply_state(
+    desired: DesiredState, known: ResponseStatus | None, mode: LightMode | None
+) -> tuple[ResponseStatus | None, LightMode | None]:
+    """State of the lamp after the planned frames were sent"""
+    if desired.scene is not None:
+        mode = LightMode.SCENE
+    elif desired.rgb is not None:
+        mode = LightMode.RGB
+    elif desired.temp_level is not None:
+        mode = LightMode.WHITE
+
+    if known is None:
+        return None, mode
+
+    state = known.copy()
+    if desired.on is not None:
+        state.on = desired.on
+    if desired.temp_level is not None:
+        state.temp_level = desired.temp_level
+    if desired.rgb is not None:
+        state.rgb = desired.rgb
+    if desired.brightness is not None:
+        state.brightness = max(desired.brightness, 1)
+    return state, mode
@@ -0,0 +1,164 @@
+"""Replay of captured BLE traffic against a simulated device."""
+import asyncio
+import time
+
+from .capture import CaptureEvent, CaptureRecord
+from .client import LightBtClient
+from .const import LOGGER
+from .latency import percentile
+
+
+class _Characteristic:
+    description = "replay"
+
+
+class SimulatedLamp:
+    """BleakClient stand-in answering the way the captured device did
+
+    speed 1 keeps captured timing, 10 runs ten times faster, 0 does not wait
+    """
+
+    def __init__(self, records: list[CaptureRecord], speed: float = 1.0):
+        self._records = records
+        self._speed = speed
+        self._callbacks = {}
+        self._tasks = set()
+        self._handles = []
+        self.cursor = 0
+        self.is_connected = False
+
+    def _next(self, *events: CaptureEvent) -> CaptureRecord | None:
+        while self.cursor < len(self._records):
+            record = self._records[self.cursor]
+            self.cursor += 1
+            if record.event in events:
+                return record
+        return None
+
+    async def _delay(self, seconds: float) -> None:
+        if self._speed > 0 and seconds > 0:
+            await asyncio.sleep(seconds / self._speed)
+
+    async def _answer(self, start: CaptureRecord, *events: CaptureEvent):
+        result = self._next(*events, CaptureEvent.ERROR)
+        if result is None:
+            raise ConnectionError("End of capture")
+        await self._delay(result.timestamp - start.timestamp)
+        if result.event == CaptureEvent.ERROR:
+            raise ConnectionError(result.payload.decode("utf-8", "replace"))
+        return result
+
+    async def connect(self, **kwargs) -> bool:
+        if (start := self._next(CaptureEvent.CONNECTING)) is None:
+            raise ConnectionError("End of capture")
+        await self._answer(start, CaptureEvent.CONNECT)
+        self.is_connected = True
+        return True
+
+    async def disconnect(self) -> bool:
+        self.is_connected = False
+        for handle in self._handles:
+            handle.cancel()
+        self._handles.clear()
+        return True
+
+    async def start_notify(self, char_specifier, callback) -> None:
+        self._callbacks[char_specifier] = callback
+
+    async def write_gatt_char(self, char_specifier, data, response=True) -> None:
+        if (start := self._next(CaptureEvent.WRITE)) is None:
+            raise ConnectionError("End of capture")
+        if bytes(data) != start.payload:
+            LOGGER.debug(
+                "replay diverged, sent %s captured %s", data.hex(), start.payload.hex()
+            )
+        ack = await self._answer(start, CaptureEvent.ACK)
+        self._schedule_notifications(ack.timestamp)
+
+    def _schedule_notifications(self, since: float) -> None:
+        loop = asyncio.get_running_loop()
+        for record in self._records[self.cursor :]:
+            if record.event in (CaptureEvent.WRITE, CaptureEvent.CONNECTING):
+                break
+            if record.event != CaptureEvent.NOTIFY:
+                continue
+            delay = (record.timestamp - since) / self._speed if self._speed > 0 else 0
+            self._handles.append(
+                loop.call_later(max(delay, 0), self._notify, record.payload)
+            )
+
+    def _notify(self, payload: bytes) -> None:
+        for callback in self._callbacks.values():
+            result = callback(_Characteristic(), bytearray(payload))
+            if asyncio.iscoroutine(result):
+                task = asyncio.ensure_future(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+
+class ReplayReport:
+    def __init__(self):
+        self.duration = 0.0
+        self.connects = 0
+        self.failed_connects = 0
+        self.frames = 0
+        self.failed_frames = 0
+        self.write_latencies: list[float] = []
+
+    def as_dict(self) -> dict:
+        data = {
+            key: value for key, value in vars(self).items() if key != "write_latencies"
+        }
+        data["write_latency_p50"] = percentile(self.write_latencies, 0.5)
+        data["write_latency_p99"] = percentile(self.write_latencies, 0.99)
+        return data
+
+
+async def replay_capture(
+    records: list[CaptureRecord],
+    speed: float = 1.0,
+    address: str = "00:00:00:00:00:00",
+) -> ReplayReport:
+    """Feed a captured session through a client against a simulated lamp
+
+    Connects, disconnects and frames are issued in the captured order and timing,
+    answers and status notifications come from the capture.
+    """
+    report = ReplayReport()
+    if not records:
+        return report
+
+    lamp = SimulatedLamp(records, speed)
+    client = LightBtClient(address)
+    client.client_factory = lambda: lamp
+
+    origin = records[0].timestamp
+    started = time.monotonic()
+    try:
+        for index, record in enumerate(records):
+            if index < lamp.cursor:
+                # already answered as part of client's own traffic
+                continue
+            if speed > 0:
+                due = (record.timestamp - origin) / speed
+                await asyncio.sleep(max(due - (time.monotonic() - started), 0))
+
+            match record.event:
+                case CaptureEvent.CONNECTING:
+                    report.connects += 1
+                    if not await client.connect(retries=1):
+                        report.failed_connects += 1
+                case CaptureEvent.DISCONNECT:
+                    await client.disconnect(force=True)
+                case CaptureEvent.WRITE:
+                    report.frames += 1
+                    sent = time.monotonic()
+                    if await client.send_frames(((record.payload, 0.0),)):
+                        report.write_latencies.append(time.monotonic() - sent)
+                    else:
+                        report.failed_frames += 1
+    finally:
+        report.duration = time.monotonic() - started
+        await client.disconnect(force=True)
+
+    return report
@@ -0,0 +1,91 @@
+"""Lookup of the bluetooth devices and advertisements the client connects to."""
+import asyncio
+
+from bleak import BleakScanner, BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+from .commands import MANUFACTURER_ID, MANUFACTURER_MARKER, SERVICE_UUID
+
+
+class ServiceInfo:
+    """Last advertisement of a device, same fields the client reads from
+    Home Assistant's BluetoothServiceInfoBleak"""
+
+    def __init__(self, device: BLEDevice, advertisement: AdvertisementData):
+        self.address = device.address
+        self.name = advertisement.local_name or device.name or device.address
+        self.rssi = advertisement.rssi
+        self.manufacturer_data = advertisement.manufacturer_data
+        self.service_uuids = advertisement.service_uuids
+        self.advertisement = advertisement
+        self.device = device
+
+
+def is_ilink_advertisement(service_info) -> bool:
+    """Advertisement has the iLink service and sdk manufacturer data"""
+    if service_info is None:
+        return False
+    uuids = [uuid.lower() for uuid in service_info.service_uuids or ()]
+    data = (service_info.manufacturer_data or {}).get(MANUFACTURER_ID, b"")
+    return SERVICE_UUID in uuids and MANUFACTURER_MARKER in data
+
+
+class DeviceResolver:
+    """Provides devices for an address, implemented per bluetooth stack"""
+
+    async def async_resolve(self, address: str) -> None:
+        """Called before connecting, may scan for the device"""
+
+    def ble_device(self, address: str) -> BLEDevice | None:
+        raise NotImplementedError
+
+    def service_info(self, address: str):
+        return None
+
+
+class BleakResolver(DeviceResolver):
+    """Finds devices with the local adapter through BleakScanner"""
+
+    def __init__(self, timeout: float = 10.0):
+        self._timeout = timeout
+        self._seen: dict[str, ServiceInfo] = {}
+
+    async def async_scan(self, timeout: float | None = None) -> list[ServiceInfo]:
+        """Discover lamps advertising the iLink service"""
+        found = await BleakScanner.discover(
+            timeout=timeout or self._timeout,
+            return_adv=True,
+            service_uuids=[SERVICE_UUID],
+        )
+        infos = []
+        for device, advertisement in found.values():
+            info = ServiceInfo(device, advertisement)
+            self._seen[device.address.upper()] = info
+            infos.append(info)
+        return infos
+
+    async def async_resolve(self, address: str) -> None:
+        address = address.upper()
+        if address in self._seen:
+            return
+
+        found = asyncio.get_running_loop().create_future()
+
+        def _match(device: BLEDevice, advertisement: AdvertisementData) -> bool:
+            if device.address.upper() != address:
+                return False
+            if not found.done():
+                found.set_result(ServiceInfo(device, advertisement))
+            return True
+
+        await BleakScanner.find_device_by_filter(_match, timeout=self._timeout)
+        if found.done():
+            self._seen[address] = found.result()
+
+    def ble_device(self, address: str) -> BLEDevice | None:
+        if (info := self._seen.get(address.upper())) is None:
+            return None
+        return info.device
+
+    def service_info(self, address: str) -> ServiceInfo | None:
+        return self._seen.get(address.upper())
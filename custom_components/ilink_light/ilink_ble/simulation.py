@@ -0,0 +1,258 @@
+"""Fleet of simulated lamps sharing a limited number of connection slots."""
+import asyncio
+import random
+import time
+import tracemalloc
+
+from bleak.exc import BleakError
+
+from .client import LightBtClient
+from .commands import Commands, Response
+from .latency import percentile
+from .planner import DesiredState, plan_frames
+
+"""temperature bytes of the status, reversed Response._temp_levels"""
+_TEMP_BYTES = {level: value for value, level in Response._temp_levels.items()}
+
+
+class _Characteristic:
+    description = "simulation"
+
+
+class SlotPool:
+    """Connections the adapters can hold at once, a connect fails without one"""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.used = 0
+
+
+class VirtualLamp:
+    """BleakClient stand-in behaving like the lamp's firmware
+
+    Frames are applied to the lamp's state, a status request is answered with
+    a notification. Times are seconds the lamp takes to answer.
+    """
+
+    def __init__(
+        self,
+        pool: SlotPool,
+        connect_time: float = 0.5,
+        write_time: float = 0.03,
+        status_time: float = 0.05,
+    ):
+        self._pool = pool
+        self._connect_time = connect_time
+        self._write_time = write_time
+        self._status_time = status_time
+        self._callbacks = {}
+        self._tasks = set()
+        self.is_connected = False
+        self.on = True
+        self.brightness = 255
+        self.temp_level = 3
+        self.rgb = (0xFF, 0xFF, 0xFF)
+        self.connects = 0
+        self.refused = 0
+        self.writes = 0
+
+    async def connect(self, **kwargs) -> bool:
+        self.connects += 1
+        await asyncio.sleep(random.uniform(0.5, 1.5) * self._connect_time)
+        if self._pool.used >= self._pool.slots:
+            self.refused += 1
+            raise BleakError("No backend with an available connection slot")
+        self._pool.used += 1
+        self.is_connected = True
+        return True
+
+    async def disconnect(self) -> bool:
+        if self.is_connected:
+            self.is_connected = False
+            self._pool.used -= 1
+        return True
+
+    async def start_notify(self, char_specifier, callback) -> None:
+        self._callbacks[char_specifier] = callback
+
+    async def write_gatt_char(self, char_specifier, data, response=True) -> None:
+        if not self.is_connected:
+            raise BleakError("Not connected")
+        self.writes += 1
+        await asyncio.sleep(random.uniform(0.5, 1.5) * self._write_time)
+        data = bytes(data)
+        while data:
+            # std frames carry one parameter byte, rgb frames three
+            length = 7 if data[2] == 0x01 else 9
+            self._apply(data[:length])
+            data = data[length:]
+
+    def _apply(self, frame: bytes) -> None:
+        command, params = frame[3:5].hex(), frame[5:-1]
+        match command:
+            case Commands._cmd_switch:
+                self.on = params[0] == 1
+            case Commands._cmd_dim:
+                self.brightness = params[0]
+            case Commands._cmd_white_temp:
+                self.temp_level = params[0]
+            case Commands._cmd_rgb:
+                self.temp_level, self.rgb = None, tuple(params)
+            case Commands._cmd_scene:
+                self.temp_level = None
+            case Commands._cmd_status:
+                asyncio.get_running_loop().call_later(
+                    random.uniform(0.5, 1.5) * self._status_time, self._notify
+                )
+
+    def _status(self) -> bytes:
+        temp = _TEMP_BYTES.get(self.temp_level, 0)
+        return (
+            Response._status_header_bytes
+            + bytes(self.rgb)
+            + temp.to_bytes(2, "big")
+            + bytes((self.brightness, int(self.on), self.temp_level or 0, 0, 0))
+        )
+
+    def _notify(self) -> None:
+        if not self.is_connected:
+            return
+        for callback in self._callbacks.values():
+            task = asyncio.ensure_future(
+                callback(_Characteristic(), bytearray(self._status()))
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+
+class FleetReport:
+    def __init__(self, lamps: int, slots: int):
+        self.lamps = lamps
+        self.slots = slots
+        """seconds until every lamp answered its first status"""
+        self.setup_time = 0.0
+        self.setup_failed = 0
+        """share of wall time the event loop spent on the cpu"""
+        self.loop_utilization = 0.0
+        self.connects_per_minute = 0.0
+        self.refused_per_minute = 0.0
+        self.gatt_writes_per_minute = 0.0
+        self.peak_memory = 0
+        self.commands = 0
+        self.failed_commands = 0
+        self.latencies: list[float] = []
+
+    def as_dict(self) -> dict:
+        data = {key: value for key, value in vars(self).items() if key != "latencies"}
+        data["latency_p50"] = percentile(self.latencies, 0.5)
+        data["latency_p99"] = percentile(self.latencies, 0.99)
+        return data
+
+
+async def _command(client: LightBtClient, lamp: VirtualLamp) -> bool:
+    """Connect, change the lamp or only poll it, confirm with a status"""
+    try:
+        if not await client.connect():
+            return False
+        if random.random() < 0.5:
+            desired = DesiredState(
+                on=True,
+                brightness=random.randint(1, 255),
+                temp_level=random.randint(1, 5) if random.random() < 0.5 else None,
+            )
+            if desired.temp_level is None:
+                desired.rgb = tuple(random.randint(0, 255) for _ in range(3))
+            frames = plan_frames(desired, client.status, None, lamp.brightness)
+            if frames and not await client.send_commands(frames):
+                return False
+        return await client.request_status() is not None
+    finally:
+        await client.disconnect(force=True)
+
+
+async def _drive(
+    client: LightBtClient,
+    lamp: VirtualLamp,
+    report: FleetReport,
+    rate: float,
+    until: float,
+) -> None:
+    while True:
+        pause = random.expovariate(rate / 60)
+        await asyncio.sleep(min(pause, max(until - time.monotonic(), 0)))
+        if time.monotonic() >= until:
+            return
+        started = time.monotonic()
+        report.commands += 1
+        if await _command(client, lamp):
+            report.latencies.append(time.monotonic() - started)
+        else:
+            report.failed_commands += 1
+
+
+def _totals(fleet: list[tuple[LightBtClient, VirtualLamp]]) -> tuple[int, int, int]:
+    """Connect attempts, refused connects and writes of all lamps so far"""
+    lamps = [lamp for _, lamp in fleet]
+    return (
+        sum(lamp.connects for lamp in lamps),
+        sum(lamp.refused for lamp in lamps),
+        sum(lamp.writes for lamp in lamps),
+    )
+
+
+async def simulate_fleet(
+    lamps: int,
+    slots: int = 3,
+    duration: float = 60.0,
+    rate: float = 1.0,
+) -> FleetReport:
+    """Start lamps at once, then run rate commands per lamp and minute
+
+    Half of the commands change the lamp, half only poll it. Every lamp runs
+    the real LightBtClient, only the radio is simulated.
+    """
+    report = FleetReport(lamps, slots)
+    pool = SlotPool(slots)
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    fleet = []
+    started = time.monotonic()
+    for index in range(lamps):
+        lamp = VirtualLamp(pool)
+        client = LightBtClient(f"00:00:00:00:{index >> 8:02X}:{index & 0xFF:02X}")
+        client.client_factory = lambda lamp=lamp: lamp
+        fleet.append((client, lamp))
+
+    async def _first_status(client: LightBtClient, lamp: VirtualLamp) -> bool:
+        # like the first poll, lamps retry until a slot is free
+        until = time.monotonic() + duration
+        while time.monotonic() < until:
+            if await _command(client, lamp) or client.status is not None:
+                return True
+        return False
+
+    results = await asyncio.gather(*(_first_status(*item) for item in fleet))
+    report.setup_time = time.monotonic() - started
+    report.setup_failed = results.count(False)
+
+    connects, refused, writes = _totals(fleet)
+    started, cpu = time.monotonic(), time.process_time()
+    until = started + duration
+    await asyncio.gather(
+        *(_drive(client, lamp, report, rate, until) for client, lamp in fleet)
+    )
+    elapsed = time.monotonic() - started
+    minutes = elapsed / 60
+
+    report.loop_utilization = (time.process_time() - cpu) / elapsed
+    total_connects, total_refused, total_writes = _totals(fleet)
+    report.connects_per_minute = (total_connects - connects) / minutes
+    report.refused_per_minute = (total_refused - refused) / minutes
+    report.gatt_writes_per_minute = (total_writes - writes) / minutes
+    report.peak_memory = tracemalloc.get_traced_memory()[1]
+    if not tracing:
+        tracemalloc.stop()
+    return report
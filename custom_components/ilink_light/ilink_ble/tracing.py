@@ -0,0 +1,156 @@
+"""Span tracing exported in Chrome trace / Perfetto JSON format."""
+import asyncio
+import itertools
+import json
+import time
+import weakref
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer: "Tracer", name: str, args: dict):
+        self._tracer = tracer
+        self._name = name
+        self._args = args
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self._args["error"] = repr(exc)
+        self._tracer.complete(self._name, self._start, **self._args)
+
+
+class Tracer:
+    """Collects spans while enabled, span() is a shared no-op otherwise
+
+    Spans are drawn on a track per asyncio task, concurrent sessions would
+    overlap on a shared one without nesting.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.enabled = False
+        self._events: list[dict] = []
+        self._tids: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        """task name of every track, track 0 is for callbacks outside tasks"""
+        self._tracks: dict[int, str] = {}
+        self._ids = itertools.count(1)
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, args)
+
+    def now(self) -> int:
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def complete(self, name: str, start: int, **args) -> None:
+        """Add span which started at start (perf_counter_ns) and ends now"""
+        if not self.enabled or not start:
+            return
+        end = time.perf_counter_ns()
+        self._events.append(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": 1,
+                "tid": self._tid(),
+                "args": args,
+            }
+        )
+
+    def complete_async(self, name: str, start: int, **args) -> None:
+        """Like complete, for spans ending in another task than they started"""
+        if not self.enabled or not start:
+            return
+        end = time.perf_counter_ns()
+        event = {"name": name, "cat": name, "id": next(self._ids), "pid": 1}
+        self._events.append({**event, "ph": "b", "ts": start / 1000, "args": args})
+        self._events.append({**event, "ph": "e", "ts": end / 1000})
+
+    def instant(self, name: str, **args) -> None:
+        if not self.enabled:
+            return
+        self._events.append(
+            {
+                "name": name,
+                "ph": "i",
+                "s": "t",
+                "ts": time.perf_counter_ns() / 1000,
+                "pid": 1,
+                "tid": self._tid(),
+                "args": args,
+            }
+        )
+
+    def _tid(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            self._tracks.setdefault(0, "callbacks")
+            return 0
+        if (tid := self._tids.get(task)) is None:
+            tid = self._tids[task] = len(self._tracks) + 1
+            self._tracks[tid] = task.get_name()
+        return tid
+
+    def start(self) -> None:
+        self._events = []
+        self._tids.clear()
+        self._tracks = {}
+        self.enabled = True
+
+    def stop(self) -> list[dict]:
+        """Recorded events, the names of their tracks included"""
+        self.enabled = False
+        events, self._events = self._events, []
+        events.extend(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 1,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in self._tracks.items()
+        )
+        return events
+
+    def export(self, path: str, events: list[dict]) -> None:
+        """Blocking, run it in executor"""
+        meta = {
+            "name": "process_name",
+            "ph": "M",
+            "pid": 1,
+            "args": {"name": self.name},
+        }
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"traceEvents": [meta] + events, "displayTimeUnit": "ms"},
+                file,
+                default=_json_default,
+            )
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return str(value)
@@ -1,22 +1,60 @@
-import asyncio
-from typing import Any
+from datetime import datetime, timedelta
+from typing import Any, Self
+
+import voluptuous as vol
 
 from homeassistant.components.light import (
     ATTR_BRIGHTNESS,
+    ATTR_COLOR_MODE,
     ATTR_COLOR_TEMP_KELVIN,
     ATTR_EFFECT,
+    ATTR_HS_COLOR,
     ATTR_RGB_COLOR,
+    ATTR_XY_COLOR,
     ColorMode,
     LightEntity,
     LightEntityDescription,
     LightEntityFeature,
 )
 from homeassistant.const import CONF_DEVICES
+from homeassistant.helpers import config_validation as cv, entity_platform
+from homeassistant.helpers.restore_state import ExtraStoredData, RestoreEntity
+from homeassistant.util import dt as dt_util
 
-from .commands import ColorTempLevelUtil, Scenes
-from .const import CONF_NAME, DOMAIN, LOGGER
-from .coordinator import LightCoordinator, LightState
+from .circadian import CircadianSettings
+from .const import (
+    CONF_NAME,
+    DATA_PRESETS,
+    DEFAULT_PREWARM_HOLD,
+    DOMAIN,
+    EFFECTS_COMMON,
+    EFFECTS_PRESETS,
+    LOGGER,
+    MAX_PREWARM_HOLD,
+)
+from .coordinator import SCENE, LightCoordinator, LightState
 from .entity import iLinkLightBaseEntity
+from .ilink_ble import Scenes
+from .presets import Preset, compile_presets
+
+ATTR_OUT_OF_SYNC = "out_of_sync"
+ATTR_STALE = "stale"
+ATTR_LAST_SEEN = "last_seen"
+ATTR_DURATION = "duration"
+ATTR_PRESET = "preset"
+ATTR_ENABLED = "enabled"
+ATTR_MIN_BRIGHTNESS = "min_brightness"
+ATTR_MAX_BRIGHTNESS = "max_brightness"
+ATTR_BRIGHTNESS_STEP = "brightness_step"
+ATTR_OVERRIDE = "override"
+ATTR_CIRCADIAN = "circadian"
+ATTR_HOLD = "hold"
+
+SERVICE_CAPTURE = "capture"
+SERVICE_ACTIVATE_PRESET = "activate_preset"
+SERVICE_SET_CIRCADIAN = "set_circadian"
+SERVICE_PREWARM = "prewarm"
+SERVICE_TRACE = "trace"
 
 light_description = LightEntityDescription(
     key="light",
@@ -26,6 +64,7 @@ light_description = LightEntityDescription(
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     ha_entities = []
+    presets = hass.data[DOMAIN].get(DATA_PRESETS) or compile_presets({})
 
     for device_id in config_entry.data[CONF_DEVICES]:
         LOGGER.debug("Starting iLink lights: %s", config_entry.data[CONF_DEVICES])
@@ -38,28 +77,108 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
         coordinator = hass.data[DOMAIN][CONF_DEVICES][device_id]
 
         # Create entities for this device
-        ha_entities.append(iLinkLightEntity(coordinator, light_description))
+        ha_entities.append(
+            iLinkLightEntity(coordinator, light_description, presets)
+        )
+
+    # restored state is used until the coordinators poll the devices
+    async_add_entities(ha_entities)
+
+    platform = entity_platform.async_get_current_platform()
+    platform.async_register_entity_service(
+        SERVICE_CAPTURE,
+        {vol.Optional(ATTR_DURATION, default=60): cv.positive_int},
+        "async_capture",
+    )
+    platform.async_register_entity_service(
+        SERVICE_TRACE,
+        {vol.Optional(ATTR_DURATION, default=60): cv.positive_int},
+        "async_trace",
+    )
+    platform.async_register_entity_service(
+        SERVICE_ACTIVATE_PRESET,
+        {vol.Required(ATTR_PRESET): vol.In(list(presets))},
+        "async_activate_preset",
+    )
+    platform.async_register_entity_service(
+        SERVICE_SET_CIRCADIAN,
+        {
+            vol.Required(ATTR_ENABLED): cv.boolean,
+            vol.Optional(ATTR_MIN_BRIGHTNESS, default=40): cv.byte,
+            vol.Optional(ATTR_MAX_BRIGHTNESS, default=255): cv.byte,
+            vol.Optional(ATTR_BRIGHTNESS_STEP, default=16): vol.All(
+                vol.Coerce(int), vol.Range(1, 255)
+            ),
+            vol.Optional(ATTR_OVERRIDE, default={"hours": 1}): cv.time_period,
+        },
+        "async_set_circadian",
+    )
+    platform.async_register_entity_service(
+        SERVICE_PREWARM,
+        {
+            vol.Optional(ATTR_HOLD, default=DEFAULT_PREWARM_HOLD): vol.All(
+                vol.Coerce(int), vol.Range(1, MAX_PREWARM_HOLD)
+            )
+        },
+        "async_prewarm",
+    )
+
+
+class iLinkLightExtraStoredData(ExtraStoredData):
+    """Last known device state and when it was reported by the device."""
+
+    def __init__(self, state: dict, last_seen: datetime | None) -> None:
+        self.state = state
+        self.last_seen = last_seen
 
-    async_add_entities(ha_entities, True)
+    def as_dict(self) -> dict[str, Any]:
+        data = {key.value: self.state.get(key) for key in LightState}
+        if data[LightState.RGB] is not None:
+            data[LightState.RGB] = list(data[LightState.RGB])
+        data[ATTR_LAST_SEEN] = self.last_seen.isoformat() if self.last_seen else None
+        return data
 
+    @classmethod
+    def from_dict(cls, restored: dict[str, Any]) -> Self | None:
+        try:
+            state = {key: restored.get(key.value) for key in LightState}
+            if state[LightState.RGB] is not None:
+                state[LightState.RGB] = tuple(state[LightState.RGB])
+            last_seen = restored.get(ATTR_LAST_SEEN)
+            return cls(state, dt_util.parse_datetime(last_seen) if last_seen else None)
+        except (AttributeError, TypeError, ValueError):
+            return None
 
-class iLinkLightEntity(iLinkLightBaseEntity, LightEntity):
+
+class iLinkLightEntity(iLinkLightBaseEntity, LightEntity, RestoreEntity):
     min_color_temp_kelvin = 3000
     max_color_temp_kelvin = 6000
 
     _attr_supported_color_modes = {
         ColorMode.COLOR_TEMP,
+        ColorMode.HS,
         ColorMode.RGB,
+        ColorMode.XY,
     }
     _attr_color_mode = ColorMode.COLOR_TEMP
     _attr_supported_features = LightEntityFeature.EFFECT
     _attr_effect = None
+    # flags flipping while the light stays the same, e.g. stale on every gap in
+    # advertisements, would make new attribute rows in the recorder
+    _unrecorded_attributes = frozenset({ATTR_CIRCADIAN, ATTR_OUT_OF_SYNC, ATTR_STALE})
 
     def __init__(
-        self, coordinator: LightCoordinator, description: LightEntityDescription
+        self,
+        coordinator: LightCoordinator,
+        description: LightEntityDescription,
+        presets: dict[str, Preset],
     ) -> None:
         super().__init__(coordinator, description)
-        self._attr_effect_list = ["100%", "Sleep"] + Scenes.all()
+        self._presets = presets
+        scenes = {EFFECTS_COMMON: Scenes.some, EFFECTS_PRESETS: list}.get(
+            coordinator.effects, Scenes.all
+        )
+        self._attr_effect_list = list(presets) + scenes()
 
     @property
     def brightness(self):
@@ -69,6 +188,22 @@ class iLinkLightEntity(iLinkLightBaseEntity, LightEntity):
     def color_temp_kelvin(self) -> int | None:
         return self.coordinator.state[LightState.COLORTEMP]
 
+    @property
+    def color_mode(self) -> ColorMode:
+        mode = self._attr_color_mode
+        if mode not in (ColorMode.HS, ColorMode.XY):
+            return mode
+        # lamp changed elsewhere, requested color doesn't describe it anymore
+        rgb = self.coordinator.state[LightState.RGB]
+        colors = self.coordinator.colors
+        if mode == ColorMode.HS and self._attr_hs_color is not None:
+            expected = colors.hs(*self._attr_hs_color)
+        elif mode == ColorMode.XY and self._attr_xy_color is not None:
+            expected = colors.xy(*self._attr_xy_color)
+        else:
+            return ColorMode.RGB
+        return mode if rgb is not None and tuple(rgb) == expected else ColorMode.RGB
+
     @property
     def rgb_color(self) -> tuple[int, int, int] | None:
         """Return the rgb color value [int, int, int]."""
@@ -83,60 +218,151 @@ class iLinkLightEntity(iLinkLightBaseEntity, LightEntity):
     def is_on(self) -> bool:
         return self.coordinator.state[LightState.POWER]
 
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Flag attributes the lamp did not reach or did not confirm yet."""
+        return {
+            ATTR_OUT_OF_SYNC: sorted(self.coordinator.divergent),
+            ATTR_STALE: self.coordinator.stale,
+            ATTR_CIRCADIAN: self.coordinator.circadian is not None,
+        }
+
+    @property
+    def extra_restore_state_data(self) -> iLinkLightExtraStoredData:
+        return iLinkLightExtraStoredData(
+            self.coordinator.state, self.coordinator.last_seen
+        )
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+
+        if (last_state := await self.async_get_last_state()) is not None:
+            color_mode = last_state.attributes.get(ATTR_COLOR_MODE)
+            if color_mode in self.supported_color_modes:
+                self._attr_color_mode = color_mode
+            if (hs_color := last_state.attributes.get(ATTR_HS_COLOR)) is not None:
+                self._attr_hs_color = tuple(hs_color)
+            if (xy_color := last_state.attributes.get(ATTR_XY_COLOR)) is not None:
+                self._attr_xy_color = tuple(xy_color)
+            self._attr_effect = last_state.attributes.get(ATTR_EFFECT)
+
+        if (last_data := await self.async_get_last_extra_data()) is not None:
+            restored = iLinkLightExtraStoredData.from_dict(last_data.as_dict())
+            if restored is not None:
+                self.coordinator.restore_state(restored.state, restored.last_seen)
+
     async def async_turn_on(self, **kwargs: Any) -> None:
         """turn on"""
-        if not self.is_on:
-            self.coordinator.state[LightState.POWER] = True
-            self.async_write_ha_state()
-            await self.coordinator.async_update_state(LightState.POWER, True)
+        with self.coordinator.tracer.span("turn_on", **kwargs):
+            await self._async_turn_on(**kwargs)
+
+    async def _async_turn_on(self, **kwargs: Any) -> None:
+        # all attributes are planned and sent together
+        changes = {LightState.POWER: True}
 
         if ATTR_COLOR_TEMP_KELVIN in kwargs:
-            await self.coordinator.async_update_state(
-                LightState.COLORTEMP, kwargs[ATTR_COLOR_TEMP_KELVIN]
-            )
+            changes[LightState.COLORTEMP] = kwargs[ATTR_COLOR_TEMP_KELVIN]
             self._attr_color_mode = ColorMode.COLOR_TEMP
             self._attr_effect = None
+        # requested colors are the state, calibrated when sent to the lamp
         if ATTR_RGB_COLOR in kwargs:
-            await self.coordinator.async_update_state(
-                LightState.RGB, kwargs[ATTR_RGB_COLOR]
-            )
+            changes[LightState.RGB] = kwargs[ATTR_RGB_COLOR]
             self._attr_color_mode = ColorMode.RGB
             self._attr_effect = None
+        if ATTR_HS_COLOR in kwargs:
+            changes[LightState.RGB] = self.coordinator.colors.hs(*kwargs[ATTR_HS_COLOR])
+            self._attr_hs_color = kwargs[ATTR_HS_COLOR]
+            self._attr_color_mode = ColorMode.HS
+            self._attr_effect = None
+        if ATTR_XY_COLOR in kwargs:
+            changes[LightState.RGB] = self.coordinator.colors.xy(*kwargs[ATTR_XY_COLOR])
+            self._attr_xy_color = kwargs[ATTR_XY_COLOR]
+            self._attr_color_mode = ColorMode.XY
+            self._attr_effect = None
         if ATTR_EFFECT in kwargs:
-            match kwargs[ATTR_EFFECT]:
-                case "100%":
-                    # only sun light level 3 has the most powerfull brightness
-                    await self.coordinator.async_update_state(
-                        LightState.COLORTEMP, ColorTempLevelUtil.level_to_color_temp(3)
-                    )
-                    await asyncio.sleep(0.03)
-                    await self.coordinator.async_update_state(
-                        LightState.BRIGHTNESS, 255
-                    )
-                    self._attr_effect = kwargs[ATTR_EFFECT]
-                    self._attr_color_mode = ColorMode.COLOR_TEMP
-                case "Sleep":
-                    await self.coordinator.async_update_state(
-                        LightState.COLORTEMP, ColorTempLevelUtil.level_to_color_temp(5)
-                    )
-                    await asyncio.sleep(0.03)
-                    await self.coordinator.async_update_state(LightState.BRIGHTNESS, 4)
-                    self._attr_effect = kwargs[ATTR_EFFECT]
-                    self._attr_color_mode = ColorMode.COLOR_TEMP
-                case _:
-                    await self.coordinator.async_update_state(
-                        "scene", Scenes.name_to_id(kwargs[ATTR_EFFECT])
-                    )
-                    self._attr_effect = kwargs[ATTR_EFFECT]
-                    self._attr_color_mode = ColorMode.RGB
+            if (preset := self._presets.get(kwargs[ATTR_EFFECT])) is not None:
+                await self.async_activate_preset(preset.name)
+                if ATTR_BRIGHTNESS not in kwargs:
+                    return
+                changes = {}
+            else:
+                changes[SCENE] = Scenes.name_to_id(kwargs[ATTR_EFFECT])
+                self._attr_color_mode = ColorMode.RGB
+                self._attr_effect = kwargs[ATTR_EFFECT]
         if ATTR_BRIGHTNESS in kwargs:
-            await self.coordinator.async_update_state(
-                LightState.BRIGHTNESS, kwargs[ATTR_BRIGHTNESS]
+            changes[LightState.BRIGHTNESS] = kwargs[ATTR_BRIGHTNESS]
+
+        await self.coordinator.async_update_states(changes)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Attributes bringing the light back to how it looks now."""
+        if not self.is_on:
+            return {LightState.POWER: False}
+        state = {LightState.POWER: True, ATTR_BRIGHTNESS: self.brightness}
+        if self.effect is not None:
+            state[ATTR_EFFECT] = self.effect
+            return state
+        match self.color_mode:
+            case ColorMode.COLOR_TEMP:
+                state[ATTR_COLOR_TEMP_KELVIN] = self.color_temp_kelvin
+            case ColorMode.HS:
+                state[ATTR_HS_COLOR] = self.hs_color
+            case ColorMode.XY:
+                state[ATTR_XY_COLOR] = self.xy_color
+            case _:
+                state[ATTR_RGB_COLOR] = self.rgb_color
+        return state
+
+    async def async_apply(self, state: dict[str, Any]) -> None:
+        """Turn on or off with light attributes, as taken by snapshot."""
+        attributes = dict(state)
+        if attributes.pop(LightState.POWER, True):
+            await self.async_turn_on(**attributes)
+        else:
+            await self.async_turn_off()
+
+    async def async_activate_preset(self, preset: str) -> None:
+        """Send the pre-encoded frames of a preset."""
+        preset = self._presets[preset]
+        if preset.state.rgb is not None or preset.state.scene is not None:
+            self._attr_color_mode = ColorMode.RGB
+        elif preset.state.temp_level is not None:
+            self._attr_color_mode = ColorMode.COLOR_TEMP
+        self._attr_effect = preset.name
+        await self.coordinator.async_apply_preset(preset)
+
+    async def async_set_circadian(
+        self,
+        enabled: bool,
+        min_brightness: int,
+        max_brightness: int,
+        brightness_step: int,
+        override: timedelta,
+    ) -> None:
+        """Let the light follow the sun until disabled."""
+        settings = None
+        if enabled:
+            settings = CircadianSettings(
+                min(min_brightness, max_brightness),
+                max(min_brightness, max_brightness),
+                brightness_step,
+                override,
             )
+        self.coordinator.set_circadian(settings)
+        self.async_write_ha_state()
+
+    async def async_prewarm(self, hold: int) -> None:
+        """Open the connection now so the next command doesn't wait for it."""
+        await self.coordinator.async_prewarm(hold)
+
+    async def async_trace(self, duration: int) -> None:
+        """Write a Chrome trace of the command pipeline of this light."""
+        await self.coordinator.async_trace(duration)
+
+    async def async_capture(self, duration: int) -> None:
+        """Record BLE traffic of this light to a capture file."""
+        await self.coordinator.async_capture(duration)
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """turn off"""
-        if self.is_on:
-            self.coordinator.state[LightState.POWER] = False
-            self.async_write_ha_state()
         await self.coordinator.async_update_state(LightState.POWER, False)
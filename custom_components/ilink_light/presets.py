@@ -0,0 +1,70 @@
+"""Named presets compiled once into encoded frame sequences."""
+from .ilink_ble import Commands, Scenes
+from .ilink_ble.planner import FRAME_GAP, DesiredState
+
+PRESET_POWER = "power"
+PRESET_TEMP_LEVEL = "temp_level"
+PRESET_RGB = "rgb"
+PRESET_BRIGHTNESS = "brightness"
+PRESET_SCENE = "scene"
+PRESET_DELAY = "delay"
+
+BUILTIN_PRESETS = {
+    # only sun light level 3 has the most powerfull brightness
+    "100%": [{PRESET_POWER: True, PRESET_TEMP_LEVEL: 3, PRESET_BRIGHTNESS: 255}],
+    "Sleep": [{PRESET_POWER: True, PRESET_TEMP_LEVEL: 5, PRESET_BRIGHTNESS: 4}],
+}
+
+
+class Preset:
+    def __init__(
+        self, name: str, frames: tuple[tuple[bytes, float], ...], state: DesiredState
+    ):
+        self.name = name
+        """encoded frame and delay to wait after it"""
+        self.frames = frames
+        """state of the lamp once all frames are sent"""
+        self.state = state
+
+
+def compile_preset(name: str, steps: list[dict]) -> Preset:
+    """Encode preset steps, each step may set several attributes and a delay"""
+    frames = []
+    state = DesiredState()
+    for step in steps:
+        commands = []
+        if (on := step.get(PRESET_POWER)) is not None:
+            commands.append(Commands.on() if on else Commands.off())
+            state.on = on
+        if (level := step.get(PRESET_TEMP_LEVEL)) is not None:
+            commands.append(Commands.white_temp(level))
+            state.temp_level, state.rgb, state.scene = level, None, None
+        if (rgb := step.get(PRESET_RGB)) is not None:
+            rgb = tuple(rgb)
+            commands.append(Commands.rgb(*rgb))
+            state.temp_level, state.rgb, state.scene = None, rgb, None
+        if (scene := step.get(PRESET_SCENE)) is not None:
+            if isinstance(scene, str):
+                scene = Scenes.name_to_id(scene)
+            commands.append(Commands.scene(scene))
+            state.temp_level, state.rgb, state.scene = None, None, scene
+        if (brightness := step.get(PRESET_BRIGHTNESS)) is not None:
+            commands.append(Commands.brightness(brightness))
+            state.brightness = brightness
+
+        delay = step.get(PRESET_DELAY, FRAME_GAP)
+        for index, command in enumerate(commands):
+            last = index == len(commands) - 1
+            frames.append((bytes.fromhex(command), delay if last else FRAME_GAP))
+
+    return Preset(name, tuple(frames), state)
+
+
+def compile_presets(presets: dict[str, list[dict]]) -> dict[str, Preset]:
+    compiled = {
+        name: compile_preset(name, steps) for name, steps in BUILTIN_PRESETS.items()
+    }
+    for name, steps in presets.items():
+        compiled[name] = compile_preset(name, steps)
+    return compiled
+
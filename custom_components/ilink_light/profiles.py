@@ -0,0 +1,53 @@
+"""What was learned about each lamp, kept across restarts."""
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, PROFILE_SAVE_DELAY
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.profiles"
+
+PROFILE_VERSION = "version"
+PROFILE_MANUFACTURER = "manufacturer"
+PROFILE_CAPABILITIES = "capabilities"
+PROFILE_LATENCY = "latency"
+PROFILE_STATE = "state"
+PROFILE_LAST_SEEN = "last_seen"
+PROFILE_JOURNAL = "journal"
+PROFILE_CIRCADIAN = "circadian"
+
+
+class ProfileStore:
+    """One file for all lamps, saved a while after the last change"""
+
+    def __init__(self, hass: HomeAssistant):
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._profiles: dict[str, dict] = {}
+        self._coordinators = {}
+
+    async def async_load(self) -> None:
+        self._profiles = await self._store.async_load() or {}
+
+    def get(self, address: str) -> dict | None:
+        return self._profiles.get(address)
+
+    def add(self, coordinator) -> None:
+        self._coordinators[coordinator.address] = coordinator
+
+    def remove(self, coordinator) -> None:
+        if self._coordinators.pop(coordinator.address, None) is not None:
+            # keep what it learned until the next save
+            self._profiles[coordinator.address] = coordinator.profile()
+
+    async def async_save(self) -> None:
+        await self._store.async_save(self._data_to_save())
+
+    @callback
+    def async_schedule_save(self) -> None:
+        self._store.async_delay_save(self._data_to_save, PROFILE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict:
+        for address, coordinator in self._coordinators.items():
+            self._profiles[address] = coordinator.profile()
+        return self._profiles
@@ -0,0 +1,35 @@
+"""Device lookup through Home Assistant's bluetooth adapters and proxies."""
+from bleak import BLEDevice
+from habluetooth import get_manager
+from home_assistant_bluetooth import BluetoothServiceInfoBleak
+
+from homeassistant.components import bluetooth
+from homeassistant.core import HomeAssistant
+
+from .ilink_ble import DeviceResolver
+
+
+class HassDeviceResolver(DeviceResolver):
+    def __init__(self, hass: HomeAssistant):
+        self._hass = hass
+
+    def ble_device(self, address: str) -> BLEDevice | None:
+        # any adapter or proxy hearing it, the client picks one when connecting
+        return bluetooth.async_ble_device_from_address(
+            self._hass, address.upper(), connectable=True
+        )
+
+    @staticmethod
+    def free_slots(source: str | None = None) -> int | None:
+        """Free connection slots of a source, of all sources without one"""
+        try:
+            allocations = get_manager().async_current_allocations(source)
+        except Exception:
+            # older bluetooth stack without slot tracking
+            return None
+        if not allocations:
+            return None
+        return sum(allocation.free for allocation in allocations)
+
+    def service_info(self, address: str) -> BluetoothServiceInfoBleak | None:
+        return bluetooth.async_last_service_info(self._hass, address, connectable=True)
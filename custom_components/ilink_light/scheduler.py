@@ -0,0 +1,85 @@
+"""One poll timer for all lamps, spreading polls within a budget."""
+import datetime as dt
+import math
+import random
+import time
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import event
+
+from .const import LOGGER, POLL_JITTER
+
+
+class _Entry:
+    __slots__ = ("coordinator", "due", "task")
+
+    def __init__(self, coordinator, due: float):
+        self.coordinator = coordinator
+        """monotonic time of the next poll, inf while one is running"""
+        self.due = due
+        self.task = None
+
+
+class PollScheduler:
+    """Polls at most one lamp per slot, the most overdue one first
+
+    Lamps report their own poll_interval and status_age, a lamp which sent a
+    status on its own since is not polled again.
+    """
+
+    def __init__(self, hass: HomeAssistant, budget: int):
+        self._hass = hass
+        self._slot = 60 / budget
+        self._entries: dict[str, _Entry] = {}
+        self._unsub = None
+
+    def add(self, coordinator, delay: float) -> None:
+        due = time.monotonic() + self._jitter(delay)
+        self._entries[coordinator.address] = _Entry(coordinator, due)
+        if self._unsub is None:
+            self._unsub = event.async_track_time_interval(
+                self._hass, self._async_tick, dt.timedelta(seconds=self._slot)
+            )
+
+    def remove(self, coordinator) -> None:
+        self._entries.pop(coordinator.address, None)
+        if not self._entries and self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    def poll_soon(self, coordinator, delay: float) -> None:
+        if (entry := self._entries.get(coordinator.address)) is not None:
+            entry.due = min(entry.due, time.monotonic() + delay)
+
+    @staticmethod
+    def _jitter(seconds: float) -> float:
+        return seconds * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+    @callback
+    def _async_tick(self, now: dt.datetime) -> None:
+        clock = time.monotonic()
+        for entry in sorted(self._entries.values(), key=lambda entry: entry.due):
+            if entry.due > clock:
+                return
+
+            coordinator = entry.coordinator
+            interval = coordinator.poll_interval
+            age = coordinator.status_age
+            if age is not None and age < interval:
+                # status arrived meanwhile, it counts as a poll
+                entry.due = clock + self._jitter(interval - age)
+                continue
+
+            entry.due = math.inf
+            entry.task = self._hass.async_create_task(self._async_poll(entry))
+            return
+
+    async def _async_poll(self, entry: _Entry) -> None:
+        try:
+            await entry.coordinator.async_refresh()
+        except Exception as e:
+            LOGGER.warning("Poll of %s failed: %s", entry.coordinator.address, e)
+        finally:
+            interval = entry.coordinator.poll_interval
+            entry.due = min(entry.due, time.monotonic() + self._jitter(interval))
+            entry.task = None
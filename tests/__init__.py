@@ -0,0 +1,16 @@
+"""Tests and benchmarks of the iLink Light integration and its ilink_ble library.
+
+python -m pytest tests
+python -m tests.benchmarks
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# ilink_ble is importable on its own like with the command line, the
+# integration as custom_components.ilink_light
+for path in (ROOT, ROOT / "custom_components" / "ilink_light"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,261 @@
+"""Micro-benchmarks, run with python -m tests.benchmarks [name ...]"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import tempfile
+import timeit
+import tracemalloc
+
+from homeassistant.const import (
+    ATTR_ATTRIBUTION,
+    ATTR_SUPPORTED_FEATURES,
+    EVENT_STATE_CHANGED,
+)
+from homeassistant.helpers.json import json_bytes
+from homeassistant.helpers.restore_state import ATTR_RESTORED
+
+from custom_components.ilink_light.coordinator import LampState, LightState
+from custom_components.ilink_light.light import iLinkLightEntity, light_description
+from custom_components.ilink_light.presets import compile_presets
+from custom_components.ilink_light.profiles import ProfileStore
+from custom_components.ilink_light.scheduler import PollScheduler
+from ilink_ble.commands import Commands, Response, ResponseStatus
+from ilink_ble.simulation import SlotPool, VirtualLamp
+
+from . import legacy
+from .fleet import simulate_integration
+from .hass import add_lamp, home_assistant
+from .test_commands import status_frame
+
+"""a states row without its attributes, ids, timestamps and context, roughly"""
+STATE_ROW_BYTES = 100
+"""left out of every row by the recorder"""
+RECORDER_EXCLUDED = {ATTR_ATTRIBUTION, ATTR_RESTORED, ATTR_SUPPORTED_FEATURES}
+
+
+def _per_call(function, *args) -> float:
+    """Best microseconds per call out of five runs"""
+    timer = timeit.Timer(lambda: function(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(5, number)) / number * 1e6
+
+
+def _compare(name: str, before: float, after: float) -> None:
+    print(f"{name:<24}{before:>10.2f}us{after:>10.2f}us{before / after:>10.2f}x")
+
+
+def bench_protocol() -> None:
+    """Frame encoding and status parsing, before and after optimizing"""
+    rng = random.Random(0)
+    print(f"{'':<24}{'legacy':>12}{'current':>12}{'speedup':>11}")
+
+    frame = Commands.rgb(12, 34, 56)[:-2]
+    _compare("crc", _per_call(legacy.crc, frame), _per_call(Commands._crc, frame))
+
+    def encode(crc):
+        cmd = f"{Commands._header}{Commands._header_rgb}{Commands._cmd_rgb}0c2238"
+        return f"{cmd}{crc(cmd)}"
+
+    _compare(
+        "encode rgb",
+        _per_call(encode, legacy.crc),
+        _per_call(encode, Commands._crc),
+    )
+
+    status = bytearray(status_frame(True, 200, 3, (1, 2, 3)))
+    _compare(
+        "is_status",
+        _per_call(legacy.is_status, status),
+        _per_call(Response.is_status, status),
+    )
+    _compare(
+        "parse_status",
+        _per_call(legacy.parse_status, status),
+        _per_call(Response.parse_status, status),
+    )
+    into = Response.parse_status(status)
+    _compare(
+        "parse_status into",
+        _per_call(legacy.parse_status, status),
+        _per_call(Response.parse_status, status, into),
+    )
+
+    other = bytearray(rng.randbytes(15))
+    _compare(
+        "is_status other",
+        _per_call(legacy.is_status, other),
+        _per_call(Response.is_status, other),
+    )
+
+
+async def _light_hour(config_dir: str) -> list:
+    """States one lamp's light writes in an hour of polls and circadian steps"""
+    async with home_assistant(config_dir) as hass:
+        profiles = ProfileStore(hass)
+        await profiles.async_load()
+        coordinator = await add_lamp(
+            hass, VirtualLamp(SlotPool(1)), PollScheduler(hass, 12), profiles
+        )
+        light = iLinkLightEntity(coordinator, light_description, compile_presets({}))
+        light.hass, light.entity_id = hass, "light.lamp"
+        coordinator.async_add_listener(light._handle_coordinator_update)
+        states = []
+        hass.bus.async_listen(
+            EVENT_STATE_CHANGED, lambda event: states.append(event.data["new_state"])
+        )
+
+        status = ResponseStatus(True, 128, 3, (0xFF, 0xFF, 0xFF))
+        for minute in range(60):
+            if minute % 15 == 7:
+                # gap in advertisements, stale until the next status
+                coordinator._async_unavailable(None)
+            if minute % 5 == 0:
+                status.brightness += 8
+            await coordinator._client_status_updated(status)
+        await hass.async_block_till_done()
+        await coordinator.async_shutdown()
+        return states
+
+
+def _recorded_bytes(states: list, unrecorded: frozenset) -> tuple[int, int]:
+    """States rows and bytes written, equal attributes share one row"""
+    excluded = RECORDER_EXCLUDED | unrecorded
+    attributes = {
+        json_bytes({k: v for k, v in state.attributes.items() if k not in excluded})
+        for state in states
+    }
+    return len(states), len(states) * STATE_ROW_BYTES + sum(map(len, attributes))
+
+
+def bench_recorder() -> None:
+    """Recorder bytes per hour of one lamp, polled every minute"""
+    # the light is written without an entity platform
+    logging.getLogger("homeassistant.helpers.entity").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as config_dir:
+        states = asyncio.run(_light_hour(config_dir))
+    print(f"{'':<24}{'rows':>12}{'bytes':>12}")
+    for name, unrecorded in (
+        ("flags recorded", iLinkLightEntity._entity_component_unrecorded_attributes),
+        (
+            "current",
+            iLinkLightEntity._entity_component_unrecorded_attributes
+            | iLinkLightEntity._unrecorded_attributes,
+        ),
+    ):
+        rows, written = _recorded_bytes(states, unrecorded)
+        print(f"{name:<24}{rows:>12}{written:>12}")
+
+
+def _allocated(function, *args) -> int:
+    """Bytes function allocated and still holds on to when it returns"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = function(*args)
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del kept
+    return allocated
+
+
+def _legacy_states(count: int) -> list[dict]:
+    return [
+        {
+            LightState.POWER: True,
+            LightState.BRIGHTNESS: 255,
+            LightState.COLORTEMP: 4000,
+            LightState.RGB: tuple([0xFF, 0xFF, 0xFF]),
+        }
+        for _ in range(count)
+    ]
+
+
+def _lamp_states(count: int) -> list[LampState]:
+    return [LampState(True, 255, 4000, tuple([0xFF, 0xFF, 0xFF])) for _ in range(count)]
+
+
+def _statuses(count: int, into: ResponseStatus | None) -> list:
+    frame = bytearray(status_frame(True, 200, 3, (1, 2, 3)))
+    return [Response.parse_status(frame, into) for _ in range(count)]
+
+
+async def _coordinators(config_dir: str, counts: tuple[int, ...]) -> list[int]:
+    async with home_assistant(config_dir) as hass:
+        profiles = ProfileStore(hass)
+        await profiles.async_load()
+        scheduler = PollScheduler(hass, 12)
+        # color tables are shared, built before measuring
+        coordinators = [
+            await add_lamp(hass, VirtualLamp(SlotPool(1)), scheduler, profiles)
+        ]
+        sizes = []
+        for count in counts:
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            for _ in range(count):
+                coordinators.append(
+                    await add_lamp(hass, VirtualLamp(SlotPool(1)), scheduler, profiles)
+                )
+            sizes.append(tracemalloc.get_traced_memory()[0] - before)
+            tracemalloc.stop()
+        for coordinator in coordinators:
+            await coordinator.async_shutdown()
+        return sizes
+
+
+def bench_memory() -> None:
+    """Bytes per lamp kept by state records and coordinators"""
+    print(f"{'':<24}{'legacy':>12}{'current':>12}{'saved':>11}")
+    count = 1000
+    before = _allocated(_legacy_states, count) / count
+    after = _allocated(_lamp_states, count) / count
+    print(f"{'state':<24}{before:>11.0f}B{after:>11.0f}B{1 - after / before:>10.0%}")
+    # every notification is parsed into the client's record
+    before = _allocated(_statuses, count, None) / count
+    after = _allocated(_statuses, count, ResponseStatus(False, 0, None, None)) / count
+    print(f"{'status':<24}{before:>11.0f}B{after:>11.0f}B{1 - after / before:>10.0%}")
+
+    counts = (10, 100)
+    with tempfile.TemporaryDirectory() as config_dir:
+        sizes = asyncio.run(_coordinators(config_dir, counts))
+    for count, size in zip(counts, sizes):
+        print(f"{f'coordinator, {count} lamps':<24}{'':>12}{size / count:>11.0f}B")
+
+
+def bench_fleet() -> None:
+    """Coordinators and scheduler of 20 and 100 lamps behind 3 slots, reloaded"""
+    logging.getLogger("custom_components.ilink_light").setLevel(logging.ERROR)
+    for lamps in (20, 100):
+        with tempfile.TemporaryDirectory() as config_dir:
+            report = asyncio.run(
+                simulate_integration(config_dir, lamps, slots=3, duration=30.0)
+            )
+        print(json.dumps(report.as_dict()), flush=True)
+
+
+BENCHMARKS = {
+    "protocol": bench_protocol,
+    "recorder": bench_recorder,
+    "memory": bench_memory,
+    "fleet": bench_fleet,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("names", nargs="*", help=", ".join(BENCHMARKS))
+    args = parser.parse_args()
+    if unknown := set(args.names) - BENCHMARKS.keys():
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    for name in args.names or BENCHMARKS:
+        print(f"## {name}: {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name]()
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Fleet of virtual lamps driven by the integration's coordinators and scheduler
+
+Unlike ilink_ble's simulate, polls come from the PollScheduler, changes go
+through LightCoordinator like the entity sends them, and the fleet is reloaded
+once at the end like an options change does.
+"""
+
+import asyncio
+import random
+import time
+import tracemalloc
+
+from custom_components.ilink_light.const import CONF_MAC, CONF_SCAN_INTERVAL
+from custom_components.ilink_light.coordinator import LightCoordinator, LightState
+from custom_components.ilink_light.profiles import ProfileStore
+from custom_components.ilink_light.scheduler import PollScheduler
+from ilink_ble.simulation import FleetReport, SlotPool, VirtualLamp
+
+from .hass import add_lamp, home_assistant
+
+
+class IntegrationReport(FleetReport):
+    def __init__(self, lamps: int, slots: int):
+        super().__init__(lamps, slots)
+        """coordinator updates, each one writes the light's state"""
+        self.state_writes_per_minute = 0.0
+        """seconds until every reloaded lamp answered a status again"""
+        self.reload_time = 0.0
+        self.reload_failed = 0
+
+
+class _Fleet:
+    def __init__(self, hass, lamps: int, slots: int, scan_interval: int):
+        self.hass = hass
+        self.pool = SlotPool(slots)
+        self.lamps = [VirtualLamp(self.pool) for _ in range(lamps)]
+        self.conf = [
+            {
+                CONF_MAC: f"00:00:00:00:{index >> 8:02X}:{index & 0xFF:02X}",
+                CONF_SCAN_INTERVAL: scan_interval,
+            }
+            for index in range(lamps)
+        ]
+        self.coordinators: list[LightCoordinator] = []
+        self.state_writes = 0
+
+    async def async_setup(self, scheduler: PollScheduler, profiles: ProfileStore):
+        """Coordinators as async_setup_entry creates them"""
+        self.coordinators = [
+            await add_lamp(self.hass, lamp, scheduler, profiles, **conf)
+            for lamp, conf in zip(self.lamps, self.conf)
+        ]
+        for coordinator in self.coordinators:
+            coordinator.async_add_listener(self._state_written)
+            # the first poll waits for restored state, nothing to restore here
+            scheduler.poll_soon(coordinator, 0)
+
+    def _state_written(self) -> None:
+        self.state_writes += 1
+
+    async def async_unload(self) -> None:
+        for coordinator in self.coordinators:
+            await coordinator.async_shutdown()
+
+    async def async_first_status(self, until: float) -> int:
+        """Wait until every lamp answered, lamps still stale when time is up"""
+        while time.monotonic() < until:
+            stale = sum(coordinator.stale for coordinator in self.coordinators)
+            if not stale:
+                return 0
+            await asyncio.sleep(0.1)
+        return sum(coordinator.stale for coordinator in self.coordinators)
+
+    def totals(self) -> tuple[int, int, int]:
+        """Connect attempts, refused connects and GATT writes so far"""
+        return (
+            sum(lamp.connects for lamp in self.lamps),
+            sum(lamp.refused for lamp in self.lamps),
+            sum(lamp.writes for lamp in self.lamps),
+        )
+
+
+async def _drive(
+    coordinator: LightCoordinator,
+    report: IntegrationReport,
+    rate: float,
+    until: float,
+) -> None:
+    """Changes as the entity sends them, rate per minute"""
+    while True:
+        pause = random.expovariate(rate / 60)
+        await asyncio.sleep(min(pause, max(until - time.monotonic(), 0)))
+        if time.monotonic() >= until:
+            return
+        changes = {LightState.POWER: True}
+        changes[LightState.BRIGHTNESS] = random.randint(1, 255)
+        if random.random() < 0.5:
+            changes[LightState.COLORTEMP] = random.choice((3000, 4500, 6000))
+        else:
+            changes[LightState.RGB] = tuple(random.randint(0, 255) for _ in range(3))
+        started = time.monotonic()
+        report.commands += 1
+        try:
+            sent = await coordinator.async_update_states(changes)
+        except RuntimeError:
+            # busy for too long, the entity raises the same to the user
+            sent = False
+        if sent:
+            report.latencies.append(time.monotonic() - started)
+        else:
+            report.failed_commands += 1
+
+
+async def simulate_integration(
+    config_dir: str,
+    lamps: int,
+    slots: int = 3,
+    duration: float = 60.0,
+    rate: float = 1.0,
+    budget: int = 120,
+    scan_interval: int = 30,
+) -> IntegrationReport:
+    """Set up lamps, change each rate times a minute besides polls, reload"""
+    report = IntegrationReport(lamps, slots)
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    async with home_assistant(config_dir) as hass:
+        profiles = ProfileStore(hass)
+        await profiles.async_load()
+        fleet = _Fleet(hass, lamps, slots, scan_interval)
+
+        # one poll per slot of the budget, every lamp had a few chances then
+        patience = max(duration, 3 * lamps * 60 / budget)
+        started = time.monotonic()
+        await fleet.async_setup(PollScheduler(hass, budget), profiles)
+        report.setup_failed = await fleet.async_first_status(started + patience)
+        report.setup_time = time.monotonic() - started
+
+        connects, refused, writes = fleet.totals()
+        state_writes = fleet.state_writes
+        started, cpu = time.monotonic(), time.process_time()
+        until = started + duration
+        await asyncio.gather(
+            *(_drive(item, report, rate, until) for item in fleet.coordinators)
+        )
+        elapsed = time.monotonic() - started
+        minutes = elapsed / 60
+
+        report.loop_utilization = (time.process_time() - cpu) / elapsed
+        total_connects, total_refused, total_writes = fleet.totals()
+        report.connects_per_minute = (total_connects - connects) / minutes
+        report.refused_per_minute = (total_refused - refused) / minutes
+        report.gatt_writes_per_minute = (total_writes - writes) / minutes
+        report.state_writes_per_minute = (fleet.state_writes - state_writes) / minutes
+
+        # options changed, entry reloaded, the profile store stays
+        await fleet.async_unload()
+        started = time.monotonic()
+        await fleet.async_setup(PollScheduler(hass, budget), profiles)
+        report.reload_failed = await fleet.async_first_status(started + patience)
+        report.reload_time = time.monotonic() - started
+        await fleet.async_unload()
+        # polls still connecting end before the core stops
+        await hass.async_block_till_done()
+
+    report.peak_memory = tracemalloc.get_traced_memory()[1]
+    if not tracing:
+        tracemalloc.stop()
+    return report
@@ -0,0 +1,66 @@
+"""Home Assistant core without a bluetooth stack, lamps are virtual"""
+import contextlib
+import itertools
+from unittest.mock import patch
+
+from homeassistant.components import bluetooth
+from homeassistant.core import HomeAssistant
+
+from custom_components.ilink_light.const import (
+    CONF_MAC,
+    CONF_NAME,
+    CONF_SCAN_INTERVAL,
+    CONF_SCAN_INTERVAL_FAST,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_SCAN_INTERVAL_FAST,
+    DOMAIN,
+)
+from custom_components.ilink_light.coordinator import LightCoordinator
+from custom_components.ilink_light.profiles import ProfileStore
+from custom_components.ilink_light.scheduler import PollScheduler
+from ilink_ble.simulation import VirtualLamp
+
+_addresses = itertools.count(1)
+
+
+def _unsubscribe(*args, **kwargs):
+    return lambda: None
+
+
+@contextlib.asynccontextmanager
+async def home_assistant(config_dir: str):
+    hass = HomeAssistant(config_dir)
+    hass.data[DOMAIN] = {}
+    with patch.multiple(
+        bluetooth,
+        async_register_callback=_unsubscribe,
+        async_track_unavailable=_unsubscribe,
+        async_last_service_info=lambda *args, **kwargs: None,
+        async_ble_device_from_address=lambda *args, **kwargs: None,
+    ):
+        try:
+            yield hass
+        finally:
+            await hass.async_stop(force=True)
+
+
+async def add_lamp(
+    hass: HomeAssistant,
+    lamp: VirtualLamp,
+    scheduler: PollScheduler,
+    profiles: ProfileStore,
+    **conf,
+) -> LightCoordinator:
+    """Coordinator of a virtual lamp, set up like async_setup_entry does"""
+    index = next(_addresses)
+    conf = {
+        CONF_NAME: f"Lamp {index}",
+        CONF_MAC: f"00:00:00:00:{index >> 8:02X}:{index & 0xFF:02X}",
+        CONF_SCAN_INTERVAL: DEFAULT_SCAN_INTERVAL,
+        CONF_SCAN_INTERVAL_FAST: DEFAULT_SCAN_INTERVAL_FAST,
+        **conf,
+    }
+    coordinator = LightCoordinator(hass, f"device{index}", conf, scheduler, profiles)
+    coordinator.client.client_factory = lambda: lamp
+    await coordinator.async_load_colors()
+    return coordinator
@@ -0,0 +1,37 @@
+"""Protocol code as it was before it was optimized, the reference of tests"""
+
+
+def crc(data: str) -> str:
+    all_sum = 0
+    for i in range(0, len(data), 2):
+        all_sum += int(data[i : i + 2], 16)
+    crc = 0xFF - all_sum & 0xFF
+    return f"{crc:02x}"
+
+
+def is_status(response: bytearray) -> bool:
+    return response.hex().startswith("55aa098815")
+
+
+def parse_status(response: bytearray) -> tuple:
+    """on, brightness, temp_level and rgb, raises on truncated notifications"""
+    r = response[5]
+    g = response[6]
+    b = response[7]
+    temp_level = None
+    match f"{response[8]:02x}{response[9]:02x}":
+        case "ff00":
+            temp_level = 1
+        case "b464":
+            temp_level = 2
+        case "ffff":
+            temp_level = 3
+        case "4bc8":
+            temp_level = 4
+        case "00ff":
+            temp_level = 5
+        case _:
+            temp_level = None
+    brightness = response[10]
+    on = response[11] == 1
+    return on, brightness, temp_level, (r, g, b)
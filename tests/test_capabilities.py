@@ -0,0 +1,103 @@
+import asyncio
+
+from ilink_ble.capabilities import probe_capabilities
+from ilink_ble.client import LightBtClient
+from ilink_ble.commands import Commands
+from ilink_ble.planner import LightMode
+from ilink_ble.simulation import SlotPool, VirtualLamp
+
+ADDRESS = "00:00:00:00:00:01"
+
+
+async def probe(lamp: VirtualLamp, mode: LightMode | None = None):
+    client = LightBtClient(ADDRESS)
+    client.client_factory = lambda: lamp
+    client.hold(30)
+    assert await client.connect()
+    try:
+        return await probe_capabilities(client, mode)
+    finally:
+        client.release()
+        await client.disconnect(force=True)
+
+
+def virtual_lamp(**state) -> VirtualLamp:
+    lamp = VirtualLamp(SlotPool(1), connect_time=0.0, write_time=0.0, status_time=0.0)
+    for name, value in state.items():
+        setattr(lamp, name, value)
+    return lamp
+
+
+def shown(lamp: VirtualLamp) -> tuple:
+    return lamp.on, lamp.brightness, lamp.temp_level, lamp.rgb
+
+
+def test_white_lamp_is_put_back():
+    lamp = virtual_lamp(brightness=100, temp_level=2)
+    before = shown(lamp)
+    assert asyncio.run(probe(lamp)) is not None
+    assert shown(lamp) == before
+
+
+def test_rgb_lamp_is_put_back():
+    lamp = virtual_lamp(brightness=100, temp_level=None, rgb=(10, 20, 30))
+    before = shown(lamp)
+    assert asyncio.run(probe(lamp, LightMode.RGB)) is not None
+    assert shown(lamp) == before
+
+
+def test_off_or_scene_lamp_is_not_probed():
+    # without the mode sent last, rgb can't be told from a scene
+    for lamp, mode in (
+        (virtual_lamp(on=False), None),
+        (virtual_lamp(temp_level=None), None),
+        (virtual_lamp(temp_level=None), LightMode.SCENE),
+    ):
+        before = shown(lamp)
+        assert asyncio.run(probe(lamp, mode)) is None
+        assert shown(lamp) == before
+        # only the status requests were written
+        assert lamp.writes == 2
+
+
+class LastFrameLamp(VirtualLamp):
+    """Parses only the last frame of a write"""
+
+    def _apply(self, frame: bytes) -> None:
+        self._frame = frame
+
+    async def write_gatt_char(self, char_specifier, data, response=True) -> None:
+        await super().write_gatt_char(char_specifier, data, response)
+        super()._apply(self._frame)
+
+
+class SlowLamp(VirtualLamp):
+    """A frame still processed when the next one arrives is replaced by it"""
+
+    processing = 0.015
+    _pending = None
+
+    def _apply(self, frame: bytes) -> None:
+        if self._pending is not None:
+            self._pending.cancel()
+        if frame[3:5].hex() == Commands._cmd_status:
+            self._pending = None
+            super()._apply(frame)
+            return
+        loop = asyncio.get_running_loop()
+        self._pending = loop.call_later(self.processing, super()._apply, frame)
+
+
+def test_packed_frames_need_every_frame_parsed():
+    lamp = virtual_lamp()
+    last_frame = LastFrameLamp(SlotPool(1), 0.0, 0.0, 0.0)
+    assert asyncio.run(probe(lamp)).packed_frames
+    assert not asyncio.run(probe(last_frame)).packed_frames
+
+
+def test_gap_lost_frames_are_noticed():
+    lamp = SlowLamp(SlotPool(1), 0.0, 0.0, 0.0)
+    before = shown(lamp)
+    capabilities = asyncio.run(probe(lamp))
+    assert capabilities.frame_gap == 0.02
+    assert shown(lamp) == before
@@ -0,0 +1,31 @@
+import datetime as dt
+
+from hypothesis import given, strategies as st
+
+from custom_components.ilink_light.circadian import (
+    CircadianSettings,
+    circadian_target,
+    sun_factor,
+)
+
+SUNRISE = dt.datetime(2024, 6, 1, 5, tzinfo=dt.timezone.utc)
+SUNSET = dt.datetime(2024, 6, 1, 21, tzinfo=dt.timezone.utc)
+
+
+def test_settings_survive_storage():
+    settings = CircadianSettings(10, 200, 8, dt.timedelta(minutes=30))
+    restored = CircadianSettings.from_dict(settings.as_dict())
+    assert vars(restored) == vars(settings)
+
+
+def test_sun_factor_peaks_at_noon():
+    assert sun_factor(SUNRISE - dt.timedelta(hours=1), SUNRISE, SUNSET) == 0.0
+    assert sun_factor(SUNRISE + (SUNSET - SUNRISE) / 2, SUNRISE, SUNSET) == 1.0
+
+
+@given(st.floats(0, 1), st.integers(1, 255), st.integers(1, 255), st.integers(1, 64))
+def test_target_stays_in_bounds(factor, low, high, step):
+    settings = CircadianSettings(min(low, high), max(low, high), step)
+    level, brightness = circadian_target(factor, settings)
+    assert 1 <= level <= 5
+    assert settings.min_brightness <= brightness <= settings.max_brightness
@@ -0,0 +1,62 @@
+import asyncio
+
+from bleak import BLEDevice
+
+from ilink_ble.client import LightBtClient
+from ilink_ble.resolver import DeviceResolver
+from ilink_ble.simulation import SlotPool, VirtualLamp
+
+ADDRESS = "00:00:00:00:00:01"
+
+
+class StaticResolver(DeviceResolver):
+    def __init__(self, devices: list[BLEDevice | None]):
+        self.devices = devices
+        self.lookups = 0
+
+    def ble_device(self, address: str) -> BLEDevice | None:
+        self.lookups += 1
+        return self.devices[min(self.lookups, len(self.devices)) - 1]
+
+
+def test_unknown_device_does_not_connect():
+    client = LightBtClient(ADDRESS, resolver=StaticResolver([None]))
+    client.latency.retry_delay = lambda: 0.0
+    assert not asyncio.run(client.connect(retries=2))
+    assert client.resolver.lookups == 2
+
+
+def test_last_seen_device_is_kept():
+    device = BLEDevice(ADDRESS, "lamp", {"path": "/org/bluez/hci0/dev_00"})
+    resolver = StaticResolver([device, None])
+    client = LightBtClient(ADDRESS, resolver=resolver)
+    client._create_client()
+    client._bt_client = None
+    # gone from the resolver for a moment, the device seen last is used
+    client._create_client()
+    assert client._bt_client.address == ADDRESS
+
+
+class SlowNotifyLamp(VirtualLamp):
+    """Connected at once, subscribing to notifications takes a while"""
+
+    async def start_notify(self, char_specifier, callback) -> None:
+        await asyncio.sleep(0.05)
+        await super().start_notify(char_specifier, callback)
+
+
+def test_connect_waits_for_initialize():
+    async def connect_twice():
+        lamp = SlowNotifyLamp(SlotPool(1), connect_time=0.0)
+        client = LightBtClient(ADDRESS)
+        client.client_factory = lambda: lamp
+        first = asyncio.ensure_future(client.connect())
+        while not lamp.is_connected:
+            await asyncio.sleep(0)
+        # connected, the first connect is still initializing
+        assert await client.connect()
+        assert lamp._callbacks
+        assert await first
+        assert lamp.connects == 1
+
+    asyncio.run(connect_twice())
@@ -0,0 +1,28 @@
+from homeassistant.util import color as color_util
+
+from ilink_ble.color import (
+    HUE_STEPS,
+    SATURATION_STEPS,
+    XY_STEPS,
+    ColorCalibration,
+    color_tables,
+)
+
+
+def test_tables_match_home_assistant():
+    colors = color_tables()
+    for hue in range(HUE_STEPS):
+        for saturation in range(SATURATION_STEPS + 1):
+            expected = color_util.color_hs_to_RGB(hue, saturation)
+            assert colors.hs(hue, saturation) == expected
+    for x in range(1, XY_STEPS):
+        for y in range(1, XY_STEPS):
+            expected = color_util.color_xy_to_RGB(x / XY_STEPS, y / XY_STEPS)
+            assert colors.xy(x / XY_STEPS, y / XY_STEPS) == expected
+
+
+def test_requested_colors_are_not_calibrated():
+    calibrated = color_tables(ColorCalibration(2.2, (255, 200, 150)))
+    assert calibrated.hs(30, 50) == color_tables().hs(30, 50)
+    assert calibrated.xy(0.3, 0.3) == color_tables().xy(0.3, 0.3)
+    assert calibrated.rgb(255, 255, 255) == (255, 200, 150)
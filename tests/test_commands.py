@@ -0,0 +1,142 @@
+from hypothesis import given, strategies as st
+
+from ilink_ble.commands import (
+    ColorTempLevelUtil,
+    Commands,
+    Response,
+    ResponseStatus,
+    color_temp_mappings,
+)
+
+from . import legacy
+
+bytes_ = st.integers(0, 0xFF)
+temp_levels = st.sampled_from(sorted(color_temp_mappings))
+
+"""status bytes of a temperature level, reversed Response._temp_levels"""
+TEMP_BYTES = {level: value for value, level in Response._temp_levels.items()}
+
+
+def decode(command: str) -> tuple[int, bytes, bytes]:
+    """Header kind, command and parameters of a frame, checks its framing"""
+    frame = bytes.fromhex(command)
+    assert frame[:2] == b"\x55\xaa"
+    assert frame[2] in (0x01, 0x03)
+    # the checksum makes all bytes sum up to 0xff
+    assert sum(frame) & 0xFF == 0xFF
+    assert len(frame) == (7 if frame[2] == 0x01 else 9)
+    return frame[2], frame[3:5], frame[5:-1]
+
+
+def status_frame(
+    on: bool, brightness: int, temp_level: int | None, rgb: tuple
+) -> bytes:
+    temp = TEMP_BYTES.get(temp_level, 0)
+    return (
+        Response._status_header_bytes
+        + bytes(rgb)
+        + temp.to_bytes(2, "big")
+        + bytes((brightness, int(on), temp_level or 0, 0, 0))
+    )
+
+
+@given(st.binary(max_size=32))
+def test_crc_matches_legacy(data):
+    assert Commands._crc(data.hex()) == legacy.crc(data.hex())
+
+
+def test_switch_and_status():
+    assert decode(Commands.on()) == (0x01, b"\x08\x05", b"\x01")
+    assert decode(Commands.off()) == (0x01, b"\x08\x05", b"\x00")
+    assert Commands.status() == "55aa01081506dc"
+
+
+@given(st.integers(-10, 300))
+def test_brightness_is_clamped(value):
+    _, command, params = decode(Commands.brightness(value))
+    assert command == b"\x08\x01"
+    assert params[0] == min(max(value, 1), 0xFF)
+
+
+@given(bytes_, bytes_, bytes_)
+def test_rgb_round_trip(r, g, b):
+    kind, command, params = decode(Commands.rgb(r, g, b))
+    assert (kind, command, tuple(params)) == (0x03, b"\x08\x02", (r, g, b))
+
+
+@given(temp_levels)
+def test_white_temp_round_trip(level):
+    _, command, params = decode(Commands.white_temp(level))
+    assert (command, params[0]) == (b"\x08\x09", level)
+
+
+@given(st.integers(1, 93))
+def test_scene_round_trip(scene):
+    kind, command, params = decode(Commands.scene(scene))
+    assert (kind, command, params) == (0x03, b"\x0e\x20", bytes((scene, 0xFF, 0x32)))
+
+
+@given(temp_levels)
+def test_color_temp_level_round_trip(level):
+    temp = ColorTempLevelUtil.level_to_color_temp(level)
+    assert ColorTempLevelUtil.color_temp_to_level(temp) == level
+
+
+@given(st.integers(6001, 20000))
+def test_color_temp_above_range_is_coldest(temp):
+    assert ColorTempLevelUtil.color_temp_to_level(temp) == 1
+
+
+@given(
+    st.booleans(), bytes_, st.none() | temp_levels, st.tuples(bytes_, bytes_, bytes_)
+)
+def test_status_round_trip(on, brightness, temp_level, rgb):
+    frame = status_frame(on, brightness, temp_level, rgb)
+    status = Response.parse_status(bytearray(frame))
+    assert status.as_dict() == {
+        "on": on,
+        "brightness": brightness,
+        "temp_level": temp_level,
+        "rgb": rgb,
+    }
+    assert legacy.parse_status(frame) == (on, brightness, temp_level, rgb)
+
+
+@given(st.binary(max_size=24))
+def test_fuzz_status_matches_legacy(data):
+    check_against_legacy(bytearray(data))
+
+
+@given(st.binary(max_size=12))
+def test_fuzz_status_after_header_matches_legacy(tail):
+    check_against_legacy(bytearray(Response._status_header_bytes + tail))
+
+
+def check_against_legacy(data: bytearray) -> None:
+    try:
+        expected = legacy.parse_status(data) if legacy.is_status(data) else None
+    except IndexError:
+        # legacy raised on truncated notifications, they're not a status now
+        expected = None
+    assert Response.is_status(data) == (expected is not None)
+    status = Response.parse_status(data)
+    if expected is None:
+        assert status is None
+    else:
+        assert (status.on, status.brightness, status.temp_level, status.rgb) == (
+            expected
+        )
+
+
+def test_parse_status_into_reuses_record():
+    record = ResponseStatus(False, 0, None, (0, 0, 0))
+    frame = bytearray(status_frame(True, 200, 3, (1, 2, 3)))
+    assert Response.parse_status(frame, record) is record
+    assert record.as_dict() == {
+        "on": True,
+        "brightness": 200,
+        "temp_level": 3,
+        "rgb": (1, 2, 3),
+    }
+    # equal colors share one tuple
+    assert Response.parse_status(frame).rgb is record.rgb
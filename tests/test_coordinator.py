@@ -0,0 +1,163 @@
+import asyncio
+
+from custom_components.ilink_light.const import CONF_GAMMA, WRITE_MAX_ATTEMPTS
+from custom_components.ilink_light.coordinator import LightState
+from custom_components.ilink_light.profiles import ProfileStore
+from custom_components.ilink_light.scheduler import PollScheduler
+from ilink_ble.commands import Commands
+from ilink_ble.simulation import SlotPool, VirtualLamp
+
+from .hass import add_lamp, home_assistant
+
+LAMP_TIMING = dict(connect_time=0.01, write_time=0.001, status_time=0.05)
+
+
+def virtual_lamp() -> VirtualLamp:
+    return VirtualLamp(SlotPool(3), **LAMP_TIMING)
+
+
+class DroppingLamp(VirtualLamp):
+    """Loses the first dim frames, like a lamp out of range for a moment"""
+
+    def __init__(self, dropped: int):
+        super().__init__(SlotPool(3), **LAMP_TIMING)
+        self.dropped = dropped
+
+    def _apply(self, frame: bytes) -> None:
+        if frame[3:5].hex() == Commands._cmd_dim and self.dropped:
+            self.dropped -= 1
+            return
+        super()._apply(frame)
+
+
+async def run_with_lamp(config_dir: str, test, lamp=None, **conf) -> None:
+    async with home_assistant(config_dir) as hass:
+        profiles = ProfileStore(hass)
+        await profiles.async_load()
+        lamp = lamp or virtual_lamp()
+        scheduler = PollScheduler(hass, 12)
+        coordinator = await add_lamp(hass, lamp, scheduler, profiles, **conf)
+        try:
+            await test(coordinator, lamp)
+        finally:
+            await coordinator.async_shutdown()
+
+
+def test_overlapping_sessions_each_get_their_status(tmp_path):
+    async def test(coordinator, lamp):
+        client = coordinator.client
+        request_status = client.request_status
+        answers = []
+
+        async def recorded(*args, **kwargs):
+            answers.append(await request_status(*args, **kwargs))
+            return answers[-1]
+
+        client.request_status = recorded
+        first = asyncio.ensure_future(
+            coordinator.async_update_states({LightState.BRIGHTNESS: 80})
+        )
+        # until the first session waits for its verification, not busy then
+        while client._status_waiter is None or client.busy:
+            await asyncio.sleep(0.001)
+        second = coordinator.async_update_states({LightState.RGB: (1, 2, 3)})
+        poll = coordinator.async_update()
+
+        assert (await asyncio.gather(first, second, poll))[:2] == [True, True]
+        assert None not in answers
+        assert not coordinator.pending and not coordinator.divergent
+        assert (lamp.brightness, lamp.rgb) == (80, (1, 2, 3))
+
+    asyncio.run(run_with_lamp(str(tmp_path), test))
+
+
+def test_poll_waits_for_take_over(tmp_path):
+    async def test(coordinator, lamp):
+        async with coordinator.async_take_over():
+            await coordinator.async_update()
+            assert lamp.connects == 0
+        await coordinator.async_update()
+        assert lamp.connects == 1
+
+    asyncio.run(run_with_lamp(str(tmp_path), test))
+
+
+def test_state_keeps_requested_color(tmp_path):
+    async def test(coordinator, lamp):
+        requested = (128, 64, 32)
+        assert await coordinator.async_update_states({LightState.RGB: requested})
+        # only the lamp gets the calibrated color
+        assert lamp.rgb == coordinator.colors.rgb(*requested) != requested
+        assert not coordinator.pending and not coordinator.divergent
+        await coordinator.async_update()
+        await asyncio.sleep(0.2)
+        assert coordinator.state[LightState.RGB] == requested
+
+        # changed elsewhere, state shows what the lamp does
+        lamp.rgb = (1, 2, 3)
+        await coordinator.async_update()
+        await asyncio.sleep(0.2)
+        assert coordinator.state[LightState.RGB] == (1, 2, 3)
+
+    asyncio.run(run_with_lamp(str(tmp_path), test, **{CONF_GAMMA: 2.2}))
+
+
+def test_lost_write_is_retried(tmp_path):
+    async def test(coordinator, lamp):
+        assert await coordinator.async_update_states({LightState.BRIGHTNESS: 80})
+        # the verifying status didn't confirm it, written again in the session
+        assert lamp.dropped == 0 and lamp.brightness == 80
+        assert not coordinator.pending and not coordinator.divergent
+
+    asyncio.run(run_with_lamp(str(tmp_path), test, DroppingLamp(1)))
+
+
+def test_lamp_ignoring_writes_diverges(tmp_path):
+    async def test(coordinator, lamp):
+        assert await coordinator.async_update_states({LightState.BRIGHTNESS: 80})
+        assert lamp.brightness == 255
+        # given up on, the state shows what the lamp reported
+        assert not coordinator.pending
+        assert coordinator.divergent == {LightState.BRIGHTNESS}
+        assert coordinator.state[LightState.BRIGHTNESS] == 255
+
+        # reached later, no longer divergent
+        assert await coordinator.async_update_states({LightState.BRIGHTNESS: 90})
+        assert lamp.brightness == 90
+        assert not coordinator.divergent
+
+    lamp = DroppingLamp(WRITE_MAX_ATTEMPTS)
+    asyncio.run(run_with_lamp(str(tmp_path), test, lamp))
+
+
+def test_probe_states_are_not_published(tmp_path):
+    async def test(coordinator, lamp):
+        lamp.brightness = 100
+        coordinator.client.device_version = "1.0.0.1"
+        published = []
+        coordinator.async_add_listener(
+            lambda: published.append(coordinator.state[LightState.BRIGHTNESS])
+        )
+        await coordinator.async_update()
+        assert coordinator.client.capabilities.packed_frames
+        # only the state the lamp was put back to
+        assert published == [100]
+
+    asyncio.run(run_with_lamp(str(tmp_path), test))
+
+
+def test_reported_white_mode_needs_no_temperature_frame(tmp_path):
+    async def test(coordinator, lamp):
+        # restarted, nothing was sent yet
+        await coordinator.async_update()
+        await asyncio.sleep(0.2)
+        temperature = coordinator.state[LightState.COLORTEMP]
+        writes = lamp.writes
+        assert await coordinator.async_update_states(
+            {LightState.COLORTEMP: temperature, LightState.BRIGHTNESS: 50}
+        )
+        # one brightness frame and the verifying status request
+        assert lamp.writes - writes == 2
+        assert lamp.brightness == 50
+
+    asyncio.run(run_with_lamp(str(tmp_path), test))
@@ -0,0 +1,14 @@
+import asyncio
+
+from .fleet import simulate_integration
+
+
+def test_fleet_is_polled_changed_and_reloaded(tmp_path):
+    report = asyncio.run(
+        simulate_integration(str(tmp_path), lamps=3, duration=2.0, rate=60.0)
+    )
+    assert (report.setup_failed, report.reload_failed) == (0, 0)
+    assert report.commands > report.failed_commands
+    # every change is published, polls finding nothing new aren't
+    assert report.state_writes_per_minute > 0
+    assert report.gatt_writes_per_minute > 0
@@ -0,0 +1,143 @@
+from hypothesis import given, strategies as st
+
+from ilink_ble.commands import Commands, ResponseStatus
+from ilink_ble.planner import DesiredState, LightMode, apply_state, plan_frames
+
+bytes_ = st.integers(0, 0xFF)
+rgbs = st.tuples(bytes_, bytes_, bytes_)
+levels = st.integers(1, 5)
+
+
+class ModelLamp:
+    """Lamp state changed by frames, color frames lose the brightness"""
+
+    def __init__(self, known: ResponseStatus, mode: LightMode, keeps: bool = False):
+        self.state = known.copy()
+        self.mode = mode
+        self.keeps = keeps
+        self.scene = None
+
+    def apply(self, command: str) -> None:
+        frame = bytes.fromhex(command)
+        kind, params = frame[3:5].hex(), frame[5:-1]
+        match kind:
+            case Commands._cmd_switch:
+                self.state.on = params[0] == 1
+            case Commands._cmd_dim:
+                self.state.brightness = params[0]
+            case Commands._cmd_white_temp:
+                self.state.temp_level, self.mode = params[0], LightMode.WHITE
+                self._color_changed()
+            case Commands._cmd_rgb:
+                self.state.rgb, self.mode = tuple(params), LightMode.RGB
+                self._color_changed()
+            case Commands._cmd_scene:
+                self.scene, self.mode = params[0], LightMode.SCENE
+                self.state.brightness = None
+
+    def _color_changed(self) -> None:
+        if not self.keeps:
+            self.state.brightness = None
+
+
+@st.composite
+def known_states(draw):
+    mode = draw(st.sampled_from(LightMode))
+    status = ResponseStatus(
+        draw(st.booleans()),
+        draw(st.integers(1, 0xFF)),
+        draw(levels) if mode == LightMode.WHITE else None,
+        draw(rgbs),
+    )
+    return status, mode
+
+
+@st.composite
+def desired_states(draw):
+    color = draw(st.sampled_from(["keep", "white", "rgb", "scene"]))
+    return DesiredState(
+        on=draw(st.none() | st.booleans()),
+        temp_level=draw(levels) if color == "white" else None,
+        rgb=draw(rgbs) if color == "rgb" else None,
+        scene=draw(st.integers(1, 93)) if color == "scene" else None,
+        brightness=draw(st.none() | bytes_),
+    )
+
+
+@given(known_states(), desired_states(), st.booleans())
+def test_plan_reaches_desired_state(known, desired, keeps):
+    status, mode = known
+    lamp = ModelLamp(status, mode, keeps)
+    frames = plan_frames(desired, status, mode, status.brightness, keeps)
+    for frame in frames:
+        lamp.apply(frame)
+
+    if desired.on is not None:
+        assert lamp.state.on == desired.on
+    if desired.temp_level is not None:
+        assert (lamp.mode, lamp.state.temp_level) == (
+            LightMode.WHITE,
+            desired.temp_level,
+        )
+    if desired.rgb is not None:
+        assert (lamp.mode, lamp.state.rgb) == (LightMode.RGB, desired.rgb)
+    if desired.scene is not None:
+        assert (lamp.mode, lamp.scene) == (LightMode.SCENE, desired.scene)
+    if desired.brightness is not None:
+        assert lamp.state.brightness == max(desired.brightness, 1)
+    elif desired.scene is None:
+        # not requested, the brightness the lamp had is kept
+        assert lamp.state.brightness == status.brightness
+
+    # what the planner assumes afterwards is what the lamp does
+    state, planned_mode = apply_state(desired, status, mode)
+    assert planned_mode == lamp.mode
+    if desired.scene is None:
+        assert state.as_dict() == lamp.state.as_dict()
+
+
+@given(known_states(), st.booleans())
+def test_reached_state_needs_no_frames(known, keeps):
+    status, mode = known
+    desired = DesiredState(
+        on=status.on,
+        temp_level=status.temp_level if mode == LightMode.WHITE else None,
+        rgb=status.rgb if mode == LightMode.RGB else None,
+        brightness=status.brightness,
+    )
+    assert plan_frames(desired, status, mode, status.brightness, keeps) == []
+
+
+@given(desired_states())
+def test_unknown_lamp_gets_every_requested_attribute(desired):
+    frames = plan_frames(desired, None, None, 255)
+    kinds = {bytes.fromhex(frame)[3:5].hex() for frame in frames}
+    if desired.on is not None:
+        assert Commands._cmd_switch in kinds
+    if desired.brightness is not None:
+        assert Commands._cmd_dim in kinds
+    assert apply_state(desired, None, None)[0] is None
+
+
+def test_color_and_brightness_change_in_one_plan():
+    known = ResponseStatus(True, 100, 3, (255, 255, 255))
+    frames = plan_frames(
+        DesiredState(on=True, rgb=(255, 0, 0), brightness=50),
+        known,
+        LightMode.WHITE,
+        known.brightness,
+    )
+    # no on frame, the lamp is on already, brightness once after the color
+    assert frames == [Commands.rgb(255, 0, 0), Commands.brightness(50)]
+
+
+def test_white_lamp_reported_after_restart_only_gets_brightness():
+    # the status shows a temperature, so the lamp is in white mode
+    known = ResponseStatus(True, 100, 3, (255, 255, 255))
+    frames = plan_frames(
+        DesiredState(on=True, temp_level=3, brightness=50),
+        known,
+        LightMode.WHITE,
+        known.brightness,
+    )
+    assert frames == [Commands.brightness(50)]
@@ -0,0 +1,46 @@
+import asyncio
+from unittest.mock import patch
+
+from custom_components.ilink_light.const import CONF_MAC
+from custom_components.ilink_light.coordinator import LightState
+from custom_components.ilink_light.profiles import ProfileStore
+from custom_components.ilink_light.scheduler import PollScheduler
+from ilink_ble.latency import LatencyStats
+from ilink_ble.simulation import SlotPool, VirtualLamp
+
+from .hass import add_lamp, home_assistant
+
+ADDRESS = "00:00:00:00:01:00"
+
+
+def test_journal_survives_reload_and_restart(tmp_path):
+    async def run():
+        async with home_assistant(str(tmp_path)) as hass:
+            profiles = ProfileStore(hass)
+            await profiles.async_load()
+            scheduler = PollScheduler(hass, 12)
+            # no free slot, the write stays in the journal
+            lamp = VirtualLamp(SlotPool(0), connect_time=0.0)
+            coordinator = await add_lamp(
+                hass, lamp, scheduler, profiles, **{CONF_MAC: ADDRESS}
+            )
+            changes = {LightState.BRIGHTNESS: 80}
+            assert not await coordinator.async_update_states(changes)
+            await coordinator.async_shutdown()
+
+            # reloaded, the same store is used again
+            coordinator = await add_lamp(
+                hass, lamp, scheduler, profiles, **{CONF_MAC: ADDRESS}
+            )
+            assert coordinator.pending == {LightState.BRIGHTNESS}
+            await coordinator.async_shutdown()
+            await profiles.async_save()
+
+        async with home_assistant(str(tmp_path)) as hass:
+            profiles = ProfileStore(hass)
+            await profiles.async_load()
+            journal = profiles.get(ADDRESS)["journal"]
+            assert journal == {LightState.BRIGHTNESS.value: 80}
+
+    with patch.object(LatencyStats, "retry_delay", lambda self: 0.0):
+        asyncio.run(run())
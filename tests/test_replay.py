@@ -0,0 +1,53 @@
+import asyncio
+
+from ilink_ble.capture import CaptureEvent, TrafficRecorder, read_capture
+from ilink_ble.client import LightBtClient
+from ilink_ble.commands import Commands
+from ilink_ble.replay import replay_capture
+from ilink_ble.simulation import SlotPool, VirtualLamp
+
+ADDRESS = "00:00:00:00:00:01"
+
+
+async def capture_session(path: str) -> VirtualLamp:
+    """Connect, change the lamp and poll it like a coordinator would"""
+    lamp = VirtualLamp(SlotPool(1), connect_time=0.01, write_time=0.001)
+    client = LightBtClient(ADDRESS)
+    client.client_factory = lambda: lamp
+    client.recorder = TrafficRecorder(path)
+    # status notifications would drop the connection between the steps
+    client.hold(5)
+
+    assert await client.connect()
+    assert await client.send_commands([Commands.on(), Commands.brightness(80)])
+    assert await client.request_status() is not None
+    client.release()
+    await client.disconnect(force=True)
+    client.recorder.save()
+    return lamp
+
+
+def test_replay_issues_captured_traffic(tmp_path):
+    path = str(tmp_path / "session.cap")
+    lamp = asyncio.run(capture_session(path))
+    records = read_capture(path)
+    writes = [record for record in records if record.event == CaptureEvent.WRITE]
+    assert len(writes) == lamp.writes
+
+    report = asyncio.run(replay_capture(records, speed=0))
+    assert report.connects == 1
+    assert report.failed_connects == 0
+    # initialize's status request is answered as part of the connect
+    assert report.frames == len(writes) - 1
+    assert report.failed_frames == 0
+    assert report.as_dict()["write_latency_p50"] is not None
+
+
+def test_replay_reports_captured_connect_failure(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path / "failed.cap"))
+    recorder.record(CaptureEvent.CONNECTING)
+    recorder.error(TimeoutError("no answer"))
+    recorder.save()
+
+    report = asyncio.run(replay_capture(read_capture(recorder.path), speed=0))
+    assert (report.connects, report.failed_connects) == (1, 1)
@@ -0,0 +1,89 @@
+import asyncio
+import math
+import time
+
+from custom_components.ilink_light.scheduler import PollScheduler
+
+from .hass import home_assistant
+
+
+class FakeCoordinator:
+    def __init__(self, address: str, status_age: float | None = None):
+        self.address = address
+        self.poll_interval = 60.0
+        self.status_age = status_age
+        self.polls = 0
+
+    async def async_refresh(self) -> None:
+        self.polls += 1
+
+
+async def run_with_scheduler(config_dir: str, test) -> None:
+    async with home_assistant(config_dir) as hass:
+        scheduler = PollScheduler(hass, 60)
+        try:
+            await test(hass, scheduler)
+        finally:
+            for entry in list(scheduler._entries.values()):
+                scheduler.remove(entry.coordinator)
+
+
+def test_most_overdue_lamp_is_polled_once_per_tick(tmp_path):
+    async def test(hass, scheduler):
+        lamps = [FakeCoordinator(f"lamp{index}") for index in range(3)]
+        for delay, lamp in zip((5, 0, 10), lamps):
+            scheduler.add(lamp, 0)
+            scheduler._entries[lamp.address].due = time.monotonic() - delay
+        scheduler._async_tick(None)
+        # running polls aren't due again until they end
+        assert math.isinf(scheduler._entries["lamp2"].due)
+        await hass.async_block_till_done()
+        assert [lamp.polls for lamp in lamps] == [0, 0, 1]
+        # polled again one interval later
+        due = scheduler._entries["lamp2"].due - time.monotonic()
+        assert 50 < due < 70
+
+    asyncio.run(run_with_scheduler(str(tmp_path), test))
+
+
+def test_lamp_reporting_on_its_own_is_not_polled(tmp_path):
+    async def test(hass, scheduler):
+        lamp = FakeCoordinator("lamp", status_age=20.0)
+        scheduler.add(lamp, 0)
+        scheduler._entries[lamp.address].due = time.monotonic() - 1
+        scheduler._async_tick(None)
+        await hass.async_block_till_done()
+        assert lamp.polls == 0
+        # the status counts as a poll, the next one is due an interval after it
+        due = scheduler._entries[lamp.address].due - time.monotonic()
+        assert 30 < due < 50
+
+    asyncio.run(run_with_scheduler(str(tmp_path), test))
+
+
+def test_poll_soon_only_moves_polls_forward(tmp_path):
+    async def test(hass, scheduler):
+        lamp = FakeCoordinator("lamp")
+        scheduler.add(lamp, 100)
+        scheduler.poll_soon(lamp, 1)
+        due = scheduler._entries[lamp.address].due
+        assert due - time.monotonic() < 2
+        scheduler.poll_soon(lamp, 50)
+        assert scheduler._entries[lamp.address].due == due
+
+    asyncio.run(run_with_scheduler(str(tmp_path), test))
+
+
+def test_timer_stops_with_the_last_lamp(tmp_path):
+    async def test(hass, scheduler):
+        lamp = FakeCoordinator("lamp")
+        scheduler.add(lamp, 0)
+        assert scheduler._unsub is not None
+        scheduler.remove(lamp)
+        assert scheduler._unsub is None
+        # removing again or polling a removed lamp is a no-op
+        scheduler.remove(lamp)
+        scheduler.poll_soon(lamp, 0)
+        assert not scheduler._entries
+
+    asyncio.run(run_with_scheduler(str(tmp_path), test))
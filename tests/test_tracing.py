@@ -0,0 +1,64 @@
+import asyncio
+
+from ilink_ble.tracing import Tracer
+
+
+def test_concurrent_sessions_get_their_own_track():
+    tracer = Tracer("lamp")
+    tracer.start()
+
+    async def session(name: str, delay: float):
+        with tracer.span(name):
+            await asyncio.sleep(delay)
+            with tracer.span(f"{name}_write"):
+                await asyncio.sleep(delay)
+
+    async def sessions():
+        await asyncio.gather(
+            asyncio.create_task(session("poll", 0.01), name="poll"),
+            asyncio.create_task(session("prewarm", 0.015), name="prewarm"),
+        )
+
+    asyncio.run(sessions())
+    events = tracer.stop()
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert spans["poll"]["tid"] == spans["poll_write"]["tid"]
+    assert spans["prewarm"]["tid"] == spans["prewarm_write"]["tid"]
+    assert spans["poll"]["tid"] != spans["prewarm"]["tid"]
+
+    # every span on a track nests in the ones it overlaps
+    for span in spans.values():
+        for other in spans.values():
+            if other is span or other["tid"] != span["tid"]:
+                continue
+            end, other_end = span["ts"] + span["dur"], other["ts"] + other["dur"]
+            if span["ts"] <= other["ts"] < end:
+                assert other_end <= end
+
+    names = {
+        event["tid"]: event["args"]["name"]
+        for event in events
+        if event["name"] == "thread_name"
+    }
+    assert names[spans["poll"]["tid"]] == "poll"
+
+
+def test_span_across_tasks_is_an_async_event():
+    tracer = Tracer("lamp")
+    tracer.start()
+
+    async def round_trip():
+        start = tracer.now()
+        answered = asyncio.get_running_loop().create_future()
+
+        async def notified():
+            tracer.complete_async("status_round_trip", start)
+            answered.set_result(None)
+
+        asyncio.create_task(notified())
+        await answered
+
+    asyncio.run(round_trip())
+    begin, end = (event for event in tracer.stop() if event["ph"] in "be")
+    assert (begin["ph"], end["ph"]) == ("b", "e")
+    assert begin["id"] == end["id"] and begin["ts"] <= end["ts"]